@@ -0,0 +1,61 @@
+"""
+Benchmark of compressed G-code output.
+
+Generates the same dense raster grid with every available compression
+and reports file size, compression ratio and generation throughput.
+
+Usage:
+    python benchmarks/bench_compression.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pattern_generator import PatternGenerator  # noqa: E402
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=10,
+              x_start_pos=0, y_start_pos=0, x_squares=10, y_squares=10,
+              start_power=100, end_power=1000, start_feed=1000, end_feed=5000,
+              turn_on_g_code='M4', turn_off_g_code='M5')
+
+CASES = [('none', '.nc'), ('gzip', '.nc.gz'), ('xz', '.nc.xz'), ('zstd', '.nc.zst')]
+
+
+def generate(file_name, compression, level=None):
+    generator = PatternGenerator(file_name=file_name, compression=compression,
+                                 compression_level=level, **PARAMS)
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        with generator.loc.session(file_name, compression, level):
+            generator.initialize_file()
+            generator.etch_power_speed_values()
+            generator.generate_snake_paths()
+    return time.perf_counter() - start
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    with tempfile.TemporaryDirectory() as tmp:
+        base_size = base_time = None
+        print(f'{"compression":<12}{"size [kB]":>12}{"ratio":>8}{"time [s]":>10}{"MB/s":>8}')
+        for compression, suffix in CASES:
+            file_name = os.path.join(tmp, 'bench' + suffix)
+            try:
+                elapsed = generate(file_name, compression)
+            except ValueError as error:
+                print(f'{compression:<12}skipped: {error}')
+                continue
+            size = os.path.getsize(file_name)
+            if base_size is None:
+                base_size, base_time = size, elapsed
+            print(f'{compression:<12}{size / 1024:>12.1f}{base_size / size:>8.1f}'
+                  f'{elapsed:>10.3f}{base_size / elapsed / 1e6:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
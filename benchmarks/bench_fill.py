@@ -0,0 +1,52 @@
+"""
+Benchmark of the square fills.
+
+Writes a dense square with the horizontal raster and with hatch fills at
+several angles and reports the time per square and per scan line, and the
+share of it spent computing the path (the rest is G-code formatting).
+
+Usage:
+    python benchmarks/bench_fill.py
+"""
+import os
+import sys
+import time
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import dialects as dl  # noqa: E402
+from utils import moves as m  # noqa: E402
+
+SIZE = 10
+LINE_INTERVAL = 0.05
+REPEAT = 50
+
+CASES = [('raster', lambda: m.raster_path(0, 0, SIZE, SIZE, LINE_INTERVAL, 1)),
+         ('hatch 0', lambda: m.square_hatch_path(0, 0, SIZE, SIZE, LINE_INTERVAL, 0, False, 1)),
+         ('hatch 45', lambda: m.square_hatch_path(0, 0, SIZE, SIZE, LINE_INTERVAL, 45, False, 1)),
+         ('hatch 30', lambda: m.square_hatch_path(0, 0, SIZE, SIZE, LINE_INTERVAL, 30, False, 1)),
+         ('cross 45', lambda: m.square_hatch_path(0, 0, SIZE, SIZE, LINE_INTERVAL, 45, True, 1))]
+
+
+def timed(function) -> float:
+    function()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    loc = m.Location((0, 0), 'bench.nc', dl.get_dialect('grbl-laser', 'M4', 'M5'))
+    print(f'{"fill":<10}{"lines":>7}{"ms/square":>11}{"us/line":>9}{"path":>7}')
+    for name, path in CASES:
+        x, y, kind = path()
+        lines = int((kind == m.BURN).sum())
+        path_time = timed(path)
+        total = timed(lambda: loc.write_path(*path(), 500, 1000, StringIO(), loc.dialect))
+        print(f'{name:<10}{lines:>7}{total * 1e3:>11.2f}{total / lines * 1e6:>9.1f}{path_time / total:>7.0%}')
+
+
+if __name__ == '__main__':
+    main()
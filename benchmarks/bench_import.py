@@ -0,0 +1,57 @@
+"""
+Benchmark of the import time of the generator.
+
+Imports every module in fresh interpreters and reports the median time,
+next to the heavy dependencies that are loaded lazily, and the time of a
+headless job from interpreter start to the written program.
+
+Usage:
+    python benchmarks/bench_import.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('pattern_generator', 'import pattern_generator'),
+    ('service', 'import service'),
+    ('numpy', 'import numpy'),
+    ('cerberus', 'import cerberus'),
+    ('matplotlib.pyplot', 'import matplotlib.pyplot'),
+    ('headless job', 'import pattern_generator as pg\n'
+                     'pg.PatternGenerator(os.devnull, 10, 10, 5, 3, 0, 0, 3, 2, '
+                     '1000, 5000, 1000, 5000, "M4", "M5").write_program()'),
+]
+
+TIMER = 'import os, time\nstart = time.perf_counter()\n{code}\nprint(time.perf_counter() - start)'
+
+
+def measure(code, runs):
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', TIMER.format(code=code)], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.split()[-1]))
+    return statistics.median(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    # Warm up the bytecode caches, the first import compiles the modules.
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', 'pattern_generator.py', 'service.py', 'utils'],
+                   cwd=ROOT, check=False)
+    print(f'{"import":<20}{"median [ms]":>12}')
+    for name, code in CASES:
+        try:
+            elapsed = measure(code, runs)
+        except subprocess.CalledProcessError:
+            print(f'{name:<20}skipped: not installed')
+            continue
+        print(f'{name:<20}{elapsed * 1000:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
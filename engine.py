@@ -0,0 +1,162 @@
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Mapping, NamedTuple, Optional
+from pattern_generator import FONT_FILE, OUTPUT_PARAMS, PatternGenerator
+from utils import engraving as e, gcode_io as gio
+from utils.block_cache import MAX_BLOCKS, BlockCache
+from utils.lazy import lazy_import
+from utils.runtime import RunTime, RunTimeModel
+from utils.spatial import LayoutReport
+
+hashlib = lazy_import('hashlib')
+
+# Layout reports and run time estimates kept.
+MAX_REPORTS = 16
+
+
+class GenerationResult(NamedTuple):
+    """
+    Outcome of one `GenerationEngine.generate`.
+
+    generator: generator that wrote the program.
+    layout_report: layout verification of the grid.
+    run_time: estimated machine time of the program.
+    seconds: time the generation took.
+    hits: labels and squares reused from earlier generations.
+    misses: labels and squares rendered.
+    """
+    generator: PatternGenerator
+    layout_report: LayoutReport
+    run_time: RunTime
+    seconds: float
+    hits: int
+    misses: int
+
+
+def file_digest(file: str) -> str:
+    """
+    Digest of the bytes of a written program.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remember(cache: OrderedDict, key: Hashable, compute: Callable):
+    # Small least recently used cache of reports.
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    value = cache[key] = compute()
+    if len(cache) > MAX_REPORTS:
+        cache.popitem(last=False)
+    return value
+
+
+class GenerationEngine:
+    """
+    Generator state kept warm for a whole interactive session, e.g. by the GUI.
+
+    A fresh `PatternGenerator` per click starts from cold: it opens and
+    indexes the font, parses the glyphs, renders every label and square,
+    verifies the layout and parses the written program to estimate the
+    machine time. The engine keeps the work that does not change between
+    generations of a tuning session:
+
+    - fonts with their parsed glyphs, reloaded when the font file changes;
+    - rendered labels and squares (`BlockCache`), reused when their
+      parameters, the render settings (`PatternGenerator.render_settings`)
+      and the dialect state where they start are the same, e.g. only the
+      power labels and squares are rendered again when the end power changes;
+    - layout reports keyed by the parameters that place labels and squares;
+    - run time estimates keyed by the digest of the written program.
+
+    Every cache is keyed by what its result depends on, so the program is
+    the same as one written by a new generator with the same parameters.
+
+    Parameters
+    ----------
+    model: Optional[RunTimeModel]
+        Machine time model of the run time estimates, the default model when None.
+    max_blocks: int
+        Number of labels and squares kept.
+
+    Attributes
+    ----------
+    fonts : Dict[str, Tuple[List[int], Mapping]]
+        Stamp and glyphs of every font used.
+    blocks : BlockCache
+        Rendered labels and squares.
+    """
+    def __init__(self, model: Optional[RunTimeModel] = None, max_blocks: int = MAX_BLOCKS):
+        self.model = model or RunTimeModel()
+        self.fonts = {}
+        self.blocks = BlockCache(max_blocks)
+        self.layouts = OrderedDict()
+        self.run_times = OrderedDict()
+
+    def font(self, file: str) -> Mapping:
+        """
+        Glyphs of a font, loaded again only when the font file was changed.
+        """
+        stamp = gio.file_stamp(file)
+        cached = self.fonts.get(file)
+        if cached is not None:
+            if cached[0] == stamp:
+                return cached[1]
+            # Labels rendered with the old glyphs must not be reused.
+            self.blocks.clear()
+            if hasattr(cached[1], 'close'):
+                cached[1].close()
+        font = e.load_font(file)
+        self.fonts[file] = stamp, font
+        return font
+
+    def generator(self, **params) -> PatternGenerator:
+        """
+        `PatternGenerator` with the warm font and block cache of the engine.
+        """
+        return PatternGenerator(characters=self.font(params.get('font', FONT_FILE)),
+                                block_cache=self.blocks, **params)
+
+    def generate(self, **params) -> GenerationResult:
+        """
+        Write a program like `PatternGenerator(**params).generate_pattern()`.
+
+        Parameters
+        ----------
+        params: Dict
+            `PatternGenerator` parameters.
+
+        Returns
+        -------
+        result: GenerationResult
+            Generator, layout report, run time estimate and cache use.
+        """
+        start = time.perf_counter()
+        hits, misses = self.blocks.hits, self.blocks.misses
+        generator = self.generator(**params)
+        layout = (repr(sorted((name, value) for name, value in params.items() if name not in OUTPUT_PARAMS)),
+                  repr(self.fonts[generator.font][0]))
+        generator.layout_report = _remember(self.layouts, layout, generator.verify_layout)
+        generator.write_program()
+        run_time = _remember(self.run_times, (file_digest(generator.file_name), self.model.rapid_feed,
+                                              self.model.acceleration),
+                             lambda: generator.estimate_run_time(self.model))
+        generator.show_preview()
+        return GenerationResult(generator, generator.layout_report, run_time, time.perf_counter() - start,
+                                self.blocks.hits - hits, self.blocks.misses - misses)
+
+    def clear(self):
+        """
+        Drop everything kept, the next generation starts from cold.
+        """
+        for _, font in self.fonts.values():
+            if hasattr(font, 'close'):
+                font.close()
+        self.fonts.clear()
+        self.blocks.clear()
+        self.layouts.clear()
+        self.run_times.clear()
@@ -1,49 +1,80 @@
-from tkinter import Tk, Frame, Label, Button, Entry, StringVar, DoubleVar, IntVar, PhotoImage
+import threading
+from typing import Callable, Dict, Optional
+from tkinter import Tk, Frame, Label, Button, Entry, StringVar, DoubleVar, IntVar, PhotoImage, TclError
 from tkinter import ttk
-from pattern_generator import PatternGenerator
+from engine import GenerationEngine
+from preview_canvas import LivePreview
 
+# Delay between the last change of a field and the layout preview in milliseconds.
+LAYOUT_DELAY = 50
 
-def generate_g_code():
+
+def read_params() -> Dict:
+    """
+    Retrieve the input values and convert them to appropriate types.
+    """
+    params = {key: fields[key][0].get() for key in fields}
+    # Convert appropriate values to float/int as needed
+    params['length'] = float(params['length'])
+    params['width'] = float(params['width'])
+    params['space'] = float(params['space'])
+    params['passes_per_mm'] = int(params['passes_per_mm'])
+    params['x_start_pos'] = float(params['x_start_pos'])
+    params['y_start_pos'] = float(params['y_start_pos'])
+    params['x_squares'] = int(params['x_squares'])
+    params['y_squares'] = int(params['y_squares'])
+    params['start_power'] = int(params['start_power'])
+    params['end_power'] = int(params['end_power'])
+    params['start_feed'] = int(params['start_feed'])
+    params['end_feed'] = int(params['end_feed'])
+
+    params['rapid_travel'] = bool(int(params['rapid_travel']))
+    return params
+
+
+def generate_g_code(engine: GenerationEngine, observer: Optional[Callable[[str], None]] = None,
+                    params: Optional[Dict] = None):
     """
-    Retrieve the input values, convert them to appropriate types,
-    and generate the G-code using the PatternGenerator.
+    Retrieve the input values (unless `params` were read already), convert
+    them to appropriate types, and generate the G-code with the warm engine
+    of the session. The program is passed to `observer` while it is written,
+    otherwise it is plotted afterwards.
     """
     try:
-        params = {key: fields[key][0].get() for key in fields}
-        # Convert appropriate values to float/int as needed
-        params['length'] = float(params['length'])
-        params['width'] = float(params['width'])
-        params['space'] = float(params['space'])
-        params['passes_per_mm'] = int(params['passes_per_mm'])
-        params['x_start_pos'] = float(params['x_start_pos'])
-        params['y_start_pos'] = float(params['y_start_pos'])
-        params['x_squares'] = int(params['x_squares'])
-        params['y_squares'] = int(params['y_squares'])
-        params['start_power'] = int(params['start_power'])
-        params['end_power'] = int(params['end_power'])
-        params['start_feed'] = int(params['start_feed'])
-        params['end_feed'] = int(params['end_feed'])
-
-        generator = PatternGenerator(**params)
-        generator.generate_pattern()
-        print('G-code generation completed successfully.')
-
-    except ValueError as error:
+        params = read_params() if params is None else params
+        result = engine.generate(preview=observer is None, observer=observer, **params)
+        print(f'G-code generation completed successfully in {result.seconds * 1000:.0f} ms '
+              f'({result.hits} of {result.hits + result.misses} blocks reused).')
+        if not result.layout_report.ok:
+            print(f'Layout warnings:\n{result.layout_report.summary()}')
+        run_time = result.run_time
+        print(f'Estimated machine time: {run_time.total / 60:.1f} min, '
+              f'rapid travels save {run_time.rapid_saving / 60:.1f} min.')
+
+    except (ValueError, TclError) as error:
         print(f'Invalid value in field: {error}')
 
 
 class ResponsiveApp(Frame):
     """
     A responsive application for generating laser cutting patterns.
+    The generation engine stays warm between clicks of the button.
+    The grid is previewed as the fields change and the program is drawn
+    while a worker thread writes it.
     """
     def __init__(self, master):
         super().__init__(master)
         self.grid(sticky="nsew")
+        self.engine = GenerationEngine()
+        self.worker = None
+        self.pending_layout = None
 
         # Configure grid layout to be responsive
         master.columnconfigure(0, weight=1)
         master.columnconfigure(1, weight=2)
         master.rowconfigure(0, weight=1)
+        self.columnconfigure(2, weight=1)
+        self.rowconfigure(0, weight=1)
 
         # Create frames for image and input
         self.image_frame = Frame(self, width=200, height=400)
@@ -55,6 +86,12 @@ class ResponsiveApp(Frame):
         self.create_image(self.image_frame)
         self.create_entries(fields, self.input_frame)
 
+        self.preview = LivePreview(self)
+        self.preview.grid(row=0, column=2, padx=10, pady=10, sticky="nsew")
+        for variable, _, _ in fields.values():
+            variable.trace_add('write', lambda *args: self.schedule_layout())
+        self.update_layout()
+
     def create_image(self, parent):
         """
         Create and place an image in the specified parent frame.
@@ -74,9 +111,62 @@ class ResponsiveApp(Frame):
             cur_entrybox.grid(column=1, row=c, padx=5, pady=5)
             cur_entrybox.delete(0, 'end')
             cur_entrybox.insert(0, str(fields[i][2]))
-        self.button = ttk.Button(parent, text='Generate G-code', command=generate_g_code)
+        self.button = ttk.Button(parent, text='Generate G-code', command=self.generate)
         self.button.grid(row=c + 1, column=0, columnspan=2, pady=10)
 
+    def generating(self) -> bool:
+        return self.worker is not None and self.worker.is_alive()
+
+    def generate(self):
+        """
+        Generate the G-code in a worker thread, the preview draws it meanwhile.
+        """
+        if self.generating():
+            return
+        try:
+            # Tk variables are read in this thread only.
+            params = read_params()
+            generator = self.engine.generator(**params)
+        except (ValueError, TclError) as error:
+            print(f'Invalid value in field: {error}')
+            return
+        self.preview.start(generator)
+        self.button.state(['disabled'])
+        self.worker = threading.Thread(target=self.run, args=(params,), daemon=True)
+        self.worker.start()
+        self.after(100, self.wait_for_worker)
+
+    def run(self, params: Dict):
+        try:
+            generate_g_code(self.engine, self.preview.observer, params)
+        finally:
+            self.preview.finish()
+
+    def wait_for_worker(self):
+        if self.generating():
+            self.after(100, self.wait_for_worker)
+        else:
+            self.button.state(['!disabled'])
+
+    def schedule_layout(self):
+        if self.pending_layout is not None:
+            self.after_cancel(self.pending_layout)
+        self.pending_layout = self.after(LAYOUT_DELAY, self.update_layout)
+
+    def update_layout(self):
+        """
+        Preview the squares and labels of the values in the fields.
+        Incomplete values are ignored until they are valid.
+        """
+        self.pending_layout = None
+        if self.generating():
+            # The engine is busy, the layout is shown with the next change.
+            return
+        try:
+            self.preview.show_layout(self.engine.generator(**read_params()))
+        except (ValueError, TclError, ArithmeticError, IndexError):
+            pass
+
 
 if __name__ == '__main__':
     root = Tk()
@@ -96,8 +186,12 @@ if __name__ == '__main__':
         'end_power': [IntVar(), 'End power', 1000],
         'start_feed': [IntVar(), 'Start feed', 1000],
         'end_feed': [IntVar(), 'End feed', 5000],
+        'power_distribution': [StringVar(), 'Power distribution', 'geometric'],
+        'feed_distribution': [StringVar(), 'Feed distribution', 'linear'],
         'turn_on_g_code': [StringVar(), 'Turn on G code', 'M4'],
         'turn_off_g_code': [StringVar(), 'Turn off G code', 'M5'],
+        'dialect': [StringVar(), 'G-code dialect', 'custom'],
+        'rapid_travel': [IntVar(), 'Rapid travel G0 (0/1)', 1],
     }
 
     app = ResponsiveApp(root)
@@ -0,0 +1,144 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from utils import dialects as dl
+from utils.packing import Point, order_path, path_length, skyline_pack
+from utils.spatial import Box
+from pattern_generator import PatternGenerator
+
+# Parameters that describe the whole program, every nested job must agree on them.
+PROGRAM_PARAMS = ('dialect', 'turn_on_g_code', 'turn_off_g_code', 'rapid_travel', 'travel_feed',
+                  'compact_gcode', 'leading_zeros', 'fixed_point', 'compression', 'compression_level', 'block_size')
+
+
+class NestedGrid(NamedTuple):
+    """
+    One calibration grid placed on the sheet.
+
+    job: index of the job in the list given to `SheetNest`.
+    generator: generator of the grid at its placed position.
+    extent: x_min, y_min, x_max, y_max of its labels and squares.
+    start: first label, where the program enters the grid.
+    end: top of the last square, where the program leaves the grid.
+    """
+    job: int
+    generator: PatternGenerator
+    extent: Box
+    start: Point
+    end: Point
+
+
+class SheetNest:
+    """
+    Several calibration grids (e.g. different materials or passes per mm)
+    packed onto one bed and burned by a single program.
+
+    Every job is a dictionary of `PatternGenerator` parameters; its footprint
+    is the bounding box of its squares and labels. The footprints are packed
+    with `skyline_pack`, every grid is moved there by shifting its
+    `x_start_pos`/`y_start_pos`, and the grids are ordered with `order_path`
+    so the head travels as little as possible between them.
+
+    Parameters
+    ----------
+    jobs: Sequence[Dict]
+        `PatternGenerator` parameters of every grid, `file_name` is ignored.
+    bed_size: Tuple[float, float]
+        Width and height of the bed in millimeters.
+    file_name: str
+        Output file of the combined program.
+    gap: float
+        Space between grids in millimeters.
+
+    Attributes
+    ----------
+    grids : List[NestedGrid]
+        Placed grids in burning order.
+    """
+
+    def __init__(self, jobs: Sequence[Dict], bed_size: Tuple[float, float],
+                 file_name: str = 'output.nc', gap: float = 5.0):
+        if not jobs:
+            raise ValueError('Nothing to nest, the job list is empty')
+        for name in PROGRAM_PARAMS:
+            values = {repr(job.get(name)) for job in jobs}
+            if len(values) > 1:
+                raise ValueError(f'All nested jobs must use the same {name}, got {", ".join(sorted(values))}')
+        self.bed_size = bed_size
+        self.file_name = file_name
+        self.gap = gap
+
+        generators = [self.generator(job) for job in jobs]
+        extents = [generator.extent() for generator in generators]
+        positions = skyline_pack([(box[2] - box[0], box[3] - box[1]) for box in extents], bed_size, gap)
+
+        placed = []
+        for index, (job, box, (x, y)) in enumerate(zip(jobs, extents, positions)):
+            dx, dy = x - box[0], y - box[1]
+            generator = self.generator(job, generators[index].x_start_pos + dx,
+                                       generators[index].y_start_pos + dy)
+            placed.append(NestedGrid(index, generator, (x, y, box[2] + dx, box[3] + dy),
+                                     self.entry(generator), self.exit(generator)))
+        self.unordered = placed
+        order = order_path([grid.start for grid in placed], [grid.end for grid in placed])
+        self.grids: List[NestedGrid] = [placed[index] for index in order]
+
+    def generator(self, job: Dict, x_start_pos: Optional[float] = None,
+                  y_start_pos: Optional[float] = None) -> PatternGenerator:
+        """
+        Generator of a job writing to the combined file, optionally moved.
+        """
+        params = dict(job, file_name=self.file_name)
+        params.setdefault('x_start_pos', 0.0)
+        params.setdefault('y_start_pos', 0.0)
+        if x_start_pos is not None:
+            params.update(x_start_pos=x_start_pos, y_start_pos=y_start_pos)
+        return PatternGenerator(**params)
+
+    @staticmethod
+    def entry(generator: PatternGenerator) -> Point:
+        _, x_pos, y_pos = next(generator.label_positions())
+        return x_pos, y_pos
+
+    @staticmethod
+    def exit(generator: PatternGenerator) -> Point:
+        lattice = generator.lattice()
+        x_origin, y_origin = lattice.origins[-1]
+        return x_origin, y_origin + (lattice.rows - 1) * lattice.y_pitch + lattice.length
+
+    def travel(self, grids: Optional[Sequence[NestedGrid]] = None) -> float:
+        """
+        Travel between the grids in millimeters, in burning order or in the order of `grids`.
+        """
+        grids = self.grids if grids is None else grids
+        return path_length(range(len(grids)), [grid.start for grid in grids], [grid.end for grid in grids])
+
+    def __iter__(self) -> Iterator[NestedGrid]:
+        return iter(self.grids)
+
+    def __len__(self) -> int:
+        return len(self.grids)
+
+    def write_program(self):
+        """
+        Write the combined program, see `write_grids`.
+        """
+        write_grids([grid.generator for grid in self.grids], self.file_name)
+
+
+def write_grids(generators: Sequence[PatternGenerator], file_name: str):
+    """
+    Write several grids as one program: one preamble, the labels and squares
+    of every grid in the given order and one end of the program. The grids
+    share the output session and the dialect of the first one, so the modal
+    state carries over; the label power and feed are set again before each
+    grid after the first one.
+    """
+    first = generators[0]
+    loc = first.loc
+    with loc.session(file_name, first.compression, first.compression_level, first.block_size):
+        first.initialize_file()
+        for number, generator in enumerate(generators):
+            generator.loc, generator.dialect = loc, first.dialect
+            if number:
+                loc.write_power_speed(file_name, dl.LABEL_POWER, dl.LABEL_SPEED)
+            generator.write_blocks()
+        loc.end(file_name)
@@ -1,6 +1,41 @@
-from utils import engraving as e, moves as m, Divider as d, EngrCords as r
+from __future__ import annotations
+from functools import partial
+from io import StringIO
+from itertools import groupby
+from math import cos, radians, sin
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from utils.lazy import lazy_import
+from utils import engraving as e, moves as m, Divider as d, EngrCords as r, dialects as dl, gcode_io as gio
+from utils.sweep import ParameterSweep, SweepPoint
+from utils.spatial import Box, Footprint, FootprintList, Lattice, LayoutReport, check_layout, union
+from utils.async_sink import AsyncSink
+from utils.block_cache import BlockCache
+from utils.resume import Block, ResumeIndex
+from utils.sequencing import ProgramBlock, TravelReport, serpentine, travel
+from utils.packing import Point
+from utils.runtime import RunTimeModel, RunTime
 from utils.plot_file import plot_file
 
+asyncio = lazy_import('asyncio')
+np = lazy_import('numpy')
+
+
+# Font of the power and speed labels, parsed lazily glyph by glyph.
+FONT_FILE = "fonts/normal.cxf"
+
+# Ways of burning the squares, see `PatternGenerator.fill`.
+FILLS = ('snake', 'raster', 'rows', 'hatch')
+
+# Orders of the labels and squares, see `PatternGenerator.sequence`.
+SEQUENCES = ('grid', 'serpentine')
+
+# Square parameters that can be swept on top of power (columns) and speed (rows).
+SWEEP_AXES = ('line_interval', 'passes', 'overscan', 'hatch_angle')
+
+# Parameters that choose where and how the program is stored or shown, not what it burns.
+OUTPUT_PARAMS = ('file_name', 'compression', 'compression_level', 'block_size', 'preview', 'observer',
+                 'resume_index')
+
 
 class PatternGenerator:
     """
@@ -18,6 +53,63 @@ class PatternGenerator:
         Space between squares in the pattern in millimeters.
     passes_per_mm : int
         Number of laser passes per millimeter.
+    fill : str
+        'snake' for the original square fill, 'raster' for scan lines with
+        `line_interval`, `overscan` and `unidirectional` support, 'rows' for
+        raster scan lines crossing every square of a grid row, with the power
+        changed inline at the square boundaries (best with 'grbl-laser'),
+        'hatch' for scan lines at `hatch_angle`, clipped to the square.
+    line_interval : Optional[float]
+        Distance between raster scan lines in millimeters, 1 / passes_per_mm when None.
+    overscan : float
+        Laser off run-in and run-out of raster scan lines in millimeters.
+    unidirectional : bool
+        Burn every raster scan line in the same direction.
+    hatch_angle : float
+        Direction of the 'hatch' scan lines in degrees from the X-axis.
+    cross_hatch : bool
+        Burn a second 'hatch' pass at `hatch_angle` + 90 degrees.
+    sweep : Optional[Dict[str, Sequence]]
+        Extra swept parameters, e.g. {'line_interval': [0.1, 0.05], 'passes': [1, 2]}.
+        Every extra axis tiles copies of the power x speed grid, with their own
+        labels, alternately along X and Y. Allowed names are in SWEEP_AXES.
+    tile_gap : Optional[float]
+        Space between tiled sub-grids in millimeters, `space` when None.
+    font : str
+        Font of the labels: a cxf, Hershey jhf or SVG font file. The single-stroke
+        'fonts/digits.jhf' needs fewer moves per label than the default cxf font.
+    characters : Optional[Mapping]
+        Font already loaded from `font`, e.g. kept by a `GenerationEngine`
+        between generations. Loaded on first use when None.
+    bed_size : Optional[Tuple[float, float]]
+        Width and height of the machine bed in millimeters, moves outside it are
+        reported by `verify_layout`. Not checked when None.
+    min_clearance : float
+        Distance in millimeters labels and squares must keep from each other.
+    preview : Union[bool, Callable[[str], None]]
+        Show the program after `generate_pattern`: True plots it with `plot_file`
+        (importing matplotlib), a callable is called with the file name instead.
+        Off by default, so headless jobs never load matplotlib.
+    observer : Optional[Callable[[str], None]]
+        Called with the program text in batches while it is written, e.g. by
+        the live preview of the app. The program is the same with or without it.
+    fixed_point : Optional[int]
+        Decimal places of integer fixed-point coordinates, e.g. 3 for microns:
+        square and label positions are exact and written as decimal text.
+        None keeps the float coordinates of the original generator.
+    sequence : str
+        Order of the labels and squares: 'grid' burns all labels first and
+        every row from its left end, 'serpentine' reverses every other row,
+        burns the speed label of a row next to its end and reports the
+        travel saved by `travel_report`. Powers and speeds are not changed.
+    resume_index : bool
+        Write a resume index beside the program (see `utils.resume`), so an
+        interrupted job can be continued at any square. Needs an uncompressed file.
+    block_cache : Optional[BlockCache]
+        Cache of rendered labels and squares shared between generators, see
+        `utils.block_cache`. Blocks are rendered every time when None.
+    layout_report : Optional[LayoutReport]
+        Result of the layout verification of the last `generate_pattern`.
     x_start_pos : float
         Starting X position for the pattern.
     y_start_pos : float
@@ -34,26 +126,106 @@ class PatternGenerator:
         Starting feed rate.
     end_feed : int
         Ending feed rate.
+    power_distribution : Union[None, str, Sequence]
+        Spacing of the power values: None for the original truncated linear steps,
+        'linear', 'geometric' (logarithmic), 'power' or an explicit list of values.
+    feed_distribution : Union[None, str, Sequence]
+        Spacing of the feed values, like `power_distribution`.
+    power_step : Optional[float]
+        Power values are rounded to multiples of this step, None keeps floats.
+    feed_step : Optional[float]
+        Feed values are rounded to multiples of this step, None keeps floats.
+    distribution_exponent : float
+        Exponent of the 'power' distribution.
     turn_on_g_code : str
         G-code command to turn on the laser.
     turn_off_g_code : str
         G-code command to turn off the laser.
+    dialect : str
+        G-code dialect: 'custom' wraps burning moves with turn_on_g_code/turn_off_g_code,
+        'grbl-laser', 'grbl-classic', 'marlin' and 'linuxcnc' write the most compact
+        program for that controller and ignore the turn on/off commands.
+    rapid_travel : Optional[bool]
+        Write laser off moves (between characters, between squares and between
+        raster lines) as G0. None uses the dialect default: off for 'custom',
+        on for the controller profiles.
+    travel_feed : Optional[int]
+        Feed written on G0 travels for controllers that need it.
+    compact_gcode : Optional[bool]
+        Write only the words that change: no repeated G0/G1, no unchanged
+        axis and no trailing whitespace. None uses the dialect default (off).
+    leading_zeros : bool
+        Write the zero of coordinates below 1, False writes 'X.5'.
+    compression : Optional[str]
+        Output compression: 'gzip', 'xz', 'zstd', 'none' or None to guess
+        it from the file name suffix (e.g. '.nc.gz').
+    compression_level : Optional[int]
+        Compression level, the codec default when None.
+    block_size : Optional[int]
+        Size in bytes of the write buffer in front of the compressor.
 
     Methods
     -------
     generate_pattern():
         Generates the complete laser cutting pattern.
+    write_program():
+        Writes the program without the preview.
+    show_preview():
+        Shows the written program as set by `preview`.
+    load_font():
+        Returns the font of the labels, loaded once.
+    close_font():
+        Releases the font file when the generator loaded the font.
+    iter_blocks():
+        Generates the program lazily block by block.
+    iter_indexed_blocks():
+        Generates the blocks with their resume index entries.
+    program_blocks():
+        Returns the labels and squares in burning order.
+    travel_report():
+        Returns the travel between blocks in grid order and in the chosen order.
+    agenerate():
+        Asynchronously generates the program block by block.
+    awrite_program():
+        Asynchronously writes the program through an AsyncSink.
     initialize_file():
         Initializes the output file by writing the start coordinates.
     etch_power_speed_values():
         Engraves power and speed values onto the pattern.
     generate_snake_paths():
         Generates the snake paths for the pattern.
+    parameter_sweep():
+        Returns the lazy sweep of squares and their parameters.
+    estimate_run_time():
+        Estimates the machine time of the generated file.
+    verify_layout():
+        Reports overlapping labels and squares and moves outside the bed.
+    extent():
+        Returns the bounding box of the labels and squares.
     """
     def __init__(self, file_name: str, length: float, width: float, space: float, passes_per_mm: int,
                  x_start_pos: float, y_start_pos: float, x_squares: int, y_squares: int,
                  start_power: int, end_power: int, start_feed: int, end_feed: int,
-                 turn_on_g_code: str, turn_off_g_code: str):
+                 turn_on_g_code: str, turn_off_g_code: str, dialect: str = 'custom',
+                 power_distribution: Union[None, str, Sequence] = None,
+                 feed_distribution: Union[None, str, Sequence] = None,
+                 power_step: Optional[float] = 1, feed_step: Optional[float] = 1,
+                 distribution_exponent: float = 2.0,
+                 rapid_travel: Optional[bool] = None, travel_feed: Optional[int] = None,
+                 compact_gcode: Optional[bool] = None, leading_zeros: bool = True,
+                 fill: str = 'snake', line_interval: Optional[float] = None,
+                 overscan: float = 0.0, unidirectional: bool = False,
+                 hatch_angle: float = 45.0, cross_hatch: bool = False,
+                 sweep: Optional[Dict[str, Sequence]] = None, tile_gap: Optional[float] = None,
+                 font: str = FONT_FILE, characters: Optional[Mapping] = None,
+                 bed_size: Optional[Tuple[float, float]] = None, min_clearance: float = 0.0,
+                 fixed_point: Optional[int] = None,
+                 preview: Union[bool, Callable[[str], None]] = False,
+                 observer: Optional[Callable[[str], None]] = None,
+                 sequence: str = 'grid', resume_index: bool = False,
+                 block_cache: Optional[BlockCache] = None,
+                 compression: Optional[str] = None,
+                 compression_level: Optional[int] = None, block_size: Optional[int] = None):
         self.file_name = file_name
         self.length = length
         self.width = width
@@ -69,20 +241,183 @@ class PatternGenerator:
         self.end_feed = end_feed
         self.turn_on_g_code = turn_on_g_code
         self.turn_off_g_code = turn_off_g_code
-        self.loc = m.Location((x_start_pos, y_start_pos), file_name)
-        self.power_list = d.Divider().values(start_power, end_power, y_squares)
-        self.speed_list = d.Divider().values(start_feed, end_feed, x_squares)
+        self.dialect = dl.get_dialect(dialect, turn_on_g_code, turn_off_g_code,
+                                      rapid_travel, travel_feed, compact_gcode, leading_zeros)
+        if fill not in FILLS:
+            raise ValueError(f'Unknown fill: {fill}. Use one of: {", ".join(FILLS)}')
+        self.fill = fill
+        self.line_interval = line_interval or 1 / passes_per_mm
+        self.overscan = overscan
+        self.unidirectional = unidirectional
+        self.hatch_angle = hatch_angle
+        self.cross_hatch = cross_hatch
+        self.sweep = dict(sweep or {})
+        for name in self.sweep:
+            if name not in SWEEP_AXES:
+                raise ValueError(f'Cannot sweep {name}. Use one of: {", ".join(SWEEP_AXES)}')
+        if sequence not in SEQUENCES:
+            raise ValueError(f'Unknown sequence: {sequence}. Use one of: {", ".join(SEQUENCES)}')
+        self.sequence = sequence
+        self.tile_gap = space if tile_gap is None else tile_gap
+        self.font = font
+        self.characters = characters
+        self.owns_font = False
+        self.bed_size = bed_size
+        self.min_clearance = min_clearance
+        self.fixed_point = fixed_point
+        self.preview = preview
+        self.observer = observer
+        self.layout_report = None
+        self.compression = compression
+        self.resume_index = resume_index
+        if resume_index and (gio.compression_from_name(file_name) if compression is None
+                             else compression) not in (None, 'none'):
+            raise ValueError('A resume index needs an uncompressed program, '
+                             'compressed files cannot be continued at an offset')
+        self.compression_level = compression_level
+        self.block_size = block_size
+        self.loc = m.Location((x_start_pos, y_start_pos), file_name, self.dialect, fixed_point)
+        self.distribution_exponent = distribution_exponent
+        self.power_list = self.divide(start_power, end_power, y_squares, power_distribution, power_step)
+        self.speed_list = self.divide(start_feed, end_feed, x_squares, feed_distribution, feed_step)
+        self.block_cache = block_cache
+        if block_cache is not None:
+            block_cache.bind(self.render_settings())
+
+    def render_settings(self) -> Tuple:
+        """
+        Settings the G-code of a label or square depends on besides its own
+        parameters and the dialect state, see `utils.block_cache`.
+        """
+        return (self.dialect.name, self.width, self.length, self.passes_per_mm, self.fill,
+                self.line_interval, self.overscan, self.unidirectional, self.hatch_angle, self.cross_hatch,
+                self.font, self.fixed_point,
+                self.turn_on_g_code, self.turn_off_g_code)
+
+    def load_font(self) -> Mapping:
+        """
+        Font of the labels, loaded once unless it was given as `characters`.
+        """
+        if self.characters is None:
+            self.characters = e.load_font(self.font)
+            self.owns_font = True
+        return self.characters
+
+    def close_font(self):
+        """
+        Release the font file when the generator loaded the font itself.
+        A font given as `characters` belongs to the caller and stays open.
+        """
+        if self.owns_font and hasattr(self.characters, 'close'):
+            self.characters.close()
+
+    def divide(self, start: float, end: float, steps: int,
+               distribution: Union[None, str, Sequence], step: Optional[float]) -> list:
+        """
+        Spread power or feed values with the chosen distribution.
+
+        Parameters
+        ----------
+        start: float
+            Start of the range.
+        end: float
+            End of the range.
+        steps: int
+            Number of values.
+        distribution: Union[None, str, Sequence]
+            None for the original truncated linear values, a distribution name
+            of `Divider.distribute` or an explicit list of values.
+        step: Optional[float]
+            Rounding step of the values.
+
+        Returns
+        -------
+        values: list
+            Power or feed values.
+        """
+        divider = d.Divider()
+        if distribution is None:
+            return divider.values(start, end, steps)
+        if isinstance(distribution, str):
+            return divider.distribute(start, end, steps, distribution, step, self.distribution_exponent)
+        return divider.distribute(start, end, steps, 'explicit', step, explicit=distribution)
 
     def generate_pattern(self):
         """
         Generate the complete laser engraving pattern by initializing the file,
         etching power and speed values, and generating the snake paths.
+        The layout is verified first, see `layout_report`, and the program
+        is shown afterwards when `preview` is set.
+        """
+        self.layout_report = self.verify_layout()
+        self.write_program()
+        self.show_preview()
+
+    def show_preview(self):
+        """
+        Show the written program as set by `preview`.
+        """
+        if callable(self.preview):
+            self.preview(self.file_name)
+        elif self.preview:
+            plot_file(self.file_name)
+
+    def write_program(self):
+        """
+        Write the whole program to the output file without the preview.
+
+        Squares and labels are generated one at a time and streamed to the
+        file, so memory use does not grow with the grid size. With
+        `resume_index` the index of the blocks is saved beside the file.
+        A font loaded by the generator is closed afterwards, see `close_font`.
+        """
+        try:
+            if self.resume_index:
+                self.write_indexed_program()
+                return
+            with self.loc.session(self.file_name, self.compression,
+                                  self.compression_level, self.block_size, self.observer):
+                self.initialize_file()
+                self.write_blocks()
+                self.loc.end(self.file_name)
+        finally:
+            self.close_font()
+
+    def write_blocks(self):
+        """
+        Write the labels and squares to the program file in the order of `sequence`.
         """
-        self.initialize_file()
-        self.etch_power_speed_values()
-        self.generate_snake_paths()
+        if self.block_cache is not None:
+            out = self.loc.output(self.file_name)
+            for kind, info, write in self.program_blocks():
+                out.write(self.render_block(kind, info, write))
+            return
+        if self.sequence == 'grid':
+            self.etch_power_speed_values()
+            self.generate_snake_paths()
+            return
+        for _, _, write in self.program_blocks():
+            write(None)
 
-        plot_file(self.file_name)
+    def write_indexed_program(self) -> ResumeIndex:
+        """
+        Write the program block by block and save its resume index.
+        The file is written in binary, so the offsets are exact byte positions.
+        """
+        blocks = []
+        with open(self.file_name, 'wb') as f:
+            for block, text in self.iter_indexed_blocks():
+                f.write(text.encode('ascii'))
+                if self.observer is not None:
+                    self.observer(text)
+                blocks.append(block)
+        index = ResumeIndex(self.file_name, dict(name=self.dialect.name, turn_on=self.dialect.turn_on,
+                                                 turn_off=self.dialect.turn_off, rapid=self.dialect.rapid,
+                                                 travel_feed=self.dialect.travel_feed,
+                                                 compact=self.dialect.compact,
+                                                 leading_zeros=self.dialect.leading_zeros), blocks)
+        index.save()
+        return index
 
     def initialize_file(self):
         """
@@ -90,50 +425,487 @@ class PatternGenerator:
         """
         self.loc.start(self.file_name)
 
-    def etch_power_speed_values(self):
+    def etch_power_speed_values(self, out=None):
         """
         Etch power and speed values into the material by generating coordinates
         for each value and engraving the corresponding text.
+
+        Parameters
+        ----------
+        out: Union[str, TextIO, None]
+            Output file name or stream, the program file when None.
+        """
+        characters = self.load_font()
+        for value, x_pos, y_pos in self.label_positions():
+            self.engrave_label(characters, value, x_pos, y_pos, out)
+
+    def label_positions(self) -> Iterator[Tuple[object, float, float]]:
+        """
+        Yield every power and speed label with its position.
+        Every tiled sub-grid gets its own labels.
         """
-        characters = e.read_font("fonts/normal.cxf")
-        ec = r.EngrCords()
+        sweep = self.parameter_sweep()
+        for tile_x, tile_y, _, _ in sweep.tile_origins():
+            # Iterate over the generated engraving coordinates
+            for key, (x_pos, y_pos) in self.tile_labels(sweep, tile_x, tile_y).items():
+                yield key[0], x_pos, y_pos
+
+    def tile_labels(self, sweep: ParameterSweep, tile_x: int,
+                    tile_y: int) -> Dict[Tuple[object, str], Tuple[float, float]]:
+        """
+        Power ('p') and speed ('s') labels of one sub-grid with their positions.
+        """
+        ec = r.EngrCords(self.fixed_point)
 
         # Generate engraving coordinates for power and speed values
-        engr_coords = ec.engr_coords(self.x_start_pos, self.y_start_pos,
-                                     self.width, self.length, self.space,
-                                     self.power_list, self.speed_list)
-        print("Engraving Coordinates:", engr_coords)
+        return ec.engr_coords(self.x_start_pos + tile_x * sweep.tile_x_pitch,
+                              self.y_start_pos + tile_y * sweep.tile_y_pitch,
+                              self.width, self.length, self.space,
+                              self.power_list, self.speed_list)
+
+    def engrave_label(self, characters: Dict, value, x_pos: float, y_pos: float, out=None,
+                      after_square: bool = False):
+        """
+        Engrave one power or speed value.
 
-        # Iterate over the generated engraving coordinates
-        for key, (x_pos, y_pos) in engr_coords.items():
-            text = e.engr_text(str(key[0]), x_pos, y_pos, self.width / 4)
+        Parameters
+        ----------
+        characters: Dict
+            Font used for the labels.
+        value: Union[int, float]
+            Value to engrave.
+        x_pos: float
+            Start of the label on the x-axis.
+        y_pos: float
+            Start of the label on the y-axis.
+        out: Union[str, TextIO, None]
+            Output file name or stream, the program file when None.
+        after_square: bool
+            The label follows a square (in serpentine order), the label power
+            and feed are set again first.
+        """
+        out = self.loc.output(self.file_name) if out is None else out
+        if after_square:
+            self.loc.write_power_speed(out, dl.LABEL_POWER, dl.LABEL_SPEED)
+        text = e.engr_text(str(value), x_pos, y_pos, self.width / 4)
 
-            # Engrave each character of the generated text
-            for char, pos in text.items():
-                e.engrave(char, pos[0], pos[1], characters, self.file_name,
-                          self.width, self.turn_on_g_code, self.turn_off_g_code)
+        # Engrave each character of the generated text
+        for char, pos in text.items():
+            e.engrave(char, pos[0], pos[1], characters, out,
+                      self.width, self.turn_on_g_code, self.turn_off_g_code, self.dialect, self.loc.fixed)
 
-    def generate_snake_paths(self):
+    def parameter_sweep(self) -> ParameterSweep:
         """
-        Generates the snake paths for the pattern.
+        Lazy sweep of all squares: power across columns, speed across rows
+        and the extra `sweep` axes tiled into sub-grids. Every sub-grid
+        leaves room for its labels like the single grid does.
 
-        This method initializes the EngrCords instance, generates the iterator for
-        power and speed values, and creates snake paths for each square in the pattern.
+        Returns
+        -------
+        sweep: ParameterSweep
+            Sweep yielding the position and parameters of every square.
         """
-        ec = r.EngrCords()
+        ec = r.EngrCords(self.fixed_point)
         x_start_patt, y_start_patt = ec.pattern_start(self.x_start_pos, self.y_start_pos,
                                                       self.width, self.length, self.space)
+        axes = {'power': self.power_list, 'speed': self.speed_list}
+        axes.update(self.sweep)
+        x_pitch = self.width + self.space
+        y_pitch = self.length + self.space
+        return ParameterSweep(axes, x_start_patt, y_start_patt, x_pitch, y_pitch,
+                              (len(self.power_list) + 1) * x_pitch + self.tile_gap,
+                              (len(self.speed_list) + 1) * y_pitch + self.tile_gap)
+
+    def estimate_run_time(self, model: Optional[RunTimeModel] = None) -> RunTime:
+        """
+        Estimate the machine time of the generated file and the time
+        saved by running the travels as G0.
+
+        Parameters
+        ----------
+        model: Optional[RunTimeModel]
+            Machine time model, the default model when None.
+
+        Returns
+        -------
+        run_time: RunTime
+            Estimated total time, G0 time and G0 time at the cutting feed.
+        """
+        return (model or RunTimeModel()).estimate_file(self.file_name)
+
+    def label_table(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Values and positions of all labels as compact columns.
+        """
+        values, x_pos, y_pos = [], [], []
+        for value, x, y in self.label_positions():
+            values.append(value)
+            x_pos.append(x)
+            y_pos.append(y)
+        return np.array(values), np.array(x_pos), np.array(y_pos)
+
+    def label_footprint(self, characters: Dict, value, x_pos: float, y_pos: float) -> Footprint:
+        """
+        Burned lines of one label, placed like `engrave_label` does.
+        """
+        text = e.engr_text(str(value), x_pos, y_pos, self.width / 4)
+        lines = [np.asarray(characters[char[0]], dtype=float).reshape(-1, 4) * self.width + [x, y, x, y]
+                 for char, (x, y) in text.items()]
+        return Footprint(f'label {value} at ({x_pos:g}, {y_pos:g})', np.concatenate(lines))
+
+    def lattice(self, overscan: bool = True) -> Lattice:
+        """
+        Squares of the parameter sweep as a `Lattice`, without the raster
+        overscan if `overscan` is False.
+        """
+        sweep = self.parameter_sweep()
+        x_overscan = y_overscan = 0.0
+        if overscan and self.fill != 'snake':
+            x_overscan = max(self.sweep.get('overscan', [self.overscan]))
+        if overscan and self.fill == 'hatch':
+            # Overscan runs along the scan lines of every angle burned.
+            angles = [radians(angle + turn) for angle in self.sweep.get('hatch_angle', [self.hatch_angle])
+                      for turn in ((0, 90) if self.cross_hatch else (0,))]
+            x_overscan, y_overscan = (x_overscan * max(abs(cos(angle)) for angle in angles),
+                                      x_overscan * max(abs(sin(angle)) for angle in angles))
+        return Lattice([(x, y) for _, _, x, y in sweep.tile_origins()],
+                       len(sweep.values[0]), len(sweep.values[1]), sweep.x_pitch, sweep.y_pitch,
+                       self.width, self.length, x_overscan, y_overscan)
+
+    def extent(self, overscan: bool = True) -> Box:
+        """
+        x_min, y_min, x_max, y_max of all labels and squares, raster overscan
+        included unless `overscan` is False: the laser is off on the overscan,
+        it leaves no mark on the material.
+        """
+        characters = self.load_font()
+        boxes = [self.label_footprint(characters, value, x_pos, y_pos).bbox
+                 for value, x_pos, y_pos in self.label_positions()]
+        return union(boxes + [self.lattice(overscan).extent])
+
+    def verify_layout(self, bed_size: Optional[Tuple[float, float]] = None,
+                      min_clearance: Optional[float] = None) -> LayoutReport:
+        """
+        Check the labels and squares with a spatial index: overlaps, footprints
+        closer than the clearance and moves outside the bed.
+
+        Parameters
+        ----------
+        bed_size: Optional[Tuple[float, float]]
+            Bed width and height, `self.bed_size` when None.
+        min_clearance: Optional[float]
+            Required clearance, `self.min_clearance` when None.
 
-        iterator = iter(m.PowerSpeedIterator(self.y_squares, self.x_squares,
-                                             x_start_patt, y_start_patt,
-                                             self.width, self.length, self.space,
-                                             self.speed_list, self.power_list))
-        for _ in range(self.x_squares * self.y_squares):
-            x_pos, y_pos, power, speed = iterator.x_pos, iterator.y_pos, iterator.power, iterator.speed
-            self.loc.snake_path(x_pos, y_pos, power, speed, self.width, self.length,
-                                self.passes_per_mm, self.file_name,
-                                self.turn_on_g_code, self.turn_off_g_code)
-            next(iterator)
+        Returns
+        -------
+        report: LayoutReport
+            Problems found and the smallest clearance between neighbours.
+        """
+        values, x_pos, y_pos = self.label_table()
+        characters = self.load_font()
+        labels = FootprintList(lambda *label: self.label_footprint(characters, *label),
+                               values, x_pos, y_pos)
+        return check_layout(labels, self.lattice(),
+                            self.bed_size if bed_size is None else bed_size,
+                            self.min_clearance if min_clearance is None else min_clearance)
+
+    def generate_snake_paths(self):
+        """
+        Generates the snake paths for the pattern.
+
+        This method walks the parameter sweep and creates snake paths
+        (or raster fills) for each square in the pattern, or one raster
+        fill for each row of squares with the 'rows' fill.
+        """
+        if self.fill == 'rows':
+            for row in self.parameter_rows():
+                self.burn_row(row)
+            return
+        for point in self.parameter_sweep():
+            self.burn_square(point.x, point.y, point.params)
+
+    def parameter_rows(self) -> Iterator[List[SweepPoint]]:
+        """
+        Yield the squares of the parameter sweep row by row. The squares of a
+        row have the same speed and extra parameters, only the power changes.
+        """
+        for _, row in groupby(self.parameter_sweep(), key=lambda point: (point.tile, point.y)):
+            yield list(row)
+
+    def burn_row(self, row: Sequence[SweepPoint], out=None):
+        """
+        Burn one row of squares with scan lines crossing the whole row.
+
+        Parameters
+        ----------
+        row: Sequence[SweepPoint]
+            Squares of the row from left to right, see `parameter_rows`.
+        out: Union[str, TextIO, None]
+            Output file name or stream, the program file when None.
+        """
+        out = self.file_name if out is None else out
+        params = row[0].params
+        powers = [point.params['power'] for point in row]
+        for _ in range(params.get('passes', 1)):
+            self.loc.row_raster([point.x for point in row], row[0].y, powers, params['speed'],
+                                self.width, self.length, params.get('line_interval', self.line_interval),
+                                out, self.turn_on_g_code, self.turn_off_g_code,
+                                params.get('overscan', self.overscan), self.unidirectional)
+
+    def burn_square(self, x_pos: float, y_pos: float, params: Dict, out=None):
+        """
+        Burn one square with its swept parameters.
+
+        Parameters
+        ----------
+        x_pos: float
+            Start position of the square on the x-axis.
+        y_pos: float
+            Start position of the square on the y-axis.
+        params: Dict
+            Square parameters: 'power', 'speed' and optionally the SWEEP_AXES.
+        out: Union[str, TextIO, None]
+            Output file name or stream, the program file when None.
+        """
+        out = self.file_name if out is None else out
+        power, speed = params['power'], params['speed']
+        line_interval = params.get('line_interval', self.line_interval)
+        overscan = params.get('overscan', self.overscan)
+        for _ in range(params.get('passes', 1)):
+            if self.fill == 'raster':
+                self.loc.raster_fill(x_pos, y_pos, power, speed, self.width, self.length,
+                                     line_interval, out,
+                                     self.turn_on_g_code, self.turn_off_g_code,
+                                     overscan, self.unidirectional)
+            elif self.fill == 'hatch':
+                self.loc.hatch_fill(x_pos, y_pos, power, speed, self.width, self.length,
+                                    line_interval, out, self.turn_on_g_code, self.turn_off_g_code,
+                                    params.get('hatch_angle', self.hatch_angle), self.cross_hatch,
+                                    overscan, self.unidirectional)
+            else:
+                passes_per_mm = 1 / line_interval if 'line_interval' in params else self.passes_per_mm
+                self.loc.snake_path(x_pos, y_pos, power, speed, self.width, self.length,
+                                    passes_per_mm, out,
+                                    self.turn_on_g_code, self.turn_off_g_code)
+
+    def render(self, write: Callable) -> str:
+        """
+        Run `write(out)` against an in-memory stream and return the G-code.
+        """
+        out = StringIO()
+        write(out)
+        return out.getvalue()
+
+    def render_block(self, kind: str, info: Dict, write: Callable) -> str:
+        """
+        `render` a label, square or row, through `block_cache` when it is set.
+        """
+        if self.block_cache is None:
+            return self.render(write)
+        return self.block_cache.render(kind, info, self.dialect, partial(self.render, write))
+
+    def iter_blocks(self) -> Iterator[str]:
+        """
+        Generate the program lazily as text blocks: the preamble, every label,
+        every square and the end of the program. Every block is computed only
+        when it is requested, concatenated they form the program written
+        by `write_program`.
+
+        Yields
+        ------
+        block: str
+            G-code of the next block.
+        """
+        for _, block in self.iter_indexed_blocks():
+            yield block
+
+    def iter_indexed_blocks(self) -> Iterator[Tuple[Block, str]]:
+        """
+        `iter_blocks` with the resume index entry of every block: its kind,
+        byte offset and the modal state of the dialect where it starts.
+
+        Yields
+        ------
+        entry: Tuple[Block, str]
+            Index entry and G-code of the next block.
+        """
+        offset = 0
+        numbers = {}
+
+        def indexed(kind: str, info: Dict, write: Callable) -> Tuple[Block, str]:
+            nonlocal offset
+            number = numbers.get(kind, 0)
+            numbers[kind] = number + 1
+            state = self.dialect.state()
+            text = self.render(write) if kind in ('preamble', 'end') else self.render_block(kind, info, write)
+            block = Block(kind, number, offset, state, info)
+            offset += len(text)  # G-code is ASCII, one byte per character
+            return block, text
+
+        self.loc.loc = (self.x_start_pos, self.y_start_pos)
+        yield indexed('preamble', {}, self.loc.start)
+        for kind, info, write in self.program_blocks():
+            yield indexed(kind, info, write)
+        yield indexed('end', {}, self.loc.end)
+
+    def program_blocks(self) -> Iterator[Tuple[str, Dict, Callable]]:
+        """
+        Labels and squares (rows of squares with the 'rows' fill) in the
+        order of `sequence`, as their kind, their parameters and a function
+        writing them to an output file name or stream (the program when None).
+        """
+        if self.sequence == 'serpentine':
+            for block in self.sequenced_blocks():
+                yield block.kind, block.info, block.write
+            return
+        yield from self.grid_blocks()
+
+    def grid_blocks(self) -> Iterator[Tuple[str, Dict, Callable]]:
+        """
+        `program_blocks` in grid order: all labels, then the squares row by row.
+        """
+        characters = self.load_font()
+        for value, x_pos, y_pos in self.label_positions():
+            yield self.label_block(characters, value, x_pos, y_pos)
+        if self.fill == 'rows':
+            for row in self.parameter_rows():
+                yield self.row_block(row)
+        else:
+            for point in self.parameter_sweep():
+                yield self.square_block(point)
+
+    def label_block(self, characters: Dict, value, x_pos: float, y_pos: float) -> Tuple[str, Dict, Callable]:
+        return 'label', {'value': value, 'x': x_pos, 'y': y_pos}, \
+            partial(self.engrave_label, characters, value, x_pos, y_pos)
+
+    def square_block(self, point: SweepPoint) -> Tuple[str, Dict, Callable]:
+        return 'square', dict(point.params, x=point.x, y=point.y), \
+            partial(self.burn_square, point.x, point.y, point.params)
+
+    def row_block(self, row: Sequence[SweepPoint]) -> Tuple[str, Dict, Callable]:
+        return 'row', dict(row[0].params, power=[point.params['power'] for point in row],
+                           x=[point.x for point in row], y=row[0].y), partial(self.burn_row, row)
+
+    def block_ends(self, characters: Dict, kind: str, info: Dict) -> Tuple[Point, Point]:
+        """
+        First and last point of a label, square or row block.
+        """
+        if kind == 'label':
+            lines = self.label_footprint(characters, info['value'], info['x'], info['y']).lines
+            return (float(lines[0, 0]), float(lines[0, 1])), (float(lines[-1, 2]), float(lines[-1, 3]))
+        line_interval = info.get('line_interval', self.line_interval)
+        overscan = info.get('overscan', self.overscan)
+        if kind == 'row':
+            x, y, _, _ = m.row_raster_path(info['x'], info['y'], self.width, self.length, line_interval,
+                                           overscan, self.unidirectional)
+        elif self.fill == 'raster':
+            x, y, _ = m.raster_path(info['x'], info['y'], self.width, self.length, line_interval,
+                                    overscan, self.unidirectional)
+        elif self.fill == 'hatch':
+            x, y, _ = m.square_hatch_path(info['x'], info['y'], self.width, self.length, line_interval,
+                                          info.get('hatch_angle', self.hatch_angle), self.cross_hatch,
+                                          overscan, self.unidirectional)
+        else:
+            # Snake paths start at the lower left corner and end above it.
+            passes_per_mm = 1 / line_interval if 'line_interval' in info else self.passes_per_mm
+            steps = int((self.length * passes_per_mm) / 2)
+            return (info['x'], info['y']), (info['x'], info['y'] + 2 * steps / passes_per_mm)
+        if not len(x):
+            return (info['x'], info['y']), (info['x'], info['y'])
+        return (float(x[0]), float(y[0])), (float(x[-1]), float(y[-1]))
+
+    def sequenced_blocks(self) -> List[ProgramBlock]:
+        """
+        Blocks in serpentine order. Every sub-grid is burned lane by lane:
+        its power labels, then every row of squares with its speed label at
+        the left end, each lane in the direction with less travel
+        (see `sequencing.serpentine`). The squares keep their parameters,
+        a label following a square sets the label power and feed again.
+        """
+        characters = self.load_font()
+
+        def block(kind: str, info: Dict, write: Callable) -> ProgramBlock:
+            return ProgramBlock(kind, info, write, *self.block_ends(characters, kind, info))
+
+        rows = {}
+        for row in self.parameter_rows():
+            lane = [block(*self.row_block(row))] if self.fill == 'rows' else \
+                [block(*self.square_block(point)) for point in row]
+            rows.setdefault(row[0].tile, []).append(lane)
+        sweep = self.parameter_sweep()
+        lanes = []
+        for tile_x, tile_y, _, _ in sweep.tile_origins():
+            labels = self.tile_labels(sweep, tile_x, tile_y)
+            power = [block(*self.label_block(characters, value, x_pos, y_pos))
+                     for (value, kind), (x_pos, y_pos) in labels.items() if kind == 'p']
+            speed = [block(*self.label_block(characters, value, x_pos, y_pos))
+                     for (value, kind), (x_pos, y_pos) in labels.items() if kind == 's']
+            lanes.append(power)
+            for number, lane in enumerate(rows.get((tile_x, tile_y), [])):
+                lanes.append(speed[number:number + 1] + lane)
+        ordered = serpentine(lanes, (self.x_start_pos, self.y_start_pos))
+        for number in range(1, len(ordered)):
+            current = ordered[number]
+            if current.kind == 'label' and ordered[number - 1].kind != 'label':
+                ordered[number] = current._replace(write=partial(current.write, after_square=True))
+        return ordered
+
+    def travel_report(self) -> TravelReport:
+        """
+        Laser off travel between the labels and squares in grid order and
+        in the order of `sequence`, in millimeters.
+        """
+        characters = self.load_font()
+        origin = (self.x_start_pos, self.y_start_pos)
+        grid = [ProgramBlock(kind, info, write, *self.block_ends(characters, kind, info))
+                for kind, info, write in self.grid_blocks()]
+        sequenced = self.sequenced_blocks() if self.sequence == 'serpentine' else grid
+        return TravelReport(travel(grid, origin), travel(sequenced, origin))
+
+    async def agenerate(self, executor=None) -> AsyncIterator[str]:
+        """
+        Asynchronous version of `iter_blocks`: `async for chunk in generator.agenerate()`.
+
+        Every block is computed in `executor` (the loop default executor when None),
+        so the event loop stays responsive and control returns to it between squares.
+
+        Parameters
+        ----------
+        executor: Optional[concurrent.futures.Executor]
+            Executor running the CPU heavy block generation.
+
+        Yields
+        ------
+        block: str
+            G-code of the next block.
+        """
+        loop = asyncio.get_running_loop()
+        blocks = self.iter_blocks()
+        while True:
+            block = await loop.run_in_executor(executor, next, blocks, None)
+            if block is None:
+                return
+            yield block
+
+    async def awrite_program(self, executor=None, max_pending: int = 16):
+        """
+        Asynchronous version of `write_program`. Blocks go through an `AsyncSink`,
+        which applies backpressure when the file writes fall behind.
+
+        Parameters
+        ----------
+        executor: Optional[concurrent.futures.Executor]
+            Executor running block generation and file writes.
+        max_pending: int
+            Number of blocks that may wait for the file before generation pauses.
+        """
+        try:
+            async with AsyncSink(self.file_name, self.compression, self.compression_level,
+                                 self.block_size, max_pending, executor) as sink:
+                async for block in self.agenerate(executor):
+                    await sink.write(block)
+        finally:
+            self.close_font()
 
 """
 if __name__ == '__main__':
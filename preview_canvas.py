@@ -0,0 +1,202 @@
+import queue
+import time
+from tkinter import Canvas, Frame, PhotoImage, StringVar
+from tkinter import ttk
+import numpy as np
+from utils import live_preview as lp
+
+# Time the Tk thread spends parsing and drawing per frame, in seconds.
+FRAME_BUDGET = 0.03
+# Delay between two frames in milliseconds.
+FRAME_DELAY = 40
+# Delay of the redraw after zooming or resizing in milliseconds.
+REDRAW_DELAY = 30
+# Magnification of one step of the mouse wheel.
+ZOOM_STEP = 1.25
+
+
+class LivePreview(Frame):
+    """
+    Canvas showing the grid layout and the program while it is written.
+
+    `observer` is passed to the generator running in a worker thread and
+    only puts the text batches on a queue. The Tk thread takes them off
+    every frame, parses and draws them for at most `FRAME_BUDGET` seconds
+    and leaves the rest for the next frame, so drawing never holds up the
+    generator. The moves are drawn by `utils.live_preview.PreviewRaster`
+    into one photo image, colored by power or feed.
+
+    Drag with the mouse to pan, scroll to zoom and double click to fit the
+    grid; the kept moves are drawn again, the program is not read again.
+    """
+    def __init__(self, master, width: int = 480, height: int = 400):
+        super().__init__(master)
+        self.queue = queue.Queue()
+        self.layout = None
+        self.stream = None
+        self.ranges = {name: (0.0, 1.0) for name in lp.COLOR_BY}
+        self.drag = None
+        self.pending_redraw = None
+
+        toolbar = Frame(self)
+        toolbar.pack(fill='x')
+        ttk.Label(toolbar, text='Color by').pack(side='left', padx=5)
+        self.color_by = StringVar(value=lp.COLOR_BY[0])
+        for name in lp.COLOR_BY:
+            ttk.Radiobutton(toolbar, text=name, value=name, variable=self.color_by,
+                            command=self.redraw).pack(side='left')
+        self.status = ttk.Label(toolbar, text='')
+        self.status.pack(side='right', padx=5)
+
+        self.canvas = Canvas(self, width=width, height=height, highlightthickness=0, background='#202020')
+        self.canvas.pack(fill='both', expand=True)
+        self.raster = lp.PreviewRaster(lp.View.fit((0, 0, 1, 1), width, height))
+        self.photo = PhotoImage(width=width, height=height)
+        self.image = self.canvas.create_image(0, 0, anchor='nw', image=self.photo)
+
+        self.canvas.bind('<ButtonPress-1>', self.start_pan)
+        self.canvas.bind('<B1-Motion>', self.pan)
+        self.canvas.bind('<ButtonRelease-1>', self.end_pan)
+        self.canvas.bind('<Double-Button-1>', lambda event: self.fit())
+        self.canvas.bind('<MouseWheel>', lambda event: self.zoom(event, event.delta > 0))
+        self.canvas.bind('<Button-4>', lambda event: self.zoom(event, True))
+        self.canvas.bind('<Button-5>', lambda event: self.zoom(event, False))
+        self.canvas.bind('<Configure>', self.resize)
+        self.after(FRAME_DELAY, self.poll)
+
+    def show_layout(self, generator):
+        """
+        Show the squares and labels of a generator, before its program is written.
+        """
+        self.stream = None
+        self.set_layout(generator)
+        self.status.configure(text=f'{len(self.layout.squares)} squares')
+        self.fit()
+
+    def start(self, generator):
+        """
+        Prepare for the program of `generator`, which `observer` will receive.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.stream = lp.stream_for(generator)
+        self.set_layout(generator)
+        self.fit()
+
+    def observer(self, text: str):
+        """
+        Receive a batch of the program, from any thread.
+        """
+        self.queue.put(text)
+
+    def finish(self):
+        """
+        Mark the end of the program, from any thread.
+        """
+        self.queue.put(None)
+
+    def set_layout(self, generator):
+        self.layout = lp.grid_layout(generator)
+        self.ranges = {'power': (float(self.layout.power.min()), float(self.layout.power.max())),
+                       'feed': (float(self.layout.feed.min()), float(self.layout.feed.max()))}
+
+    def poll(self):
+        """
+        Parse and draw the batches received, for at most one frame budget.
+        """
+        deadline = time.perf_counter() + FRAME_BUDGET
+        changed = False
+        while self.stream is not None and time.perf_counter() < deadline:
+            try:
+                text = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.draw_segments(self.stream.close() if text is None else self.stream.add(text))
+            changed = True
+        if changed:
+            self.status.configure(text=f'{len(self.stream.segments().burn)} moves')
+            self.show()
+        self.after(FRAME_DELAY, self.poll)
+
+    def colors(self, values: np.ndarray) -> np.ndarray:
+        return lp.colorize(values, *self.ranges[self.color_by.get()])
+
+    def draw_segments(self, segments: lp.Segments):
+        """
+        Draw moves over the image, burns over travels.
+        """
+        travel = ~segments.burn
+        self.raster.draw(segments.start[travel], segments.end[travel],
+                         np.tile(np.array(lp.TRAVEL, dtype=np.uint8), (int(travel.sum()), 1)))
+        values = segments.power if self.color_by.get() == 'power' else segments.feed
+        self.raster.draw(segments.start[segments.burn], segments.end[segments.burn],
+                         self.colors(values[segments.burn]))
+
+    def redraw(self):
+        """
+        Draw the layout, or the moves received so far over the squares, for the current view.
+        """
+        self.pending_redraw = None
+        self.raster.clear()
+        if self.layout is not None:
+            squares = self.layout.squares
+            if self.stream is None:
+                values = self.layout.power if self.color_by.get() == 'power' else self.layout.feed
+                self.raster.fill_boxes(squares, self.colors(values))
+                labels = self.layout.labels
+                self.raster.draw(labels[:, :2], labels[:, 2:],
+                                 np.tile(np.array(lp.LABEL, dtype=np.uint8), (len(labels), 1)))
+            else:
+                self.raster.fill_boxes(squares, np.tile(np.array(lp.TRAVEL, dtype=np.uint8), (len(squares), 1)))
+        if self.stream is not None:
+            self.draw_segments(self.stream.segments())
+        self.show()
+
+    def schedule_redraw(self):
+        if self.pending_redraw is not None:
+            self.after_cancel(self.pending_redraw)
+        self.pending_redraw = self.after(REDRAW_DELAY, self.redraw)
+
+    def show(self):
+        self.photo.configure(data=self.raster.ppm(), format='PPM')
+
+    def fit(self):
+        """
+        Show the whole grid.
+        """
+        bounds = self.layout.bounds() if self.layout is not None else None
+        if bounds is None and self.stream is not None:
+            bounds = self.stream.segments().bounds()
+        if bounds is not None:
+            view = self.raster.view
+            self.raster = lp.PreviewRaster(lp.View.fit(bounds, view.width, view.height))
+        self.redraw()
+
+    def start_pan(self, event):
+        self.drag = (event.x, event.y, 0, 0)
+
+    def pan(self, event):
+        # The image follows the mouse at once, it is drawn again on release.
+        x, y, dx, dy = self.drag
+        self.canvas.move(self.image, event.x - x - dx, event.y - y - dy)
+        self.drag = (x, y, event.x - x, event.y - y)
+
+    def end_pan(self, event):
+        if self.drag is None:
+            return
+        _, _, dx, dy = self.drag
+        self.drag = None
+        self.canvas.coords(self.image, 0, 0)
+        if dx or dy:
+            self.raster.view = self.raster.view.panned(dx, dy)
+            self.redraw()
+
+    def zoom(self, event, zoom_in: bool):
+        self.raster.view = self.raster.view.zoomed(ZOOM_STEP if zoom_in else 1 / ZOOM_STEP, event.x, event.y)
+        self.schedule_redraw()
+
+    def resize(self, event):
+        if (event.width, event.height) != (self.raster.view.width, self.raster.view.height) and \
+                event.width > 1 and event.height > 1:
+            self.raster = lp.PreviewRaster(self.raster.view.resized(event.width, event.height))
+            self.schedule_redraw()
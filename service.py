@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import mean
+from typing import BinaryIO, Dict, Optional, Tuple
+from pattern_generator import OUTPUT_PARAMS, PatternGenerator
+from utils import gcode_io as gio, resume
+from utils.validator import validate_params
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _init_worker(root: str):
+    # Fonts are loaded relative to the repository root.
+    os.chdir(root)
+
+
+def _run_job(params: Dict, path: str) -> int:
+    """
+    Generate one program into `path` in a worker process.
+    A partly written program is removed when the job fails.
+    """
+    try:
+        PatternGenerator(**dict(params, file_name=path, compression='none')).write_program()
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return os.path.getsize(path)
+
+
+class ServiceBusy(Exception):
+    """
+    Raised when the job queue is full.
+    """
+
+
+class JobService:
+    """
+    Generates programs in a bounded process pool and keeps the results
+    in an LRU cache of files, so a repeated request costs a file read.
+    Identical requests arriving while their job runs share that job.
+
+    Attributes
+    ----------
+    workers : int
+        Number of worker processes.
+    max_queue : int
+        Number of jobs allowed to wait for a worker before requests are refused.
+    cache_size : int
+        Number of cached programs.
+    cache_dir : str
+        Directory of the cached programs, a temporary directory when None.
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 8, cache_size: int = 32,
+                 cache_dir: Optional[str] = None, latency_window: int = 1000):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cache_size = cache_size
+        self.owns_cache_dir = cache_dir is None
+        self.cache_dir = tempfile.mkdtemp(prefix='laser-tester-') if cache_dir is None else cache_dir
+        self.pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(ROOT,))
+        self.lock = threading.Lock()
+        self.cache: 'OrderedDict[str, str]' = OrderedDict()
+        self.running: Dict[str, Future] = {}
+        self.counter = 0
+        self.counts = {'requests': 0, 'cache_hits': 0, 'cache_misses': 0,
+                       'rejected': 0, 'invalid': 0, 'errors': 0}
+        self.job_latency = deque(maxlen=latency_window)
+        self.request_latency = deque(maxlen=latency_window)
+
+    @staticmethod
+    def key(params: Dict) -> str:
+        """
+        Cache key of normalized parameters. Output parameters such as the file
+        name are left out: every job is written to its own file in the cache.
+        """
+        burned = {name: value for name, value in params.items() if name not in OUTPUT_PARAMS}
+        return json.dumps(burned, sort_keys=True, separators=(',', ':'))
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def submit(self, params: Dict) -> Tuple[Future, bool]:
+        """
+        Get the program of `params` from the cache, a running job or a new job.
+
+        Returns
+        -------
+        result: Future
+            Future of the path of the generated program.
+        hit: bool
+            True when the program was already cached.
+
+        Raises
+        ------
+        ServiceBusy
+            When `max_queue` jobs already wait for a worker.
+        """
+        key = self.key(params)
+        with self.lock:
+            self.counts['requests'] += 1
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.counts['cache_hits'] += 1
+                done = Future()
+                done.set_result(self.cache[key])
+                return done, True
+            if key in self.running:
+                self.counts['cache_misses'] += 1
+                return self.running[key], False
+            if len(self.running) >= self.workers + self.max_queue:
+                self.counts['rejected'] += 1
+                raise ServiceBusy()
+            self.counts['cache_misses'] += 1
+            self.counter += 1
+            path = os.path.join(self.cache_dir, f'{self.counter}.nc')
+            started = time.perf_counter()
+            job = self.pool.submit(_run_job, params, path)
+            result = Future()
+            self.running[key] = result
+        job.add_done_callback(lambda job: self._finish(key, path, started, job, result))
+        return result, False
+
+    def _finish(self, key: str, path: str, started: float, job: Future, result: Future):
+        error = job.exception()
+        with self.lock:
+            del self.running[key]
+            if error is None:
+                self.job_latency.append(time.perf_counter() - started)
+                self.cache[key] = path
+                while len(self.cache) > self.cache_size:
+                    _, old = self.cache.popitem(last=False)
+                    self.evict(old)
+            else:
+                self.counts['errors'] += 1
+        if error is None:
+            result.set_result(path)
+        else:
+            result.set_exception(error)
+
+    @staticmethod
+    def evict(path: str):
+        """
+        Remove a program dropped from the cache and its resume index.
+        Open streams keep reading an unlinked file, a file that cannot be
+        removed is left behind rather than failing the finished job.
+        """
+        for file in (path, resume.index_file(path)):
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+
+    def open(self, params: Dict) -> Tuple[BinaryIO, bool]:
+        """
+        Wait for the program of `params` and open it for streaming.
+        """
+        future, hit = self.submit(params)
+        path = future.result()
+        with self.lock:
+            # Opened under the lock so eviction cannot remove it first.
+            return open(path, 'rb'), hit
+
+    def metrics(self) -> Dict:
+        """
+        Queue depth, cache counters and latency statistics in seconds.
+        """
+        with self.lock:
+            running = len(self.running)
+            return dict(self.counts,
+                        workers=self.workers,
+                        jobs_in_progress=running,
+                        queue_depth=max(0, running - self.workers),
+                        cached=len(self.cache),
+                        job_latency=latency_stats(self.job_latency),
+                        request_latency=latency_stats(self.request_latency))
+
+    def close(self):
+        self.pool.shutdown()
+        if self.owns_cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def latency_stats(samples) -> Dict:
+    """
+    Count, mean, median, 95th percentile and maximum of latency samples.
+    """
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {'count': len(ordered), 'mean': mean(ordered),
+            'p50': ordered[len(ordered) // 2],
+            'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            'max': ordered[-1]}
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """
+    POST /generate with a JSON object of PatternGenerator parameters streams
+    the program back with chunked transfer encoding. GET /metrics returns
+    the service metrics as JSON.
+    """
+    protocol_version = 'HTTP/1.1'
+    service: JobService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_json(200, self.service.metrics())
+        else:
+            self.send_json(404, {'errors': {'path': [f'unknown path {self.path}']}})
+
+    def do_POST(self):
+        if self.path != '/generate':
+            self.send_json(404, {'errors': {'path': [f'unknown path {self.path}']}})
+            return
+        started = time.perf_counter()
+        try:
+            params = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError as error:
+            self.service.count('invalid')
+            self.send_json(400, {'errors': {'body': [f'invalid JSON: {error}']}})
+            return
+        params, errors = validate_params(params)
+        if errors:
+            self.service.count('invalid')
+            self.send_json(400, {'errors': errors})
+            return
+        try:
+            program, hit = self.service.open(params)
+        except ServiceBusy:
+            self.send_json(503, {'errors': {'queue': ['job queue is full']}}, {'Retry-After': '1'})
+            return
+        except Exception as error:
+            self.send_json(500, {'errors': {'job': [str(error)]}})
+            return
+        with program:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; charset=ascii')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.send_header('X-Cache', 'hit' if hit else 'miss')
+            self.end_headers()
+            for chunk in iter(lambda: program.read(gio.BLOCK_SIZE), b''):
+                self.wfile.write(b'%X\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        with self.service.lock:
+            self.service.request_latency.append(time.perf_counter() - started)
+
+
+def make_server(host: str = '127.0.0.1', port: int = 8000, service: Optional[JobService] = None) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server of a job service, `port` 0 picks a free port.
+    """
+    handler = type('BoundJobHandler', (JobHandler,), {'service': service or JobService()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Laser tester G-code job service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-queue', type=int, default=8)
+    parser.add_argument('--cache-size', type=int, default=32)
+    args = parser.parse_args()
+    job_service = JobService(args.workers, args.max_queue, args.cache_size)
+    server = make_server(args.host, args.port, job_service)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_service.close()
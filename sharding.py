@@ -0,0 +1,291 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from nesting import write_grids
+from pattern_generator import PatternGenerator
+from utils.packing import split_balanced
+from utils.runtime import RunTimeModel
+from utils.sweep import SweepPoint
+
+# Units a grid is split by: the rows of every sub-grid or whole sub-grids.
+SHARD_MODES = ('rows', 'tiles')
+
+
+class Lane(NamedTuple):
+    """
+    Smallest part of the grid given to one shard.
+
+    tile: column and row of the sub-grid.
+    sweep: values of the extra sweep axes of the sub-grid.
+    rows: indices of the speed rows.
+    start: position of the first square in the whole grid.
+    seconds: estimated machine time of the squares and speed labels.
+    """
+    tile: Tuple[int, int]
+    sweep: Dict[str, object]
+    rows: Tuple[int, ...]
+    start: Tuple[float, float]
+    seconds: float
+
+
+class ShardSegment(NamedTuple):
+    """
+    Consecutive rows of one sub-grid burned by a shard, a labelled grid of its own.
+
+    tile: column and row of the sub-grid in the whole grid.
+    sweep: values of its extra sweep axes.
+    rows: indices of its speed rows in the whole grid.
+    params: `PatternGenerator` parameters of the segment.
+    offset: shift of its squares from their place in the whole grid.
+    """
+    tile: Tuple[int, int]
+    sweep: Dict[str, object]
+    rows: Tuple[int, ...]
+    params: Dict
+    offset: Tuple[float, float]
+
+
+class Shard(NamedTuple):
+    """
+    One self-contained program of a sharded grid.
+
+    number: shard number from 1.
+    file_name: program file.
+    segments: parts of the grid burned, left to right on the bed.
+    seconds: estimated machine time of the squares and labels, the balanced cost.
+    """
+    number: int
+    file_name: str
+    segments: List[ShardSegment]
+    seconds: float
+
+
+def shard_file(file_name: str, suffix: str) -> str:
+    """
+    File name beside `file_name` with `suffix` before its extensions,
+    e.g. grid.shard2.nc.gz for grid.nc.gz.
+    """
+    folder, base = os.path.split(file_name)
+    stem, dot, extensions = base.partition('.')
+    return os.path.join(folder, f'{stem}.{suffix}{dot}{extensions}')
+
+
+def plain(value):
+    # NumPy numbers of the divided values as JSON numbers.
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _write_shard(segments: Sequence[Dict], file_name: str, model: RunTimeModel) -> float:
+    """
+    Write one shard program in a worker process and estimate its machine time.
+    """
+    write_grids([PatternGenerator(**params) for params in segments], file_name)
+    return model.estimate_file(file_name).total
+
+
+class ShardedJob:
+    """
+    One calibration grid split into several self-contained programs, to be
+    burned at the same time on identical machines.
+
+    The grid is cut into lanes, the rows of every sub-grid ('rows') or whole
+    sub-grids ('tiles') of the parameter sweep. Every lane is costed by the
+    machine time of its squares and speed labels: one square per row is
+    written to memory and timed with `RunTimeModel`, all squares of a row
+    have the same feed and size (with the 'rows' fill the whole row is
+    timed). The power labels are paid once per sub-grid in a shard. The
+    lanes are then split into consecutive runs with the longest run as short
+    as possible (`split_balanced`), so slow rows weigh more than fast ones.
+
+    Every shard burns the rows of its lanes as regular grids with their own
+    preamble, power and feed labels (and sweep labels), placed at the start
+    position of the job and side by side when a shard holds rows of several
+    sub-grids. The shift of every segment from its place in the whole grid
+    is kept in the manifest.
+
+    Parameters
+    ----------
+    job: Dict
+        `PatternGenerator` parameters of the whole grid.
+    shards: int
+        Number of programs.
+    by: str
+        Lane of the split, one of SHARD_MODES.
+    model: Optional[RunTimeModel]
+        Machine time model of the costs, the default model when None.
+
+    Attributes
+    ----------
+    lanes : List[Lane]
+        Lanes of the grid in burning order with their costs.
+    shards : List[Shard]
+        The balanced shards.
+    """
+
+    def __init__(self, job: Dict, shards: int, by: str = 'rows', model: Optional[RunTimeModel] = None):
+        if by not in SHARD_MODES:
+            raise ValueError(f'Unknown shard mode: {by}. Use one of: {", ".join(SHARD_MODES)}')
+        self.job = dict(job, preview=False, resume_index=False)
+        self.by = by
+        self.model = model or RunTimeModel()
+        self.generator = PatternGenerator(**self.job)
+        generator = self.generator
+        characters = generator.load_font()
+        self.label_seconds = {key: self.block_seconds(x_pos, y_pos, partial(generator.engrave_label, characters,
+                                                                            key[0], x_pos, y_pos))
+                              for key, (x_pos, y_pos) in
+                              generator.tile_labels(generator.parameter_sweep(), 0, 0).items()}
+        self.setup_seconds = sum(seconds for (_, kind), seconds in self.label_seconds.items() if kind == 'p')
+        self.lanes = list(self.iter_lanes())
+        if not 0 < shards <= len(self.lanes):
+            unit = 'rows' if by == 'rows' else 'sub-grids'
+            raise ValueError(f'Cannot split {len(self.lanes)} {unit} into {shards} shards')
+        # Every sub-grid in a shard is a segment with its own power labels.
+        costs = [lane.seconds + (self.setup_seconds if index == 0 or lane.tile != self.lanes[index - 1].tile
+                                 else 0.0) for index, lane in enumerate(self.lanes)]
+        start_costs = [lane.seconds + self.setup_seconds for lane in self.lanes]
+        self.shards = [self.shard(number, [self.lanes[index] for index in run],
+                                  start_costs[run.start] + sum(costs[run.start + 1:run.stop]))
+                       for number, run in enumerate(split_balanced(costs, shards, start_costs), 1)]
+
+    def block_seconds(self, x_pos: float, y_pos: float, write: Callable) -> float:
+        """
+        Estimated machine time of a label or squares written by `write(out)`
+        from where they start.
+        """
+        generator = self.generator
+        generator.loc.loc = (x_pos, y_pos)
+        preamble = generator.render(generator.loc.start)
+        burn = generator.render(write)
+        return (self.model.estimate((preamble + burn).splitlines()).total
+                - self.model.estimate(preamble.splitlines()).total)
+
+    def row_seconds(self, row: Sequence[SweepPoint]) -> float:
+        """
+        Estimated machine time of the squares of a row.
+        """
+        generator = self.generator
+        first = row[0]
+        if generator.fill == 'rows':
+            return self.block_seconds(first.x, first.y, partial(generator.burn_row, row))
+        return len(row) * self.block_seconds(first.x, first.y,
+                                             partial(generator.burn_square, first.x, first.y, first.params))
+
+    def iter_lanes(self) -> Iterator[Lane]:
+        """
+        Lanes of the grid with their costs, see `by`.
+        """
+        tile, lane = None, None
+        for row in self.generator.parameter_rows():
+            first = row[0]
+            sweep = {name: value for name, value in first.params.items() if name not in ('power', 'speed')}
+            index = 0 if first.tile != tile else lane.rows[-1] + 1
+            seconds = self.row_seconds(row) + self.label_seconds.get((first.params['speed'], 's'), 0.0)
+            if self.by == 'tiles' and first.tile == tile:
+                lane = lane._replace(rows=lane.rows + (index,), seconds=lane.seconds + seconds)
+                continue
+            if lane is not None:
+                yield lane
+            tile = first.tile
+            lane = Lane(first.tile, sweep, (index,), (first.x, first.y), seconds)
+        if lane is not None:
+            yield lane
+
+    def shard(self, number: int, lanes: Sequence[Lane], seconds: float) -> Shard:
+        """
+        Program of consecutive lanes: one segment per sub-grid, placed side by side.
+        """
+        file_name = shard_file(self.job['file_name'], f'shard{number}')
+        groups = []
+        for lane in lanes:
+            if groups and groups[-1][0].tile == lane.tile:
+                groups[-1].append(lane)
+            else:
+                groups.append([lane])
+
+        segments = []
+        x_next = None
+        for group in groups:
+            rows = tuple(row for lane in group for row in lane.rows)
+            params = dict(self.job, file_name=file_name, x_squares=len(rows),
+                          feed_distribution=[self.generator.speed_list[row] for row in rows], feed_step=None,
+                          sweep={name: [value] for name, value in group[0].sweep.items()} or None)
+            if x_next is not None:
+                x_min = PatternGenerator(**params).extent()[0]
+                params['x_start_pos'] = params['x_start_pos'] + x_next - x_min
+            generator = PatternGenerator(**params)
+            x_next = generator.extent()[2] + self.generator.tile_gap
+            first = next(iter(generator.parameter_sweep()))
+            start = group[0].start
+            segments.append(ShardSegment(group[0].tile, group[0].sweep, rows, params,
+                                         (first.x - start[0], first.y - start[1])))
+        return Shard(number, file_name, segments, seconds)
+
+    def balance(self) -> float:
+        """
+        Longest shard over the mean shard time, 1 when perfectly balanced.
+        """
+        seconds = [shard.seconds for shard in self.shards]
+        return max(seconds) * len(seconds) / sum(seconds) if sum(seconds) else 1.0
+
+    def write(self, workers: Optional[int] = None) -> Dict:
+        """
+        Write all shard programs in parallel and the manifest beside them.
+
+        Parameters
+        ----------
+        workers: Optional[int]
+            Worker processes, one per shard up to the number of CPUs when
+            None; 1 writes the shards in this process.
+
+        Returns
+        -------
+        manifest: Dict
+            Contents of the manifest file `<name>.shards.json`: the shard
+            programs with their segments (sub-grid, sweep values, rows,
+            speeds, position and offset from the whole grid), the
+            estimated machine time of their squares and of the written
+            program, and the balance of the split.
+        """
+        tasks = [([segment.params for segment in shard.segments], shard.file_name, self.model)
+                 for shard in self.shards]
+        if workers is None:
+            workers = min(len(tasks), os.cpu_count() or 1)
+        if workers == 1:
+            program_seconds = [_write_shard(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                program_seconds = list(pool.map(_write_shard, *zip(*tasks)))
+
+        manifest = {
+            'file_name': self.job['file_name'],
+            'by': self.by,
+            'balance': self.balance(),
+            'shards': [{
+                'number': shard.number,
+                'file_name': shard.file_name,
+                'seconds': shard.seconds,
+                'program_seconds': seconds,
+                'segments': [{
+                    'tile': list(segment.tile),
+                    'sweep': {name: plain(value) for name, value in segment.sweep.items()},
+                    'rows': list(segment.rows),
+                    'speeds': [plain(value) for value in segment.params['feed_distribution']],
+                    'x_start_pos': segment.params['x_start_pos'],
+                    'y_start_pos': segment.params['y_start_pos'],
+                    'offset': list(segment.offset),
+                } for segment in shard.segments],
+            } for shard, seconds in zip(self.shards, program_seconds)],
+        }
+        with open(self.manifest_file(), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def manifest_file(self) -> str:
+        """
+        Name of the manifest beside the programs.
+        """
+        folder, base = os.path.split(self.job['file_name'])
+        return os.path.join(folder, base.partition('.')[0] + '.shards.json')
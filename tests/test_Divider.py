@@ -23,5 +23,39 @@ class MyTestCase(unittest.TestCase):
         middle = d.mid_value(values_list)
         proper_middle = 6
         self.assertEqual(middle, proper_middle)
-        
-    
+
+    def test_distribute_linear_floats(self):
+        d = Divider()
+        self.assertEqual(d.distribute(1000, 2000, 3), [1000.0, 1500.0, 2000.0])
+        self.assertEqual(d.distribute(1, 10, 6, step=1), [1, 3, 5, 6, 8, 10])
+
+    def test_distribute_geometric(self):
+        d = Divider()
+        values = d.distribute(100, 10000, 3, 'geometric')
+        self.assertEqual([round(v, 6) for v in values], [100, 1000, 10000])
+        with self.assertRaises(ValueError):
+            d.distribute(0, 100, 3, 'geometric')
+
+    def test_distribute_power_law_and_step(self):
+        d = Divider()
+        self.assertEqual(d.distribute(0, 100, 3, 'power', step=5, exponent=2), [0, 25, 100])
+        self.assertEqual(d.distribute(0, 1, 4, step=0.1), [0.0, 0.3, 0.7, 1.0])
+
+    def test_distribute_explicit(self):
+        d = Divider()
+        self.assertEqual(d.distribute(0, 0, 0, 'explicit', explicit=[5, 50, 500]), [5, 50, 500])
+        self.assertEqual(d.distribute(0, 0, 0, 'explicit', step=10, explicit=[12, 49]), [10, 50])
+
+    def test_distribute_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Divider().distribute(1, 10, 3, 'cubic')
+
+    def test_distribute_result_is_a_copy(self):
+        d = Divider()
+        values = d.distribute(1, 10, 3)
+        values.append(99)
+        self.assertEqual(d.distribute(1, 10, 3), [1.0, 5.5, 10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
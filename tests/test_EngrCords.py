@@ -42,3 +42,10 @@ class TestEngrCords(unittest.TestCase):
         values_list = [2, 4]  # Testing with even number of elements, should return the lower middle
         mid_val = self.engr_cords.mid_value(values_list)
         self.assertEqual(mid_val, 2)
+
+    def test_fixed_point_coords(self):
+        engr_cords = EngrCords(fixed_point=3)
+        self.assertEqual(engr_cords.pattern_start(0.1, 0.2, 0.2, 0.1, 0.1), (0.4, 0.3))
+        sign_dict = engr_cords.engr_coords(0, 0, 0.2, 0.2, 0.1, [1, 2, 3], [4, 5, 6])
+        self.assertEqual(sign_dict[(3, 'p')], (0.9, 0))
+        self.assertEqual(sign_dict[(6, 's')], (0, 0.9))
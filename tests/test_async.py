@@ -0,0 +1,84 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pattern_generator import PatternGenerator
+from utils import gcode_io as gio
+from utils.async_sink import AsyncSink
+
+
+def make_generator(file_name, **kwargs):
+    return PatternGenerator(
+        file_name=file_name, length=5, width=5, space=2, passes_per_mm=2,
+        x_start_pos=0, y_start_pos=0, x_squares=3, y_squares=3,
+        start_power=100, end_power=1000, start_feed=1000, end_feed=5000,
+        turn_on_g_code='M4', turn_off_g_code='M5', **kwargs)
+
+
+def read(file_name):
+    with gio.open_gcode(file_name) as f:
+        return f.read()
+
+
+class TestAsyncGeneration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_blocks_match_write_program(self):
+        generator = make_generator(self.path('sync.nc'), dialect='grbl-laser')
+        generator.write_program()
+        blocks = list(make_generator('unused.nc', dialect='grbl-laser').iter_blocks())
+        # preamble + 6 labels + 9 squares + end
+        self.assertEqual(len(blocks), 17)
+        self.assertEqual(''.join(blocks), read(self.path('sync.nc')))
+
+    def test_agenerate_yields_between_squares(self):
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            chunks = [chunk async for chunk in make_generator('unused.nc').agenerate()]
+            task.cancel()
+            return chunks, ticks
+
+        chunks, ticks = asyncio.run(run())
+        self.assertEqual(''.join(chunks), ''.join(make_generator('unused.nc').iter_blocks()))
+        self.assertGreaterEqual(ticks, len(chunks))
+
+    def test_concurrent_awrite_program(self):
+        async def run():
+            generators = [make_generator(self.path(f'grid{i}.nc.gz')) for i in range(4)]
+            await asyncio.gather(*(g.awrite_program(max_pending=2) for g in generators))
+
+        asyncio.run(run())
+        make_generator(self.path('sync.nc')).write_program()
+        expected = read(self.path('sync.nc'))
+        for i in range(4):
+            self.assertEqual(read(self.path(f'grid{i}.nc.gz')), expected)
+
+    def test_sink_backpressure(self):
+        async def run():
+            async with AsyncSink(self.path('out.nc'), max_pending=1) as sink:
+                for i in range(50):
+                    await sink.write(f'G1 X{i}\n')
+                    self.assertLessEqual(sink.queue.qsize(), 1)
+            return sink.bytes_written
+
+        written = asyncio.run(run())
+        self.assertEqual(written, len(read(self.path('out.nc'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils.burn_analysis import analyze_scan, box_sums, integral, load_scan, plot_heatmap
+
+PAPER = 230
+
+
+def generator(**options) -> PatternGenerator:
+    params = dict(file_name='output.nc', length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0,
+                  y_start_pos=0, x_squares=3, y_squares=4, start_power=250, end_power=1000,
+                  start_feed=1000, end_feed=3000, turn_on_g_code='M4', turn_off_g_code='M5')
+    return PatternGenerator(**dict(params, **options))
+
+
+def scan(grid: PatternGenerator, darkness, size=(900, 800), edge=None, noise=None) -> np.ndarray:
+    """
+    Synthetic scan of the grid: every square filled with its darkness,
+    optionally with a black frame or noise on one square.
+    """
+    x_min, y_min, x_max, y_max = grid.extent(overscan=False)
+    width, height = size
+    x_scale, y_scale = width / (x_max - x_min), height / (y_max - y_min)
+    pixels = np.full((height, width), PAPER, dtype=float)
+    for number, (point, value) in enumerate(zip(grid.parameter_sweep(), darkness)):
+        c0, c1 = round((point.x - x_min) * x_scale), round((point.x + grid.width - x_min) * x_scale)
+        r0, r1 = round((y_max - point.y - grid.length) * y_scale), round((y_max - point.y) * y_scale)
+        pixels[r0:r1, c0:c1] = PAPER * (1 - value)
+        if number == edge:
+            pixels[r0:r1, c0:c1][np.pad(np.zeros((r1 - r0 - 32, c1 - c0 - 32), bool), 16,
+                                        constant_values=True)] = 0
+        if number == noise:
+            pixels[r0:r1, c0:c1] += np.random.default_rng(1).normal(0, 40, (r1 - r0, c1 - c0))
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+class TestIntegral(unittest.TestCase):
+
+    def test_box_sums(self):
+        values = np.arange(20).reshape(4, 5)
+        sums = box_sums(integral(values), np.array([[0, 4], [1, 3]]), np.array([[0, 5], [2, 4]]))
+        np.testing.assert_array_equal(sums, [values.sum(), values[1:3, 2:4].sum()])
+
+    def test_large_scans_are_reduced(self):
+        self.assertEqual(load_scan(np.zeros((400, 300)), max_pixels=10_000).shape, (100, 75))
+        self.assertEqual(load_scan(np.zeros((40, 30, 3))).shape, (40, 30))
+
+
+class TestAnalyzeScan(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = generator()
+        points = list(self.grid.parameter_sweep())
+        self.darkness = np.array([point.params['power'] / 1000 * 1000 / point.params['speed'] * 0.9
+                                  for point in points])
+
+    def test_darkness_heatmap(self):
+        analysis = analyze_scan(scan(self.grid, self.darkness), self.grid, paper=PAPER)
+        np.testing.assert_allclose(analysis.darkness, self.darkness, atol=0.01)
+        self.assertEqual(analysis.shape, (1, 3, 4))
+        heatmap = analysis.heatmap()
+        # Rows follow the feed, columns the power
+        self.assertEqual(heatmap.shape, (3, 4))
+        self.assertTrue((np.diff(heatmap, axis=1) > 0).all())
+        self.assertTrue((np.diff(heatmap, axis=0) < 0).all())
+        np.testing.assert_allclose(analysis.edge, 0, atol=0.01)
+        # The unburned material is measured from the scan
+        measured = analyze_scan(scan(self.grid, self.darkness), self.grid)
+        np.testing.assert_allclose(measured.darkness, analysis.darkness)
+
+    def test_edge_and_spread(self):
+        analysis = analyze_scan(scan(self.grid, self.darkness, edge=5, noise=7), self.grid, paper=PAPER)
+        self.assertEqual(int(np.argmax(analysis.edge)), 5)
+        self.assertGreater(analysis.edge[5], 0.05)
+        self.assertEqual(int(np.argmax(analysis.spread)), 7)
+
+    def test_recommendation(self):
+        darkness = self.darkness
+        analysis = analyze_scan(scan(self.grid, darkness), self.grid, paper=PAPER)
+        expected = int(np.argmin(np.abs(analysis.darkness - 0.675)))
+        best = analysis.recommend(target=0.675, tolerance=0)
+        self.assertEqual(best.index, expected)
+        self.assertEqual((best.power, best.speed), (analysis.power[expected], analysis.speed[expected]))
+        # Nearly as good and faster
+        faster = analysis.recommend(target=0.675, tolerance=0.25)
+        self.assertGreater(faster.speed, best.speed)
+        self.assertLessEqual(abs(faster.darkness - 0.675), abs(best.darkness - 0.675) + 0.25)
+        # An over-burned edge disqualifies the square
+        analysis = analyze_scan(scan(self.grid, darkness, edge=expected), self.grid, paper=PAPER)
+        self.assertNotEqual(analysis.recommend(target=0.675, tolerance=0).index, expected)
+
+    def test_tiled_sweep(self):
+        grid = generator(sweep={'passes': [1, 2]})
+        darkness = np.linspace(0.1, 0.8, 24)
+        analysis = analyze_scan(scan(grid, darkness, size=(1600, 800)), grid, paper=PAPER)
+        self.assertEqual(analysis.shape, (2, 3, 4))
+        np.testing.assert_allclose(analysis.heatmap(tile=1).ravel(), darkness[12:], atol=0.01)
+
+    def test_overscan_is_not_scanned(self):
+        grid = generator(fill='raster', overscan=6)
+        self.assertLess(grid.extent(overscan=False)[2], grid.extent()[2])
+        analysis = analyze_scan(scan(grid, self.darkness), grid, paper=PAPER)
+        np.testing.assert_allclose(analysis.darkness, self.darkness, atol=0.01)
+
+    def test_squares_outside_the_scan(self):
+        with self.assertRaises(ValueError):
+            analyze_scan(scan(self.grid, self.darkness), self.grid, bounds=(10, 0, 60, 40))
+
+    def test_plot_heatmap(self):
+        import matplotlib
+        matplotlib.use('Agg')
+        analysis = analyze_scan(scan(self.grid, self.darkness), self.grid, paper=PAPER)
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, 'heatmap.png')
+            plot_heatmap(analysis, file=file)
+            self.assertGreater(os.path.getsize(file), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from utils import dialects as dl
+
+
+class TestDialects(unittest.TestCase):
+    def test_get_dialect(self):
+        self.assertIsInstance(dl.get_dialect('grbl-laser'), dl.GrblLaser)
+        custom = dl.get_dialect('custom', 'M3', 'M5')
+        self.assertEqual(custom.turn_on, 'M3')
+        with self.assertRaises(ValueError):
+            dl.get_dialect('fanuc')
+
+    def test_custom_dialect_keeps_original_format(self):
+        dialect = dl.Dialect('M4', 'M5')
+        self.assertEqual(dialect.preamble(0, 0), 'X0 Y0 \nG1 F100 S1000\n')
+        self.assertEqual(dialect.power_speed(1500, 300), 'S1500 F300 \n')
+        self.assertEqual(dialect.travel(1.5, 2), 'G1 X1.5 Y2 \n')
+        self.assertEqual(dialect.burn(1, 2), 'M4 \nG1 X1 Y2 \nM5 \n')
+        self.assertEqual(dialect.finish(), 'M5 \n')
+
+    def test_grbl_laser_raster_line(self):
+        dialect = dl.GrblLaser(rapid=False)
+        dialect.preamble(0, 0)
+        dialect.power_speed(500, 2000)
+        self.assertEqual(dialect.burn(10, 0), 'G1 X10 Y0 S500 F2000\n')
+        self.assertEqual(dialect.travel(10, 0.1), 'G1 X10 Y0.1 S0\n')
+        self.assertEqual(dialect.burn(0, 0.1), 'G1 X0 Y0.1 S500\n')
+        self.assertEqual(dialect.travel(0, 0.1), '')
+        self.assertEqual(dialect.postamble(), 'M5\n')
+
+    def test_grbl_classic_toggles_only_on_change(self):
+        dialect = dl.GrblClassic(rapid=False)
+        dialect.preamble(0, 0)
+        dialect.power_speed(500, 2000)
+        self.assertEqual(dialect.burn(1, 0), 'M3 S500\nG1 X1 Y0 F2000\n')
+        self.assertEqual(dialect.burn(2, 0), 'G1 X2 Y0\n')
+        self.assertEqual(dialect.travel(2, 1), 'M5\nG1 X2 Y1\n')
+        self.assertEqual(dialect.finish(), '')
+
+    def test_linuxcnc_synchronized_output(self):
+        dialect = dl.LinuxCnc(rapid=False)
+        dialect.preamble(0, 0)
+        dialect.power_speed(500, 2000)
+        self.assertEqual(dialect.burn(1, 0), 'M62 P0\nG1 X1 Y0 S500 F2000\n')
+        self.assertEqual(dialect.travel(1, 1), 'M63 P0\nG1 X1 Y1\n')
+        self.assertTrue(dialect.postamble().endswith('M2\n'))
+
+    def test_rapid_travel(self):
+        custom = dl.Dialect('M4', 'M5', rapid=True)
+        self.assertEqual(custom.travel(1, 2), 'G0 X1 Y2 \n')
+        laser = dl.GrblLaser()
+        laser.preamble(0, 0)
+        laser.power_speed(500, 2000)
+        self.assertEqual(laser.burn(10, 0), 'G1 X10 Y0 S500 F2000\n')
+        self.assertEqual(laser.travel(10, 0.1), 'G0 X10 Y0.1\n')
+        self.assertEqual(laser.burn(0, 0.1), 'G1 X0 Y0.1\n')
+
+    def test_travel_feed_override_restores_cutting_feed(self):
+        custom = dl.Dialect('M4', 'M5', rapid=True, travel_feed=6000)
+        custom.power_speed(500, 2000)
+        self.assertEqual(custom.travel(1, 2), 'G0 X1 Y2 F6000 \n')
+        self.assertEqual(custom.burn(3, 2), 'M4 \nG1 X3 Y2 F2000 \nM5 \n')
+        laser = dl.GrblLaser(travel_feed=6000)
+        laser.preamble(0, 0)
+        laser.power_speed(500, 2000)
+        laser.burn(10, 0)
+        self.assertEqual(laser.travel(10, 1), 'G0 X10 Y1 F6000\n')
+        self.assertEqual(laser.burn(0, 1), 'G1 X0 Y1 F2000\n')
+
+    def test_number_format(self):
+        dialect = dl.GrblLaser()
+        self.assertEqual(dialect.number(1 / 3), '0.3333')
+        self.assertEqual(dialect.number(-0.00001), '0')
+        self.assertEqual(dialect.number(15.0), '15')
+        dialect = dl.GrblLaser(leading_zeros=False)
+        self.assertEqual(dialect.number(1 / 3), '.3333')
+        self.assertEqual(dialect.number(-0.5), '-.5')
+        self.assertEqual(dialect.number('0.25'), '.25')
+        self.assertEqual(dialect.number(10.5), '10.5')
+
+    def test_compact_custom_dialect(self):
+        dialect = dl.Dialect('M4', 'M5', rapid=True, compact=True)
+        self.assertEqual(dialect.preamble(0, 0), 'X0 Y0\nG1 F100 S1000\n')
+        self.assertEqual(dialect.move(1, 0), 'X1\n')
+        self.assertEqual(dialect.travel(1, 2), 'G0 Y2\n')
+        self.assertEqual(dialect.travel(1, 2), '')
+        self.assertEqual(dialect.burn(3, 2), 'M4\nG1 X3\nM5\n')
+        self.assertEqual(dialect.power_speed(1500, 300), 'S1500 F300\n')
+        self.assertEqual(dialect.finish(), 'M5\n')
+
+    def test_compact_modal_dialect(self):
+        dialect = dl.GrblLaser(compact=True)
+        self.assertEqual(dialect.preamble(0, 0), 'G21\nG90\nM4 S0\nG0 X0 Y0\n')
+        dialect.power_speed(500, 2000)
+        self.assertEqual(dialect.burn(10, 0), 'G1 X10 S500 F2000\n')
+        self.assertEqual(dialect.travel(10, 0.1), 'G0 Y0.1\n')
+        self.assertEqual(dialect.burn(0, 0.1), 'G1 X0\n')
+        self.assertEqual(dialect.burn(10, 0.1), 'X10\n')
+        self.assertEqual(dialect.state().motion, 'G1')
+        self.assertEqual(dl.GrblLaser().state().motion, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from engine import GenerationEngine
+from pattern_generator import PatternGenerator
+from utils import dialects as dl
+from utils.block_cache import BlockCache
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=3, y_squares=3, start_power=1000, end_power=5000, start_feed=1000,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+
+
+class TestBlockCache(unittest.TestCase):
+
+    def test_hit_restores_the_dialect_state(self):
+        cache = BlockCache()
+        dialect = dl.GrblLaser()
+        dialect.preamble(0, 0)
+        start = dict(vars(dialect))
+        render = lambda: dialect.power_speed(500, 2000) + dialect.burn(10, 0)
+        text = cache.render('square', {'x': 0}, dialect, render)
+        end = dict(vars(dialect))
+        vars(dialect).update(start)
+        self.assertEqual(cache.render('square', {'x': 0}, dialect, lambda: self.fail('rendered again')), text)
+        self.assertEqual(vars(dialect), end)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # Another start state is another block
+        cache.render('square', {'x': 0}, dialect, render)
+        self.assertEqual(cache.misses, 2)
+
+    def test_settings_and_size(self):
+        cache = BlockCache(max_blocks=2)
+        dialect = dl.Dialect()
+        for x in range(3):
+            cache.render('square', {'x': x}, dialect, lambda: 'G1\n')
+        self.assertEqual(len(cache), 2)
+        cache.bind('a')
+        self.assertEqual(len(cache), 0)
+        cache.render('square', {'x': 0}, dialect, lambda: 'G1\n')
+        cache.bind('a')
+        self.assertEqual(len(cache), 1)
+
+
+class TestGenerationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.program = os.path.join(self.tmp.name, 'engine.nc')
+        self.engine = GenerationEngine()
+
+    def fresh(self, **params) -> bytes:
+        file = os.path.join(self.tmp.name, 'fresh.nc')
+        PatternGenerator(**dict(params, file_name=file)).write_program()
+        with open(file, 'rb') as f:
+            return f.read()
+
+    def generate(self, **params):
+        result = self.engine.generate(**dict(PARAMS, file_name=self.program, **params))
+        with open(self.program, 'rb') as f:
+            self.assertEqual(f.read(), self.fresh(**dict(PARAMS, **params)), params)
+        return result
+
+    def test_same_program_as_a_fresh_generator(self):
+        for params in ({}, {'end_power': 4000}, {'start_feed': 1500}, {'dialect': 'grbl-laser'},
+                       {'dialect': 'grbl-laser', 'end_power': 4000}, {'dialect': 'marlin', 'fill': 'rows'},
+                       {'sequence': 'serpentine'}, {'x_start_pos': 5}, {'passes_per_mm': 4},
+                       {'dialect': 'linuxcnc', 'compact_gcode': True}, {'fixed_point': 3}):
+            self.generate(**params)
+
+    def test_repeated_generation_is_served_warm(self):
+        first = self.generate()
+        self.assertEqual(first.hits, 0)
+        again = self.generate()
+        self.assertEqual((again.hits, again.misses), (first.misses, 0))
+        self.assertEqual(again.run_time, first.run_time)
+        self.assertIs(again.layout_report, first.layout_report)
+        # Only the squares and power labels of the changed columns are rendered again
+        changed = self.generate(end_power=4000)
+        self.assertGreater(changed.hits, 0)
+        self.assertGreater(changed.misses, 0)
+        self.assertIsNot(changed.layout_report, first.layout_report)
+
+    def test_render_settings_invalidate_the_blocks(self):
+        self.generate()
+        self.assertEqual(self.generate(width=8).hits, 0)
+        self.assertEqual(self.generate(dialect='grbl-classic').hits, 0)
+
+    def test_changed_font_is_loaded_again(self):
+        font = os.path.join(self.tmp.name, 'font.cxf')
+        shutil.copy('fonts/normal.cxf', font)
+        first = self.generate(font=font)
+        self.assertIs(self.engine.font(font), first.generator.characters)
+        with open(font, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        os.utime(font, ns=(0, 0))
+        self.assertIsNot(self.engine.font(font), first.generator.characters)
+        self.assertEqual(len(self.engine.blocks), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 import unittest
-from utils import engraving as e
+from utils import engraving as e, gcode_io as gio
 import os
 import filecmp
+import shutil
+import tempfile
 
 
 class MyTestCase(unittest.TestCase):
@@ -50,6 +52,55 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(a_coord_converted, a_prop)
         self.assertEqual(b_coord_converted, b_prop)
 
+    def test_load_font_parses_glyphs_lazily(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            font_file = shutil.copy(os.path.join(os.path.dirname(__file__), 'test_font.cxf'), tmp)
+            font = e.load_font(font_file)
+            self.assertEqual(font.glyphs, {})
+            self.assertIn('B', font)
+            self.assertEqual(font['B'], e.read_font(font_file)['B'])
+            self.assertEqual(list(font.glyphs), ['B'])
+            font.close()
+
+    def test_load_font_persists_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            font_file = shutil.copy(os.path.join(os.path.dirname(__file__), 'test_font.cxf'), tmp)
+            font = e.load_font(font_file)
+            self.assertTrue(os.path.exists(font_file + e.INDEX_SUFFIX))
+            self.assertEqual(font.load_index(gio.file_stamp(font.file)), font.index)
+            font.close()
+
+            # A changed font makes the saved index stale.
+            with open(font_file, 'a') as f:
+                f.write('\n[Z] 1\nL 0,0,15,15\n')
+            font = e.load_font(font_file)
+            self.assertEqual(font['Z'], [[0.0, 0.0, 1.0, 1.0]])
+            font.close()
+
+    def test_font_is_mapped_again_after_close(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            font_file = shutil.copy(os.path.join(os.path.dirname(__file__), 'test_font.cxf'), tmp)
+            with e.load_font(font_file) as font:
+                self.assertEqual(font['A'], e.read_font(font_file)['A'])
+            self.assertIsNone(font.map)
+            self.assertEqual(font['B'], e.read_font(font_file)['B'])
+            font.close()
+
+    def test_generator_closes_its_own_font(self):
+        from pattern_generator import PatternGenerator
+        with tempfile.TemporaryDirectory() as tmp:
+            params = dict(file_name=os.path.join(tmp, 'grid.nc'), length=10, width=10, space=5,
+                          passes_per_mm=2, x_start_pos=0, y_start_pos=0, x_squares=2, y_squares=2,
+                          start_power=100, end_power=500, start_feed=1000, end_feed=3000,
+                          turn_on_g_code='M4', turn_off_g_code='M5')
+            generator = PatternGenerator(**params)
+            generator.write_program()
+            self.assertIsNone(generator.characters.map)
+            # A font passed in belongs to the caller
+            with e.load_font(generator.font) as font:
+                PatternGenerator(characters=font, **params).write_program()
+                self.assertIsNotNone(font.map)
+
     def test_engrave_single_character(self):
         char = 'A'
         x = 0
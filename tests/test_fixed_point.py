@@ -0,0 +1,44 @@
+import os
+import re
+import tempfile
+import unittest
+from pattern_generator import PatternGenerator
+from utils.fixed_point import FixedPoint, get_fixed_point, MICRONS
+
+
+class TestFixedPoint(unittest.TestCase):
+
+    def test_text(self):
+        fixed = FixedPoint(MICRONS)
+        self.assertEqual([fixed.text(units) for units in (0, 10500, 333, -1, -2050, 12)],
+                         ['0', '10.5', '0.333', '-0.001', '-2.05', '0.012'])
+        self.assertEqual(FixedPoint(0).text(-15), '-15')
+
+    def test_units(self):
+        fixed = FixedPoint(4)
+        self.assertEqual(fixed.units(0.1 + 0.2), 3000)
+        self.assertEqual(fixed.units(-1 / 3), -3333)
+        self.assertEqual(fixed.mm(fixed.units(2.5)), 2.5)
+
+    def test_places(self):
+        self.assertRaises(ValueError, FixedPoint, 5)
+        self.assertRaises(ValueError, FixedPoint, -1)
+        self.assertIs(get_fixed_point(3), get_fixed_point(3))
+
+    def test_program_coordinates_have_fixed_places(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for dialect in ('custom', 'grbl-laser'):
+                generator = PatternGenerator(file_name=os.path.join(tmp, 'grid.nc'), length=7, width=7,
+                                             space=3.3, passes_per_mm=3, x_start_pos=0.1, y_start_pos=0,
+                                             x_squares=3, y_squares=2, start_power=100, end_power=1000,
+                                             start_feed=500, end_feed=1500, turn_on_g_code='M4',
+                                             turn_off_g_code='M5', dialect=dialect, fixed_point=3)
+                generator.write_program()
+                with open(generator.file_name) as f:
+                    decimals = [len(fraction) for fraction in re.findall(r'[XY]-?\d*\.?(\d*)', f.read())]
+                self.assertGreater(len(decimals), 100)
+                self.assertLessEqual(max(decimals), 3, dialect)
+
+
+if __name__ == '__main__':
+    unittest.main()
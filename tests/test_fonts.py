@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from io import StringIO
+from utils import engraving as e, fonts as f
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'fonts')
+SVG_FONT = '''<svg xmlns="http://www.w3.org/2000/svg"><defs>
+<font id="test" horiz-adv-x="500">
+<font-face units-per-em="1000" cap-height="600"/>
+<glyph unicode="1" d="M100 500 L200 600 V0"/>
+<glyph unicode="0" d="M0 0 h400 v600 h-400 Z"/>
+<glyph unicode="o" d="M0 300 Q200 600 400 300"/>
+</font></defs></svg>
+'''
+
+
+class TestHershey(unittest.TestCase):
+
+    def test_read_jhf(self):
+        font = f.read_jhf(os.path.join(FONT_DIR, 'digits.jhf'))
+        self.assertEqual(set('0123456789-.') <= set(font), True)
+        # '1' is the stroke (-4,-8), (0,-12), (0,9) with the left bound at -8.
+        self.assertEqual(font['1'].tolist(), [[0.114286, 0.485714, 0.228571, 0.6],
+                                              [0.228571, 0.6, 0.228571, 0.0]])
+        self.assertEqual(len(font[' ']), 0)
+
+    def test_digits_need_fewer_lines_than_cxf(self):
+        hershey = e.load_font(os.path.join(FONT_DIR, 'digits.jhf'))
+        cxf = e.read_font(os.path.join(FONT_DIR, 'normal.cxf'))
+        self.assertLess(sum(len(hershey[d]) for d in '0123456789'),
+                        sum(len(cxf[d]) for d in '0123456789'))
+
+    def test_wrapped_records(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            name = os.path.join(tmp, 'wrapped.jhf')
+            with open(name, 'w') as out:
+                out.write('    1  4JZNJ\nRFR[\n')
+            font = f.read_jhf(name, first=ord('1'))
+            self.assertEqual(len(font['1']), 2)
+
+
+class TestSvgFont(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp.name, 'test.svg')
+        with open(self.file, 'w') as out:
+            out.write(SVG_FONT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_svg_font(self):
+        font = f.read_svg_font(self.file)
+        self.assertEqual(font['1'].tolist(), [[0.1, 0.5, 0.2, 0.6], [0.2, 0.6, 0.2, 0.0]])
+        # Relative moves and the closing line.
+        self.assertEqual(len(font['0']), 4)
+        self.assertEqual(font['0'][-1].tolist(), [0.0, 0.6, 0.0, 0.0])
+        self.assertEqual(len(font['o']), f.CURVE_STEPS)
+        self.assertEqual(font['o'][-1][2:].tolist(), [0.4, 0.3])
+
+    def test_unsupported_command(self):
+        self.assertRaises(ValueError, f.parse_path, 'M0 0 A 5 5 0 0 1 10 10')
+
+    def test_compile_font_is_cached(self):
+        self.assertIs(f.compile_font(self.file), f.compile_font(self.file))
+        self.assertRaises(ValueError, f.compile_font, 'font.ttf')
+
+    def test_engrave_with_glyph_table(self):
+        out = StringIO()
+        e.engrave('1', 0, 0, e.load_font(self.file), out, 10, 'M3', 'M5')
+        self.assertEqual(out.getvalue(),
+                         'G1 X0 Y0 \nG1 X1.0 Y5.0 \nM3 \nG1 X2.0 Y6.0 \nM5 \n'
+                         'G1 X2.0 Y6.0 \nM3 \nG1 X2.0 Y0.0 \nM5 \nM5 \n')
+
+
+if __name__ == '__main__':
+    unittest.main()
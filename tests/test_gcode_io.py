@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from utils import gcode_io as gio
+from utils.moves import Location
+
+
+class TestGcodeIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_compression_from_name(self):
+        self.assertEqual(gio.compression_from_name('grid.nc.gz'), 'gzip')
+        self.assertEqual(gio.compression_from_name('grid.nc.xz'), 'xz')
+        self.assertIsNone(gio.compression_from_name('grid.nc'))
+
+    def test_round_trip(self):
+        for name in ('plain.nc', 'grid.nc.gz', 'grid.nc.xz'):
+            file = self.path(name)
+            with gio.open_gcode(file, 'w', level=1, block_size=1024) as f:
+                f.write('G1 X1 Y2 \n' * 100)
+            with gio.open_gcode(file) as f:
+                self.assertEqual(f.read(), 'G1 X1 Y2 \n' * 100)
+
+    def test_read_sniffs_content_not_suffix(self):
+        file = self.path('grid.nc')
+        with gio.open_gcode(file, 'w', compression='gzip') as f:
+            f.write('M5 \n')
+        self.assertEqual(gio.sniff_compression(file), 'gzip')
+        with gio.open_gcode(file) as f:
+            self.assertEqual(f.read(), 'M5 \n')
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            gio.open_gcode(self.path('grid.nc'), 'w', compression='rar')
+
+    def test_location_session(self):
+        file = self.path('grid.nc.gz')
+        loc = Location((0, 0), file)
+        with loc.session(file):
+            loc.start(file)
+            loc.snake_path(0, 0, 1000, 500, 10, 1, 2, file, 'M4', 'M5')
+        with gio.open_gcode(file) as f:
+            lines = f.readlines()
+        self.assertEqual(lines[0], 'X0 Y0 \n')
+        self.assertIn('M4 \n', lines)
+
+    def test_tee_stream(self):
+        file = self.path('grid.nc')
+        batches = []
+        loc = Location((0, 0), file)
+        with loc.session(file, observer=batches.append):
+            loc.start(file)
+            loc.snake_path(0, 0, 1000, 500, 10, 1, 2, file, 'M4', 'M5')
+        with open(file) as f:
+            self.assertEqual(''.join(batches), f.read())
+        self.assertEqual(len(batches), 1)
+        tee = gio.TeeStream(open(self.path('small.nc'), 'w'), batches.append, batch_size=10)
+        tee.writelines(['G1 X1\n', 'G1 X2\n', 'M5\n'])
+        self.assertEqual(batches[1:], ['G1 X1\nG1 X2\n'])
+        tee.close()
+        self.assertEqual(batches[1:], ['G1 X1\nG1 X2\n', 'M5\n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
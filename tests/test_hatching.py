@@ -0,0 +1,116 @@
+import os
+import tempfile
+import unittest
+from typing import Tuple
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils.hatching import scan_segments, square_polygon
+from utils.moves import BURN, hatch_path, raster_path, square_hatch_path
+from utils.simulator import Simulation
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=4, x_start_pos=0, y_start_pos=0,
+              x_squares=2, y_squares=2, start_power=250, end_power=1000, start_feed=1000,
+              end_feed=3000, turn_on_g_code='M4', turn_off_g_code='M5', dialect='grbl-laser')
+
+
+class TestScanSegments(unittest.TestCase):
+
+    def test_square_at_45_degrees(self):
+        line, start, end = scan_segments(square_polygon(0, 0, 10, 10), 45, 0.1)
+        # The line through the first corner is dropped, every other line crosses the square once
+        self.assertEqual(len(line), int(10 * np.sqrt(2) / 0.1 + 1e-9) - 1)
+        self.assertTrue((np.diff(line) == 1).all())
+        for points in (start, end):
+            on_edge = np.isclose(points, 0) | np.isclose(points, 10)
+            self.assertTrue(on_edge.any(axis=1).all())
+            self.assertTrue(((points > -1e-9) & (points < 10 + 1e-9)).all())
+        np.testing.assert_allclose((end - start) / np.linalg.norm(end - start, axis=1)[:, None],
+                                   [[np.sqrt(0.5), np.sqrt(0.5)]] * len(line))
+        # Burned length times the interval covers the area
+        self.assertAlmostEqual(np.linalg.norm(end - start, axis=1).sum() * 0.1, 100, delta=1)
+
+    def test_concave_polygon(self):
+        # A U shape: lines through both arms are split in two
+        polygon = [(0, 0), (10, 0), (10, 10), (7, 10), (7, 3), (3, 3), (3, 10), (0, 10)]
+        line, start, end = scan_segments(polygon, 0, 1)
+        self.assertEqual(np.bincount(line).tolist(), [1] * 3 + [2] * 7)
+        np.testing.assert_allclose(end[:, 0] - start[:, 0], [10] * 3 + [3] * 14)
+        x, _, kind = hatch_path(polygon, 0, 1)
+        # Backwards lines visit the right arm first
+        self.assertEqual(x[kind == BURN][3:7].tolist(), [7, 0, 3, 10])
+        # The orientation of the polygon does not matter
+        reverse = scan_segments(polygon[::-1], 0, 1)
+        np.testing.assert_allclose(reverse[1], start)
+
+
+class TestHatchPath(unittest.TestCase):
+
+    def test_raster_path_at_0_degrees(self):
+        for options in ({}, {'overscan': 2}, {'unidirectional': True}):
+            expected = raster_path(15.3, 7.1, 10, 7, 0.07, **options)
+            path = hatch_path(square_polygon(15.3, 7.1, 10, 7), 0, 0.07, **options)
+            for a, b in zip(expected, path):
+                np.testing.assert_array_equal(a, b)
+
+    def test_boustrophedon(self):
+        x, y, kind = hatch_path(square_polygon(0, 0, 10, 10), 30, 0.5, overscan=1)
+        direction = np.arctan2(np.diff(y)[kind[1:] == BURN], np.diff(x)[kind[1:] == BURN])
+        np.testing.assert_allclose(np.degrees(direction[0::2]), 30, atol=1e-3)
+        np.testing.assert_allclose(np.degrees(direction[1::2]), -150, atol=1e-3)
+        # The overscan runs on along the line with the laser off
+        run_out = np.hypot(x[3] - x[2], y[3] - y[2])
+        self.assertAlmostEqual(run_out, 1, places=5)
+
+    def test_cross_hatch(self):
+        single = square_hatch_path(0, 0, 10, 10, 0.5, 45)
+        cross = square_hatch_path(0, 0, 10, 10, 0.5, 45, cross=True)
+        self.assertEqual(len(cross[0]), 2 * len(single[0]))
+        np.testing.assert_array_equal(cross[0][:len(single[0])], single[0])
+
+
+class TestHatchFill(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def program(self, **params) -> Tuple[PatternGenerator, Simulation]:
+        generator = PatternGenerator(**dict(PARAMS, file_name=os.path.join(self.tmp.name, 'hatch.nc'),
+                                            **params))
+        generator.write_program()
+        return generator, Simulation.from_file(generator.file_name, laser_mode=True)
+
+    @staticmethod
+    def outside(simulation: Simulation, squares) -> int:
+        ends = simulation.burned_segments().reshape(-1, 2)
+        inside = np.zeros(len(ends), dtype=bool)
+        for x, y, width, length in squares:
+            inside |= ((ends[:, 0] > x - 1e-6) & (ends[:, 0] < x + width + 1e-6) &
+                       (ends[:, 1] > y - 1e-6) & (ends[:, 1] < y + length + 1e-6))
+        return int((~inside).sum())
+
+    def test_burns_inside_the_squares(self):
+        generator, raster = self.program(fill='raster')
+        squares = [(point.x, point.y, generator.width, generator.length) for point in generator.parameter_sweep()]
+        for params in ({'hatch_angle': 45}, {'hatch_angle': 45, 'cross_hatch': True}, {'hatch_angle': 0}):
+            _, simulation = self.program(fill='hatch', overscan=1, **params)
+            self.assertEqual(len(simulation.laser_on_travel()), 0)
+            # Only the labels burn outside the squares
+            self.assertEqual(self.outside(simulation, squares), self.outside(raster, squares))
+            # About the energy of the horizontal raster per pass
+            ratio = simulation.exposure(squares) / raster.exposure(squares)
+            np.testing.assert_allclose(ratio, 2 if params.get('cross_hatch') else 1, rtol=0.05)
+
+    def test_swept_angles_and_layout(self):
+        generator = PatternGenerator(**dict(PARAMS, file_name=os.path.join(self.tmp.name, 'hatch.nc'),
+                                            fill='hatch', overscan=2, sweep={'hatch_angle': [0, 90]}))
+        self.assertEqual([point.params['hatch_angle'] for point in generator.parameter_sweep()],
+                         [0] * 4 + [90] * 4)
+        lattice = generator.lattice()
+        self.assertAlmostEqual(lattice.overscan, 2)
+        self.assertAlmostEqual(lattice.y_overscan, 2)
+        self.assertEqual(generator.travel_report().after, generator.travel_report().before)
+
+
+if __name__ == '__main__':
+    unittest.main()
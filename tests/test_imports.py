@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('numpy', 'matplotlib', 'cerberus', 'asyncio')
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def loaded_after(self, code: str) -> list:
+        script = (f'{code}\nfrom utils.lazy import is_loaded\n'
+                  f'print(",".join(name for name in {HEAVY!r} if is_loaded(name)))')
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+        return [name for name in result.stdout.strip().split(',') if name]
+
+    def test_import_pattern_generator_is_light(self):
+        self.assertEqual(self.loaded_after('import pattern_generator, service, utils.simulator'), [])
+
+    def test_modules_load_on_first_use(self):
+        loaded = self.loaded_after('import pattern_generator as pg\n'
+                                   'pg.PatternGenerator("output.nc", 10, 10, 5, 3, 0, 0, 3, 2, '
+                                   '1000, 5000, 1000, 5000, "M4", "M5")\n'
+                                   'from utils.validator import validate_params\nvalidate_params({})')
+        self.assertEqual(loaded, ['numpy', 'cerberus'])
+
+    def test_stand_ins_stay_local(self):
+        # Other code importing a lazily used module gets the real module
+        script = ('import sys, pattern_generator\nfrom utils.lazy import LazyModule\n'
+                  'print(any(isinstance(module, LazyModule) for module in sys.modules.values()))\n'
+                  'import numpy\nprint(type(numpy).__name__, pattern_generator.np.pi == numpy.pi)')
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+        self.assertEqual(result.stdout.split(), ['False', 'module', 'True'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from pattern_generator import PatternGenerator
+from utils.plot_file import read_path
+
+
+def peak_memory(squares: int, file_name: str) -> int:
+    generator = PatternGenerator(
+        file_name=file_name, length=1, width=1, space=0.5, passes_per_mm=2,
+        x_start_pos=0, y_start_pos=0, x_squares=squares, y_squares=squares,
+        start_power=100, end_power=1000, start_feed=1000, end_feed=5000,
+        turn_on_g_code='M4', turn_off_g_code='M5')
+    tracemalloc.start()
+    try:
+        generator.write_program()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class TestLargeJob(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_peak_memory_is_flat_in_grid_size(self):
+        file_name = os.path.join(self.tmp.name, 'grid.nc')
+        peak_memory(10, file_name)  # warm up caches shared by both runs
+        small = peak_memory(10, file_name)
+        large = peak_memory(200, file_name)
+        # 400 times more squares, only the O(rows + cols) labels may add a little
+        self.assertLess(large, small * 1.25 + 64 * 1024)
+
+    def test_read_path_is_bounded(self):
+        file_name = os.path.join(self.tmp.name, 'path.nc')
+        with open(file_name, 'w') as f:
+            for i in range(10000):
+                f.write(f'G1 X{i} Y{-i} \n')
+        x, y, z = read_path(file_name, max_points=1000)
+        self.assertLessEqual(len(x), 1001)
+        self.assertEqual(y[-1], -x[-1])
+        self.assertEqual(len(read_path(file_name, max_points=None)[0]), 10001)
+
+
+if __name__ == '__main__':
+    unittest.main()
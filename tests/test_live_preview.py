@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils import live_preview as lp
+from utils.simulator import Simulation
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=4, x_start_pos=0, y_start_pos=0,
+              x_squares=3, y_squares=2, start_power=250, end_power=1000, start_feed=1000,
+              end_feed=3000, turn_on_g_code='M4', turn_off_g_code='M5')
+
+
+class TestToolpathStream(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def generator(self, **params) -> PatternGenerator:
+        return PatternGenerator(**dict(PARAMS, file_name=os.path.join(self.tmp.name, 'grid.nc'), **params))
+
+    def test_streamed_program_is_the_written_program(self):
+        for params in ({'dialect': 'custom'}, {'dialect': 'grbl-laser', 'fill': 'raster'},
+                       {'dialect': 'grbl-classic', 'resume_index': True}):
+            batches = []
+            generator = self.generator(observer=batches.append, **params)
+            generator.write_program()
+            with open(generator.file_name) as f:
+                program = f.read()
+            self.assertEqual(''.join(batches), program)
+
+            stream = lp.stream_for(generator)
+            # Parts cut in the middle of lines
+            for start in range(0, len(program), 997):
+                stream.add(program[start:start + 997])
+            stream.close()
+            segments = stream.segments()
+            whole = Simulation(program, stream.laser_mode)
+            np.testing.assert_array_equal(segments.end, whole.end)
+            np.testing.assert_array_equal(segments.burn, whole.burn)
+            np.testing.assert_array_equal(segments.feed, whole.feed)
+            self.assertGreater(segments.burn.sum(), 0)
+
+    def test_laser_codes(self):
+        self.assertEqual(lp.laser_codes('M4 S0'), (4,))
+        self.assertEqual(lp.laser_codes('m03\nM106'), (3, 106))
+        stream = lp.stream_for(self.generator(turn_on_g_code='M106', turn_off_g_code='M107'))
+        self.assertFalse(stream.laser_mode)
+        self.assertEqual(stream.on_codes, (3, 4, 106))
+        self.assertTrue(lp.stream_for(self.generator(dialect='marlin')).laser_mode)
+
+    def test_layout(self):
+        generator = self.generator()
+        layout = lp.grid_layout(generator)
+        self.assertEqual(len(layout.squares), 6)
+        self.assertEqual(sorted(set(layout.power.tolist())), generator.power_list)
+        np.testing.assert_allclose(layout.bounds(), generator.extent())
+
+
+class TestView(unittest.TestCase):
+
+    def test_fit(self):
+        view = lp.View.fit((10, 20, 110, 70), 400, 300, margin=0)
+        self.assertAlmostEqual(view.scale, 4)
+        np.testing.assert_allclose(view.to_pixels([(10, 70), (110, 20)]), [(0, 50), (400, 250)])
+
+    def test_pan_and_zoom(self):
+        view = lp.View.fit((0, 0, 100, 100), 200, 200)
+        zoomed = view.zoomed(2, 50, 80)
+        np.testing.assert_allclose(zoomed.to_bed(50, 80), view.to_bed(50, 80))
+        self.assertAlmostEqual(zoomed.scale, 2 * view.scale)
+        panned = view.panned(10, -20)
+        np.testing.assert_allclose(panned.to_pixels([(30, 40)]), view.to_pixels([(30, 40)]) + [10, -20])
+
+
+class TestPreviewRaster(unittest.TestCase):
+
+    def setUp(self):
+        self.raster = lp.PreviewRaster(lp.View(0, 10, 10, 100, 100))
+
+    def painted(self) -> np.ndarray:
+        return (self.raster.pixels != lp.BACKGROUND).any(axis=2)
+
+    def test_draw_and_merge(self):
+        # 50 passes 0.01 mm apart fall on the same pixel row
+        start = np.column_stack((np.full(50, 1.0), 5 + np.arange(50) * 0.001))
+        end = start + [5, 0]
+        colors = np.tile(np.array([255, 0, 0], dtype=np.uint8), (50, 1))
+        self.assertEqual(self.raster.draw(start, end, colors), 1)
+        painted = self.painted()
+        self.assertEqual(painted.sum(), 51)
+        self.assertTrue(painted[50, 10:61].all())
+        self.assertEqual(self.raster.pixels[50, 10].tolist(), [255, 0, 0])
+
+    def test_clip(self):
+        start, end = np.array([(-1e6, 5), (20, 20)]), np.array([(1e6, 5), (30, 30)])
+        self.assertEqual(self.raster.draw(start, end, [(255, 255, 255)] * 2), 1)
+        self.assertEqual(self.painted().sum(), 100)
+
+    def test_fill_boxes_and_ppm(self):
+        self.raster.fill_boxes([(1, 1, 2, 3), (50, 50, 1, 1)], lp.colorize(np.array([0, 1]), 0, 1))
+        self.assertEqual(self.painted().sum(), 21 * 31)
+        self.assertEqual(self.raster.pixels[60, 20].tolist(), lp.COLORMAP[0].tolist())
+        ppm = self.raster.ppm()
+        self.assertTrue(ppm.startswith(b'P6 100 100 255\n'))
+        self.assertEqual(len(ppm), len(b'P6 100 100 255\n') + 100 * 100 * 3)
+
+    def test_colorize(self):
+        colors = lp.colorize(np.array([100, 550, 1000, 2000]), 100, 1000)
+        self.assertEqual(colors[0].tolist(), lp.COLORMAP[0].tolist())
+        self.assertEqual(colors[1].tolist(), lp.COLORMAP[2].tolist())
+        self.assertEqual(colors[2].tolist(), colors[3].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
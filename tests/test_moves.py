@@ -1,7 +1,8 @@
 import unittest
 from contextlib import redirect_stdout
 from io import StringIO
-from utils.moves import Location, PowerSpeedIterator
+from utils.moves import Location, PowerSpeedIterator, raster_path, row_raster_path, TRAVEL, BLANK, BURN
+from utils.dialects import GrblLaser
 import os
 
 class TestLocation(unittest.TestCase):
@@ -46,6 +47,94 @@ class TestLocation(unittest.TestCase):
         self.assertIn('M5', content)
         os.remove('testfile.txt')
 
+    def test_location_raster_fill(self):
+        loc = Location((0, 0), 'testfile.txt', GrblLaser())
+        loc.start('testfile.txt')
+        loc.raster_fill(0, 0, 1000, 500, 10, 0.25, 0.1, 'testfile.txt', 'M4', 'M5', overscan=2)
+        with open('testfile.txt', 'r') as f:
+            lines = f.read().splitlines()
+        self.assertIn('G1 X0 Y0 F500', lines)
+        self.assertIn('G1 X10 Y0 S1000', lines)
+        self.assertIn('G1 X12 Y0 S0', lines)
+        self.assertIn('G0 X12 Y0.1', lines)
+        self.assertEqual(loc.loc, (-2, 0.1))
+        os.remove('testfile.txt')
+
+    def test_location_row_raster(self):
+        loc = Location((0, 0), 'testfile.txt', GrblLaser())
+        loc.start('testfile.txt')
+        loc.row_raster([0, 15], 0, [300, 700], 500, 10, 0.2, 0.1, 'testfile.txt', 'M4', 'M5', overscan=2)
+        with open('testfile.txt', 'r') as f:
+            lines = f.read().splitlines()
+        os.remove('testfile.txt')
+        # The power changes inline at the square edges, S0 over the gap
+        self.assertEqual(lines[5:14], ['G1 X0 Y0 F500', 'G1 X10 Y0 S300', 'G1 X15 Y0 S0', 'G1 X25 Y0 S700',
+                                       'G1 X27 Y0 S0', 'G0 X27 Y0.1', 'G1 X25 Y0.1', 'G1 X15 Y0.1 S700',
+                                       'G1 X10 Y0.1 S0'])
+        self.assertEqual(loc.loc, (-2, 0.1))
+
+    def test_fixed_point_snake_path(self):
+        loc = Location((0, 0), 'testfile.txt', fixed_point=3)
+        loc.start('testfile.txt')
+        loc.snake_path(0.1, 0.2, 1000, 500, 10, 100, 3, 'testfile.txt', 'M4', 'M5')
+        with open('testfile.txt', 'r') as f:
+            lines = f.read().splitlines()
+        os.remove('testfile.txt')
+        self.assertEqual(lines[2:8], ['G1 X0.1 Y0.2 ', 'S1000 F500 ', 'M4 ', 'G1 X10.1 Y0.2 ', 'M5 ',
+                                      'G1 X10.1 Y0.533 '])
+        # Passes are placed from their index, the last one is exactly 100 mm away
+        self.assertIn('G1 X0.1 Y100.2 ', lines)
+        self.assertEqual(loc.loc, (0.1, 100.2))
+
+    def test_fixed_point_raster_fill(self):
+        loc = Location((0, 0), 'testfile.txt', GrblLaser(), fixed_point=4)
+        loc.start('testfile.txt')
+        loc.raster_fill(0, 0, 1000, 500, 10, 0.25, 0.1, 'testfile.txt', 'M4', 'M5', overscan=2)
+        with open('testfile.txt', 'r') as f:
+            lines = f.read().splitlines()
+        os.remove('testfile.txt')
+        self.assertIn('G1 X10 Y0 S1000', lines)
+        self.assertIn('G0 X12 Y0.1', lines)
+        self.assertEqual(loc.loc, (-2, 0.1))
+
+
+class TestRasterPath(unittest.TestCase):
+    def test_float_interval_keeps_last_line(self):
+        x, y, kind = raster_path(0, 0, 10, 1, 0.2)
+        self.assertEqual(list(y[::2]), [0, 0.2, 0.4, 0.6, 0.8])
+        self.assertEqual(list(x), [0, 10, 10, 0, 0, 10, 10, 0, 0, 10])
+        self.assertEqual(list(kind[:2]), [TRAVEL, BURN])
+
+    def test_overscan(self):
+        x, y, kind = raster_path(5, 0, 10, 0.2, 0.1, overscan=3)
+        self.assertEqual(list(x), [2, 5, 15, 18, 18, 15, 5, 2])
+        self.assertEqual(list(kind), [TRAVEL, BLANK, BURN, BLANK] * 2)
+
+    def test_unidirectional(self):
+        x, y, kind = raster_path(0, 0, 10, 0.3, 0.1, overscan=1, unidirectional=True)
+        self.assertEqual(list(x), [-1, 0, 10, 11] * 3)
+
+
+class TestRowRasterPath(unittest.TestCase):
+    def test_row(self):
+        x, y, kind, square = row_raster_path([0, 15], 0, 10, 0.2, 0.1)
+        self.assertEqual(list(x), [0, 10, 15, 25, 25, 15, 10, 0])
+        self.assertEqual(list(kind), [TRAVEL, BURN, BLANK, BURN, TRAVEL, BURN, BLANK, BURN])
+        self.assertEqual(list(square), [-1, 0, -1, 1, -1, 1, -1, 0])
+
+    def test_overscan_at_row_ends(self):
+        x, y, kind, square = row_raster_path([5, 20], 0, 10, 0.2, 0.1, overscan=3)
+        self.assertEqual(list(x[:6]), [2, 5, 15, 20, 30, 33])
+        self.assertEqual(list(kind[:6]), [TRAVEL, BLANK, BURN, BLANK, BURN, BLANK])
+        self.assertEqual(list(x[6:]), [33, 30, 20, 15, 5, 2])
+        self.assertEqual(list(kind[6:]), [TRAVEL, BLANK, BURN, BLANK, BURN, BLANK])
+        self.assertEqual(list(square[6:]), [-1, -1, 1, -1, 0, -1])
+
+    def test_unidirectional(self):
+        x, y, kind, square = row_raster_path([0, 15], 0, 10, 0.3, 0.1, overscan=1, unidirectional=True)
+        self.assertEqual(list(x), [-1, 0, 10, 15, 25, 26] * 3)
+        self.assertEqual(list(y[::6]), [0, 0.1, 0.2])
+
 
 class TestPowerSpeedIterator(unittest.TestCase):
     def test_iterator(self):
@@ -88,6 +177,18 @@ class TestPowerSpeedIterator(unittest.TestCase):
         ]
         self.assertEqual(iterator_result, expected_result)
 
+    def test_fixed_point_positions(self):
+        # 0.1 mm steps add up exactly on the micron grid
+        iterator = PowerSpeedIterator(3, 1, 0, 0, 0.2, 0.2, 0.1, [1], [1, 2, 3], fixed_point=3)
+        self.assertEqual([x for x, _, _, _ in iterator], [0.3, 0.6, 0])
+        # The public positions are millimeters as well
+        iterator = iter(PowerSpeedIterator(2, 2, 15, 10, 10, 10, 5, [1, 2], [1, 2], fixed_point=3))
+        self.assertEqual((iterator.x_pos, iterator.y_pos), (15, 10))
+        next(iterator)
+        self.assertEqual((iterator.x_pos, iterator.y_pos), (30, 10))
+        iterator = PowerSpeedIterator(3, 1, 0, 0, 0.2, 0.2, 0.1, [1], [1, 2, 3])
+        self.assertNotEqual([x for x, _, _, _ in iterator], [0.3, 0.6, 0])
+
 
 if __name__ == '__main__':
     unittest.main()
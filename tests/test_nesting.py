@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from nesting import SheetNest
+from pattern_generator import PatternGenerator
+from utils.simulator import Simulation
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=3, y_squares=2, start_power=1000, end_power=5000, start_feed=1000,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+JOBS = [dict(PARAMS, passes_per_mm=passes, x_squares=x_squares, y_squares=y_squares)
+        for passes, x_squares, y_squares in [(3, 3, 2), (5, 2, 4), (2, 4, 3), (4, 2, 2)]]
+
+
+class TestSheetNest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp.name, 'nest.nc')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_grids_are_packed_apart(self):
+        nest = SheetNest(JOBS, (200, 150), self.file, gap=5)
+        self.assertEqual(sorted(grid.job for grid in nest), [0, 1, 2, 3])
+        for i, a in enumerate(nest.grids):
+            self.assertGreaterEqual(a.extent[0], 0)
+            self.assertLessEqual(a.extent[3], 150)
+            self.assertEqual(a.extent, a.generator.extent())
+            for b in nest.grids[i + 1:]:
+                apart = a.extent[2] + 5 <= b.extent[0] + 1e-9 or b.extent[2] + 5 <= a.extent[0] + 1e-9 or \
+                    a.extent[3] + 5 <= b.extent[1] + 1e-9 or b.extent[3] + 5 <= a.extent[1] + 1e-9
+                self.assertTrue(apart)
+        self.assertLessEqual(nest.travel(), nest.travel(nest.unordered))
+
+    def test_combined_program_burns_every_grid(self):
+        nest = SheetNest(JOBS, (200, 150), self.file)
+        nest.write_program()
+        combined = Simulation.from_file(self.file)
+        single = os.path.join(self.tmp.name, 'single.nc')
+        burns = 0
+        for grid in nest:
+            generator = PatternGenerator(**dict(JOBS[grid.job], file_name=single,
+                                                x_start_pos=grid.generator.x_start_pos,
+                                                y_start_pos=grid.generator.y_start_pos))
+            generator.write_program()
+            burns += len(Simulation.from_file(single).burned_segments())
+        self.assertEqual(len(combined.burned_segments()), burns)
+        self.assertEqual(len(combined.laser_on_travel()), 0)
+        with open(self.file) as f:
+            program = f.read()
+        # One preamble, the label power and feed are set again for every further grid
+        self.assertEqual(program.count('G1 F100 S1000'), 1)
+        self.assertEqual(program.count('S1000 F100 \n'), len(JOBS) - 1)
+
+    def test_invalid_jobs(self):
+        with self.assertRaises(ValueError):
+            SheetNest(JOBS, (60, 60), self.file)
+        with self.assertRaises(ValueError):
+            SheetNest([JOBS[0], dict(JOBS[1], dialect='grbl-laser')], (200, 150), self.file)
+        with self.assertRaises(ValueError):
+            SheetNest([], (200, 150), self.file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import random
+import unittest
+from itertools import combinations
+from utils.packing import skyline_pack, order_path, path_length, split_balanced
+
+
+def overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class TestSkylinePack(unittest.TestCase):
+
+    def test_bottom_left(self):
+        positions = skyline_pack([(10, 5), (10, 10), (10, 5)], (21, 20), gap=1)
+        self.assertEqual(positions, [(11, 0), (0, 0), (11, 6)])
+
+    def test_no_overlap_inside_bed(self):
+        rng = random.Random(1)
+        sizes = [(rng.uniform(5, 40), rng.uniform(5, 40)) for _ in range(40)]
+        positions = skyline_pack(sizes, (300, 300), gap=2)
+        boxes = [(x, y, x + w + 2, y + h + 2) for (x, y), (w, h) in zip(positions, sizes)]
+        for i, a in enumerate(boxes):
+            self.assertLessEqual(a[2] - 2, 300 + 1e-9)
+            self.assertLessEqual(a[3] - 2, 300 + 1e-9)
+            for b in boxes[i + 1:]:
+                self.assertFalse(overlap(a, b))
+
+    def test_does_not_fit(self):
+        with self.assertRaises(ValueError):
+            skyline_pack([(10, 10), (15, 15)], (20, 20))
+
+
+class TestOrderPath(unittest.TestCase):
+
+    def test_order_follows_the_exits(self):
+        starts = [(100, 0), (0, 0), (50, 0)]
+        ends = [(100, 10), (0, 10), (50, 10)]
+        self.assertEqual(order_path(starts, ends), [1, 2, 0])
+
+    def test_shorter_than_input_order(self):
+        rng = random.Random(2)
+        starts = [(rng.uniform(0, 500), rng.uniform(0, 500)) for _ in range(30)]
+        ends = [(x + 20, y + 40) for x, y in starts]
+        order = order_path(starts, ends)
+        self.assertEqual(sorted(order), list(range(30)))
+        self.assertLess(path_length(order, starts, ends), path_length(range(30), starts, ends))
+
+
+class TestSplitBalanced(unittest.TestCase):
+
+    @staticmethod
+    def largest(costs, runs):
+        return max(sum(costs[index] for index in run) for run in runs)
+
+    def test_optimal_contiguous_split(self):
+        rng = random.Random(4)
+        for _ in range(20):
+            costs = [rng.uniform(0, 10) for _ in range(9)]
+            runs = split_balanced(costs, 3)
+            self.assertEqual([index for run in runs for index in run], list(range(9)))
+            best = min(max(sum(costs[:a]), sum(costs[a:b]), sum(costs[b:]))
+                       for a, b in combinations(range(1, 9), 2))
+            self.assertAlmostEqual(self.largest(costs, runs), best)
+
+    def test_always_the_requested_parts(self):
+        runs = split_balanced([3, 1, 1, 1], 3)
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(self.largest([3, 1, 1, 1], runs), 3)
+        self.assertEqual(len(split_balanced([0, 0, 0], 3)), 3)
+        with self.assertRaises(ValueError):
+            split_balanced([1, 2], 3)
+
+    def test_cost_of_starting_a_run(self):
+        # A setup of 4 per run favours fewer cuts through the expensive items
+        costs = [1, 1, 1, 1, 1, 1]
+        runs = split_balanced(costs, 2, [cost + 4 for cost in costs])
+        self.assertEqual(runs, [range(0, 3), range(3, 6)])
+        costs = [1, 1, 5, 1, 1, 1]
+        starts = [cost + 4 for cost in costs]
+        runs = split_balanced(costs, 2, starts)
+        self.assertEqual(max(starts[run.start] + sum(costs[run.start + 1:run.stop]) for run in runs), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 from pattern_generator import PatternGenerator
@@ -24,7 +26,7 @@ class TestPatternGenerator(unittest.TestCase):
         ]
 
         # Mock the engraving functions
-        mock_engraving.read_font.return_value = {'A': [(0, 0, 1, 1)]}
+        mock_engraving.load_font.return_value = {'A': [(0, 0, 1, 1)]}
         mock_engraving.engr_text.return_value = {'A0': (0, 0)}
         mock_engraving.engrave = MagicMock()
 
@@ -44,7 +46,7 @@ class TestPatternGenerator(unittest.TestCase):
             file_name="output.nc", length=10, width=10, space=5, passes_per_mm=10,
             x_start_pos=0, y_start_pos=0, x_squares=4, y_squares=5,
             start_power=100, end_power=500, start_feed=1000, end_feed=4000,
-            turn_on_g_code='M4', turn_off_g_code='M5'
+            turn_on_g_code='M4', turn_off_g_code='M5', preview=True
         )
 
         # Call the generate_pattern method
@@ -55,6 +57,16 @@ class TestPatternGenerator(unittest.TestCase):
         self.assertEqual(mock_loc_instance.snake_path.call_count, 20)
         mock_plot_file.assert_called_once_with("output.nc")
 
+        # The preview is opt-in, a callable replaces the plot
+        mock_plot_file.reset_mock()
+        generator.preview = False
+        generator.generate_pattern()
+        preview = MagicMock()
+        generator.preview = preview
+        generator.generate_pattern()
+        mock_plot_file.assert_not_called()
+        preview.assert_called_once_with("output.nc")
+
     @patch('pattern_generator.m.Location')
     def test_initialize_file(self, mock_location):
         mock_loc_instance = mock_location.return_value
@@ -70,7 +82,7 @@ class TestPatternGenerator(unittest.TestCase):
     @patch('pattern_generator.e')
     @patch('pattern_generator.r.EngrCords')
     def test_etch_power_speed_values(self, mock_EngrCords, mock_engraving):
-        mock_engraving.read_font.return_value = {'A': [(0, 0, 1, 1)]}
+        mock_engraving.load_font.return_value = {'A': [(0, 0, 1, 1)]}
         mock_engraving.engr_text.return_value = {'A0': (0, 0)}
         mock_engraving.engrave = MagicMock()
 
@@ -84,14 +96,16 @@ class TestPatternGenerator(unittest.TestCase):
         }
         mock_ec_instance.pattern_start.return_value = (0, 0)
 
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
         generator = PatternGenerator(
-            file_name="output.nc", length=10, width=10, space=5, passes_per_mm=10,
+            file_name=os.path.join(tmp.name, "output.nc"), length=10, width=10, space=5, passes_per_mm=10,
             x_start_pos=0, y_start_pos=0, x_squares=4, y_squares=5,
             start_power=100, end_power=500, start_feed=1000, end_feed=4000,
             turn_on_g_code='M4', turn_off_g_code='M5'
         )
         generator.etch_power_speed_values()
-        mock_engraving.read_font.assert_called_once_with("fonts/normal.cxf")
+        mock_engraving.load_font.assert_called_once_with("fonts/normal.cxf")
         mock_ec_instance.engr_coords.assert_called_once()
         self.assertEqual(mock_engraving.engrave.call_count, 5)
 
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils import resume as rs, simulator as s
+from utils.dialects import ModalState, get_dialect
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=3, y_squares=2, start_power=1000, end_power=5000, start_feed=1000,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+DIALECTS = (('custom', False), ('grbl-laser', True), ('grbl-classic', False), ('marlin', True),
+            ('linuxcnc', False))
+
+
+def tail_burns(sim: s.Simulation, line: int) -> np.ndarray:
+    mask = sim.burn & (sim.lengths > 0) & (sim.line >= line)
+    return np.column_stack((sim.start[mask], sim.end[mask], sim.power[mask], sim.feed[mask]))
+
+
+class TestResumeIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name: str, **options) -> str:
+        file = os.path.join(self.tmp.name, name)
+        PatternGenerator(file_name=file, **dict(PARAMS, **options)).write_program()
+        return file
+
+    def test_program_unchanged(self):
+        for dialect, _ in DIALECTS:
+            plain = self.write(dialect + '.nc', dialect=dialect)
+            indexed = self.write(dialect + '-indexed.nc', dialect=dialect, resume_index=True)
+            with open(plain, 'rb') as a, open(indexed, 'rb') as b:
+                self.assertEqual(a.read(), b.read(), dialect)
+            self.assertTrue(os.path.exists(rs.index_file(indexed)))
+            self.assertFalse(os.path.exists(rs.index_file(plain)))
+
+    def test_offsets(self):
+        file = self.write('grid.nc', dialect='grbl-laser', resume_index=True)
+        index = rs.ResumeIndex.load(file)
+        self.assertEqual(index.counts, {'preamble': 1, 'label': 5, 'square': 6, 'row': 0, 'end': 1})
+        generator = PatternGenerator(file_name=file, dialect='grbl-laser', **PARAMS)
+        with open(file, 'rb') as f:
+            data = f.read()
+        for block, text in zip(index.blocks, generator.iter_blocks()):
+            self.assertEqual(data[block.offset:block.offset + len(text)], text.encode('ascii'))
+        points = list(generator.parameter_sweep())
+        for number, point in enumerate(points):
+            square = index.square(number)
+            self.assertEqual((square.info['x'], square.info['y']), (point.x, point.y))
+            self.assertEqual(square.info['power'], point.params['power'])
+        self.assertEqual(index.label(0).info['value'], generator.power_list[0])
+        with self.assertRaises(ValueError):
+            index.square(len(points))
+
+    def test_resumed_program_burns_the_rest(self):
+        self.check_resume()
+
+    def test_resumed_compact_program(self):
+        # Resumed compact programs restore the modal motion word as well
+        self.check_resume(compact_gcode=True, leading_zeros=False, rapid_travel=True)
+
+    def check_resume(self, **options):
+        for dialect, laser_mode in DIALECTS:
+            file = self.write(dialect + '.nc', dialect=dialect, resume_index=True, **options)
+            index = rs.ResumeIndex.load(file)
+            with open(file, 'rb') as f:
+                data = f.read()
+            full = s.Simulation(data, laser_mode=laser_mode)
+            for block in index.blocks[:-1]:
+                resumed = b''.join(index.iter_program(block, chunk_size=100))
+                line = data[:block.offset].count(b'\n')
+                np.testing.assert_array_equal(tail_burns(s.Simulation(resumed, laser_mode=laser_mode), 0),
+                                              tail_burns(full, line), f'{dialect} {block.kind} {block.number}')
+
+    def test_resume_from_start(self):
+        file = self.write('grid.nc', resume_index=True)
+        index = rs.ResumeIndex.load(file)
+        with open(file, 'rb') as f:
+            self.assertEqual(b''.join(index.iter_program(index.blocks[0])), f.read())
+
+    def test_write_resume(self):
+        file = self.write('grid.nc', dialect='linuxcnc', resume_index=True)
+        out = os.path.join(self.tmp.name, 'rest.nc')
+        rs.write_resume(file, out, square=4)
+        with open(out, 'rb') as f:
+            self.assertEqual(f.read(), b''.join(rs.iter_resume(file, square=4)))
+        self.assertEqual(b''.join(rs.iter_resume(file, label=2)),
+                         b''.join(rs.ResumeIndex.load(file).iter_program(
+                             rs.ResumeIndex.load(file).label(2))))
+
+    def test_row_fill(self):
+        file = self.write('grid.nc', dialect='grbl-laser', fill='rows', resume_index=True)
+        index = rs.ResumeIndex.load(file)
+        self.assertEqual(index.counts['row'], 3)
+        self.assertEqual(index.counts['square'], 0)
+        # Squares are resumed with their whole row
+        self.assertEqual(index.square(3), index.block('row', 1))
+        self.assertEqual(index.square(3).info['x'], [15, 30])
+
+    def test_changed_program(self):
+        file = self.write('grid.nc', resume_index=True)
+        with open(file, 'a') as f:
+            f.write('M5\n')
+        with self.assertRaises(ValueError):
+            rs.ResumeIndex.load(file)
+
+    def test_compressed_program(self):
+        with self.assertRaises(ValueError):
+            PatternGenerator(file_name=os.path.join(self.tmp.name, 'grid.nc.gz'), resume_index=True, **PARAMS)
+        with self.assertRaises(ValueError):
+            PatternGenerator(file_name=os.path.join(self.tmp.name, 'grid.nc'), compression='xz',
+                             resume_index=True, **PARAMS)
+
+
+class TestDialectResume(unittest.TestCase):
+
+    def test_state(self):
+        dialect = get_dialect('grbl-laser')
+        dialect.preamble(0, 0)
+        dialect.power_speed(500, 1200)
+        dialect.burn(1, 2)
+        self.assertEqual(dialect.state(), ModalState(1, 2, 500, 1200, False))
+        custom = get_dialect('custom')
+        custom.preamble(0, 0)
+        custom.power_speed(500, 1200)
+        custom.travel(3, 4)
+        self.assertEqual(custom.state(), ModalState(3, 4, 500, 1200, False))
+
+    def test_resume_preamble(self):
+        state = ModalState(1.5, '2.25', 500, 1200, False)
+        self.assertEqual(get_dialect('custom').resume(state), 'X1.5 Y2.25 \nG1 F1200 S500\n')
+        self.assertEqual(get_dialect('grbl-laser').resume(state),
+                         'G21\nG90\nM4 S0\nG0 X1.5 Y2.25\nG1 X1.5 Y2.25 S500 F1200\n')
+        with self.assertRaises(ValueError):
+            get_dialect('linuxcnc').resume(state._replace(laser=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from utils.runtime import RunTimeModel
+
+
+class TestRunTimeModel(unittest.TestCase):
+    def test_move_time(self):
+        model = RunTimeModel()
+        self.assertAlmostEqual(model.move_time(100, 6000), 1.0)
+        self.assertEqual(model.move_time(0, 6000), 0.0)
+
+    def test_move_time_with_acceleration(self):
+        model = RunTimeModel(acceleration=100)
+        # 100 mm at 10 mm/s: cruise plus one ramp time (speed / acceleration).
+        self.assertAlmostEqual(model.move_time(100, 600), 10.1)
+        # Too short to reach the feed: triangular profile.
+        self.assertAlmostEqual(model.move_time(0.25, 6000), 0.1)
+
+    def test_estimate_rapid_saving(self):
+        model = RunTimeModel(rapid_feed=6000)
+        program = ['S1000 F600 \n', 'G0 X100 Y0 \n', 'G1 X100 Y10 \n']
+        run_time = model.estimate(program)
+        self.assertAlmostEqual(run_time.rapid, 1.0)
+        self.assertAlmostEqual(run_time.rapid_at_feed, 10.0)
+        self.assertAlmostEqual(run_time.total, 2.0)
+        self.assertAlmostEqual(run_time.rapid_saving, 9.0)
+
+    def test_travel_feed_override(self):
+        model = RunTimeModel(rapid_feed=6000)
+        program = ['G1 F600\n', 'G0 X30 F3000\n', 'G1 X40\n']
+        run_time = model.estimate(program)
+        self.assertAlmostEqual(run_time.rapid, 0.6)
+        self.assertAlmostEqual(run_time.total, 1.6)
+
+    def test_collinear_moves_do_not_stop(self):
+        model = RunTimeModel(acceleration=100)
+        # A scan line split at square edges with inline power changes is one move
+        split = model.estimate(['G1 F600\n', 'G1 X50 S300\n', 'G1 X60 S0\n', 'G1 X100 S700\n'])
+        self.assertAlmostEqual(split.total, model.move_time(100, 600))
+        # A turnaround stops the head
+        back = model.estimate(['G1 F600\n', 'G1 X50\n', 'G1 X0\n'])
+        self.assertAlmostEqual(back.total, 2 * model.move_time(50, 600))
+        # Without acceleration the moves just add up
+        self.assertAlmostEqual(RunTimeModel().estimate(['G1 F600\n', 'G1 X50\n', 'G1 X0\n']).total, 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
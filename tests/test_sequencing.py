@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils import dialects as dl
+from utils.resume import ResumeIndex
+from utils.sequencing import ProgramBlock, TravelReport, serpentine, travel
+from utils.simulator import Simulation
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=4, y_squares=3, start_power=1000, end_power=5000, start_feed=1000,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+
+
+def block(x, y, length=10):
+    return ProgramBlock('square', {'x': x}, None, (x, y), (x, y + length))
+
+
+class TestSerpentine(unittest.TestCase):
+
+    def test_every_other_lane_is_reversed(self):
+        lanes = [[block(x, y) for x in (0, 15, 30)] for y in (0, 15, 30)]
+        ordered = serpentine(lanes)
+        self.assertEqual([b.start for b in ordered],
+                         [(0, 0), (15, 0), (30, 0), (30, 15), (15, 15), (0, 15), (0, 30), (15, 30), (30, 30)])
+        self.assertLess(travel(ordered), travel([b for lane in lanes for b in lane]))
+
+    def test_empty_lanes(self):
+        self.assertEqual(serpentine([[], [block(0, 0)], []]), [block(0, 0)])
+
+    def test_report(self):
+        self.assertEqual(TravelReport(100.0, 60.0).saving, 40.0)
+
+
+class TestSequencedProgram(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def simulate(self, sequence, dialect='grbl-laser', **options):
+        file = os.path.join(self.tmp.name, sequence + '.nc')
+        generator = PatternGenerator(file_name=file, dialect=dialect, sequence=sequence,
+                                     **dict(PARAMS, **options))
+        generator.write_program()
+        return generator, Simulation.from_file(file, laser_mode=True)
+
+    def test_same_squares_less_travel(self):
+        for options in ({}, {'fill': 'raster', 'overscan': 2}, {'fill': 'rows'},
+                        {'sweep': {'passes': [1, 2]}}):
+            _, grid = self.simulate('grid', **options)
+            generator, sequenced = self.simulate('serpentine', **options)
+            squares = [(point.x, point.y, 10, 10) for point in generator.parameter_sweep()]
+            # Every square gets exactly the same power and speed
+            np.testing.assert_allclose(sequenced.exposure(squares), grid.exposure(squares))
+            self.assertEqual(len(sequenced.burned_segments()), len(grid.burned_segments()))
+            report = generator.travel_report()
+            self.assertLess(report.after, report.before, options)
+            # The saving is the saving of laser off travel in the program
+            saved = grid.lengths[~grid.burn].sum() - sequenced.lengths[~sequenced.burn].sum()
+            self.assertGreater(saved, 0.75 * report.saving, options)
+
+    def test_labels_at_label_power_and_speed(self):
+        for dialect in ('grbl-laser', 'custom'):
+            generator, sequenced = self.simulate('serpentine', dialect=dialect)
+            inside = np.zeros(len(sequenced), dtype=bool)
+            for point in generator.parameter_sweep():
+                low = np.array([point.x, point.y]) - 1e-6
+                high = low + 10 + 2e-6
+                inside |= ((sequenced.start >= low) & (sequenced.start <= high) &
+                           (sequenced.end >= low) & (sequenced.end <= high)).all(axis=1)
+            labels = sequenced.burn & ~inside
+            self.assertGreater(labels.sum(), 0, dialect)
+            self.assertEqual(set(sequenced.power[labels].tolist()), {dl.LABEL_POWER}, dialect)
+            self.assertEqual(set(sequenced.feed[labels].tolist()), {dl.LABEL_SPEED}, dialect)
+
+    def test_labels_alone_keep_their_settings(self):
+        file = os.path.join(self.tmp.name, 'labels.nc')
+        PatternGenerator(file_name=file, **PARAMS).etch_power_speed_values()
+        with open(file) as f:
+            self.assertNotIn('S', f.read())
+        blocks = PatternGenerator(file_name=file, sequence='serpentine', **PARAMS).sequenced_blocks()
+        after_square = [block.write.keywords.get('after_square', False) for block in blocks]
+        self.assertEqual(after_square, [block.kind == 'label' and previous.kind != 'label'
+                                        for previous, block in zip([blocks[0]] + blocks, blocks)])
+        self.assertTrue(any(after_square))
+
+    def test_blocks(self):
+        generator = PatternGenerator(file_name='unused.nc', sequence='serpentine', **PARAMS)
+        blocks = list(generator.program_blocks())
+        grid = list(PatternGenerator(file_name='unused.nc', **PARAMS).program_blocks())
+        key = lambda entry: (entry[0], sorted(entry[1].items()))
+        self.assertEqual(sorted(map(key, blocks)), sorted(map(key, grid)))
+        # The first row runs back from the end of the power labels, its speed label comes last
+        kinds = [kind for kind, _, _ in blocks]
+        self.assertEqual(kinds[:8], ['label'] * 3 + ['square'] * 3 + ['label'] * 2)
+        self.assertEqual([info['x'] for _, info, _ in blocks[3:6]], [45, 30, 15])
+
+    def test_grid_order_unchanged(self):
+        generator = PatternGenerator(file_name='unused.nc', **PARAMS)
+        report = generator.travel_report()
+        self.assertEqual(report.before, report.after)
+
+    def test_resume_index_follows_the_sequence(self):
+        file = os.path.join(self.tmp.name, 'grid.nc')
+        PatternGenerator(file_name=file, sequence='serpentine', resume_index=True, **PARAMS).write_program()
+        index = ResumeIndex.load(file)
+        self.assertEqual(index.square(0).info['x'], 45)
+
+    def test_unknown_sequence(self):
+        with self.assertRaises(ValueError):
+            PatternGenerator(file_name='unused.nc', sequence='spiral', **PARAMS)
+
+
+if __name__ == '__main__':
+    unittest.main()
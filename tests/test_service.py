@@ -0,0 +1,145 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+from pattern_generator import FILLS, SEQUENCES, SWEEP_AXES, PatternGenerator
+from service import JobService, _run_job, make_server
+from utils.validator import validate_params
+
+PARAMS = dict(length=4, width=4, space=2, passes_per_mm=2, x_start_pos=0, y_start_pos=0,
+              x_squares=2, y_squares=2, start_power=100, end_power=500,
+              start_feed=1000, end_feed=3000, dialect='grbl-laser')
+
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = JobService(workers=2, max_queue=2, cache_size=2)
+        cls.server = make_server('127.0.0.1', 0, cls.service)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection(*self.server.server_address, timeout=60)
+        data = None if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+        connection.request(method, path, data)
+        response = connection.getresponse()
+        content = response.read()
+        connection.close()
+        return response, content
+
+    def test_generate_streams_program(self):
+        params = dict(PARAMS, x_squares=3)
+        response, content = self.request('POST', '/generate', params)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(response.getheader('X-Cache'), 'miss')
+        document, _ = validate_params(params)
+        expected = ''.join(PatternGenerator(**document).iter_blocks())
+        self.assertEqual(content.decode('ascii'), expected)
+
+    def test_repeat_request_is_cached(self):
+        params = dict(PARAMS, start_power=200)
+        first, first_content = self.request('POST', '/generate', params)
+        second, second_content = self.request('POST', '/generate', params)
+        self.assertEqual(first.getheader('X-Cache'), 'miss')
+        self.assertEqual(second.getheader('X-Cache'), 'hit')
+        self.assertEqual(first_content, second_content)
+
+    def test_output_name_is_not_part_of_the_key(self):
+        params = dict(PARAMS, end_power=400)
+        first, first_content = self.request('POST', '/generate', dict(params, file_name='a.nc'))
+        second, second_content = self.request('POST', '/generate', dict(params, file_name='b.nc'))
+        self.assertEqual(second.getheader('X-Cache'), 'hit')
+        self.assertEqual(first_content, second_content)
+
+    def test_failed_job_leaves_no_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'job.nc')
+            with self.assertRaises(OSError):
+                _run_job(dict(PARAMS, turn_on_g_code='M4', turn_off_g_code='M5', file_name='x.nc',
+                              font=os.path.join(tmp, 'missing.cxf')), path)
+            self.assertFalse(os.path.exists(path))
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            service = JobService(workers=1, cache_size=1, cache_dir=tmp)
+            self.addCleanup(service.close)
+            results = []
+            for number in range(3):
+                path = os.path.join(tmp, f'{number}.nc')
+                for file in (path, path + '.resume.json'):
+                    open(file, 'w').close()
+                job, result = Future(), Future()
+                job.set_result(os.path.getsize(path))
+                service.running[str(number)] = result
+                results.append(result)
+                if number == 2:
+                    # A file that cannot be removed does not fail the job
+                    with patch('service.os.remove', side_effect=PermissionError):
+                        service._finish(str(number), path, 0, job, result)
+                else:
+                    service._finish(str(number), path, 0, job, result)
+            self.assertEqual([result.result(timeout=1) for result in results],
+                             [os.path.join(tmp, f'{number}.nc') for number in range(3)])
+            self.assertEqual(sorted(os.listdir(tmp)), ['1.nc', '1.nc.resume.json', '2.nc', '2.nc.resume.json'])
+            self.assertEqual(list(service.cache), ['2'])
+
+    def test_invalid_parameters(self):
+        response, content = self.request('POST', '/generate', dict(PARAMS, x_squares='many'))
+        self.assertEqual(response.status, 400)
+        self.assertIn('x_squares', json.loads(content)['errors'])
+        response, _ = self.request('POST', '/generate', b'{not json')
+        self.assertEqual(response.status, 400)
+
+    def test_metrics(self):
+        self.request('POST', '/generate', PARAMS)
+        response, content = self.request('GET', '/metrics')
+        metrics = json.loads(content)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertGreaterEqual(metrics['job_latency']['count'], 1)
+        self.assertGreaterEqual(metrics['request_latency']['p95'], 0)
+        self.assertLessEqual(metrics['cached'], 2)
+
+    def test_unknown_path(self):
+        response, _ = self.request('GET', '/nothing')
+        self.assertEqual(response.status, 404)
+
+
+class TestValidateParams(unittest.TestCase):
+
+    def test_coerces_numbers(self):
+        document, errors = validate_params(PARAMS)
+        self.assertEqual(errors, {})
+        self.assertIsInstance(document['length'], float)
+        self.assertEqual(document['turn_on_g_code'], 'M4')
+
+    def test_rejects_unknown_fields(self):
+        _, errors = validate_params(dict(PARAMS, compression='gzip'))
+        self.assertIn('compression', errors)
+
+    def test_generator_choices(self):
+        for fill in FILLS:
+            self.assertEqual(validate_params(dict(PARAMS, fill=fill))[1], {}, fill)
+        for sequence in SEQUENCES:
+            self.assertEqual(validate_params(dict(PARAMS, sequence=sequence))[1], {}, sequence)
+        sweep = {axis: [1, 2] for axis in SWEEP_AXES}
+        self.assertEqual(validate_params(dict(PARAMS, sweep=sweep))[1], {})
+        _, errors = validate_params(dict(PARAMS, fill='spiral'))
+        self.assertIn('fill', errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from sharding import ShardedJob, shard_file
+from utils.simulator import Simulation
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=6, y_squares=3, start_power=250, end_power=1000, start_feed=500,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5', dialect='grbl-laser')
+
+
+class TestShardedJob(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.file = os.path.join(self.tmp.name, 'grid.nc')
+
+    def job(self, **params):
+        return dict(PARAMS, **dict({'file_name': self.file}, **params))
+
+    @staticmethod
+    def squares(generator):
+        return [(point.x, point.y, generator.width, generator.length) for point in generator.parameter_sweep()]
+
+    def test_every_square_burned_once_at_its_exposure(self):
+        job = self.job(sweep={'passes': [1, 2]})
+        whole = PatternGenerator(**dict(job, file_name=os.path.join(self.tmp.name, 'whole.nc')))
+        whole.write_program()
+        exposures = Simulation.from_file(whole.file_name, laser_mode=True).exposure(self.squares(whole))
+        expected = {(point.x, point.y): (point.params, exposure)
+                    for point, exposure in zip(whole.parameter_sweep(), exposures)}
+        sharded = ShardedJob(job, 3)
+        sharded.write(workers=1)
+        burned = {}
+        for shard in sharded.shards:
+            simulation = Simulation.from_file(shard.file_name, laser_mode=True)
+            self.assertEqual(len(simulation.laser_on_travel()), 0)
+            for segment in shard.segments:
+                generator = PatternGenerator(**segment.params)
+                dx, dy = segment.offset
+                for point, exposure in zip(generator.parameter_sweep(),
+                                           simulation.exposure(self.squares(generator))):
+                    key = (point.x - dx, point.y - dy)
+                    self.assertNotIn(key, burned)
+                    burned[key] = point.params, exposure
+        self.assertEqual(burned.keys(), expected.keys())
+        for key, (params, exposure) in expected.items():
+            self.assertEqual(burned[key][0], params)
+            self.assertAlmostEqual(burned[key][1], exposure)
+
+    def test_self_contained_programs(self):
+        sharded = ShardedJob(self.job(sweep={'passes': [1, 2]}), 3)
+        sharded.write(workers=1)
+        for shard in sharded.shards:
+            with open(shard.file_name) as f:
+                program = f.read()
+            # One preamble and one end per shard, labels for every segment
+            self.assertEqual(program.count('G21\n'), 1)
+            self.assertTrue(program.rstrip().endswith('M5'))
+            labels = sum(len(PatternGenerator(**segment.params).label_table()[0]) for segment in shard.segments)
+            self.assertEqual(labels, sum(3 + len(segment.rows) for segment in shard.segments))
+
+    def test_balanced_by_machine_time(self):
+        sharded = ShardedJob(self.job(), 3)
+        seconds = [lane.seconds for lane in sharded.lanes]
+        # The slowest feed costs most
+        self.assertEqual(int(np.argmax(seconds)), 0)
+        self.assertEqual([row for shard in sharded.shards for segment in shard.segments for row in segment.rows],
+                         list(range(6)))
+        by_count = max(sharded.setup_seconds + sum(seconds[index:index + 2]) for index in range(0, 6, 2))
+        self.assertLess(max(shard.seconds for shard in sharded.shards), by_count)
+        self.assertLess(sharded.balance(), 1.5)
+
+    def test_estimates_follow_the_programs(self):
+        for params in ({}, {'fill': 'rows'}):
+            sharded = ShardedJob(self.job(**params), 2)
+            manifest = sharded.write(workers=1)
+            for shard in manifest['shards']:
+                self.assertAlmostEqual(shard['seconds'] / shard['program_seconds'], 1, delta=0.05)
+
+    def test_parallel_and_in_process_agree(self):
+        sharded = ShardedJob(self.job(sweep={'passes': [1, 2]}), 2, by='tiles')
+        sharded.write(workers=1)
+        programs = []
+        for shard in sharded.shards:
+            with open(shard.file_name, 'rb') as f:
+                programs.append(f.read())
+        manifest = sharded.write(workers=2)
+        for shard, program in zip(sharded.shards, programs):
+            with open(shard.file_name, 'rb') as f:
+                self.assertEqual(f.read(), program)
+        self.assertEqual([len(shard['segments']) for shard in manifest['shards']], [1, 1])
+
+    def test_manifest(self):
+        sharded = ShardedJob(self.job(file_name=os.path.join(self.tmp.name, 'grid.nc.gz')), 2)
+        manifest = sharded.write(workers=1)
+        with open(os.path.join(self.tmp.name, 'grid.shards.json')) as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertEqual([shard['file_name'] for shard in manifest['shards']],
+                         [os.path.join(self.tmp.name, f'grid.shard{number}.nc.gz') for number in (1, 2)])
+        second = manifest['shards'][1]['segments'][0]
+        self.assertEqual(second['speeds'], [sharded.generator.speed_list[row] for row in second['rows']])
+        self.assertEqual(second['offset'], [0.0, -15.0 * second['rows'][0]])
+
+    def test_shard_file(self):
+        self.assertEqual(shard_file(os.path.join('out', 'grid.nc.xz'), 'shard3'),
+                         os.path.join('out', 'grid.shard3.nc.xz'))
+        self.assertEqual(shard_file('grid', 'shard1'), 'grid.shard1')
+
+    def test_invalid_split(self):
+        with self.assertRaises(ValueError):
+            ShardedJob(self.job(), 7)
+        with self.assertRaises(ValueError):
+            ShardedJob(self.job(), 2, by='tiles')
+        with self.assertRaises(ValueError):
+            ShardedJob(self.job(), 2, by='columns')
+
+
+if __name__ == '__main__':
+    unittest.main()
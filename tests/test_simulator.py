@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest.mock import patch
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils import simulator as s
+from utils.runtime import RunTimeModel
+
+PARAMS = dict(length=10, width=10, space=5, passes_per_mm=3, x_start_pos=0, y_start_pos=0,
+              x_squares=3, y_squares=2, start_power=1000, end_power=5000, start_feed=1000,
+              end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+
+
+class TestParser(unittest.TestCase):
+
+    def test_parse_words(self):
+        letters, values, lines, count = s.parse_words(b'G1 X-1.5 y.25 ; X9\n(X8) M4 S+12\nX3')
+        self.assertEqual(bytes(letters.tolist()), b'GXYMSX')
+        self.assertEqual(values.tolist(), [1, -1.5, 0.25, 4, 12, 3])
+        self.assertEqual(lines.tolist(), [0, 0, 0, 1, 1, 2])
+        self.assertEqual(count, 3)
+
+    def test_empty_program(self):
+        self.assertEqual(len(s.simulate('')), 0)
+        self.assertEqual(len(s.simulate('M5\n')), 0)
+
+
+class TestSimulation(unittest.TestCase):
+
+    def test_modal_replay(self):
+        sim = s.simulate('G0 X1 Y1\nG1 F600 S500\nM4\nX3\nY2 S250\nM5\nX1\n')
+        self.assertEqual(sim.burned_segments().tolist(), [[1, 1, 3, 1], [3, 1, 3, 2]])
+        self.assertEqual(sim.power.tolist(), [0, 500, 250, 250])
+        self.assertEqual(sim.feed.tolist(), [0, 600, 600, 600])
+        self.assertEqual(sim.line.tolist(), [0, 3, 4, 6])
+
+    def test_laser_on_travel(self):
+        program = 'M3 S500\nG1 X1 F600\nG0 X5\nM5\nG0 X0\n'
+        self.assertEqual(s.simulate(program).laser_on_travel().tolist(), [2])
+        # Laser mode controllers switch the laser off during G0 moves
+        sim = s.simulate(program, laser_mode=True)
+        self.assertEqual(len(sim.laser_on_travel()), 0)
+        self.assertEqual(sim.burned_segments().tolist(), [[0, 0, 1, 0]])
+
+    def test_linuxcnc_gate(self):
+        sim = s.simulate('M3 S500\nM65 P0\nG1 X1 F600\nM62 P0\nG1 X2\nM63 P0\nG0 X0\n')
+        self.assertEqual(sim.burned_segments().tolist(), [[1, 0, 2, 0]])
+        self.assertEqual(len(sim.laser_on_travel()), 0)
+
+    def test_exposure(self):
+        # 10 mm at 600 mm/min and half power is 0.5 W for 1 s
+        sim = s.simulate('G1 F600 S500\nM4\nX10\nM5\nG0 X20\nM4\nG1 X30 S1000\nM5\n')
+        exposure = sim.exposure([(0, -1, 10, 2), (20, -1, 10, 2), (40, 0, 5, 5)], max_power=1000)
+        np.testing.assert_allclose(exposure, [0.5 / 20, 1 / 20, 0])
+
+    def test_program_in_parts(self):
+        program = 'G0 X1 Y1\nG1 F600 S500\nM4\nX3\nM65 P0\nY2\nM62 P0\nY3 S250\nM5\nX1\n'
+        whole = s.simulate(program)
+        lines = program.splitlines(keepends=True)
+        for cut in range(len(lines) + 1):
+            first = s.simulate(''.join(lines[:cut]))
+            second = s.Simulation(''.join(lines[cut:]), initial=first.state)
+            np.testing.assert_array_equal(np.concatenate((first.end, second.end)), whole.end)
+            np.testing.assert_array_equal(np.concatenate((first.burn, second.burn)), whole.burn)
+            np.testing.assert_array_equal(np.concatenate((first.power, second.power)), whole.power)
+            self.assertEqual(second.state, whole.state)
+        self.assertEqual(whole.state, s.MachineState(1, 3, 1, 250, 600, 0, 1))
+
+    def test_diff(self):
+        a = s.simulate('G1 F600 S500\nM4\nX10 Y0\nM5\n')
+        self.assertTrue(a.diff(s.simulate('G1 X10.00001 Y0 S500 F600 M4\n'), tolerance=1e-4).equal)
+        self.assertEqual(a.diff(s.simulate('M4 S500 F600\nG1 X10 Y0.1\n')).mismatches, [0])
+        self.assertEqual(a.diff(s.simulate('M4 S400 F600\nG1 X10 Y0\n')).mismatches, [0])
+        self.assertEqual(a.diff(s.simulate('M4 S500 F600\nG1 X10 Y0\nX11\n')),
+                         s.ProgramDiff(False, (1, 2), [1]))
+
+    def test_dialects_burn_the_same(self):
+        with tempfile.TemporaryDirectory() as tmp, patch('pattern_generator.plot_file'), \
+                redirect_stdout(StringIO()):
+            sims = {}
+            for dialect, laser_mode in (('custom', False), ('grbl-laser', True), ('grbl-classic', False),
+                                        ('linuxcnc', False)):
+                name = os.path.join(tmp, dialect + '.nc')
+                generator = PatternGenerator(file_name=name, dialect=dialect, **PARAMS)
+                generator.generate_pattern()
+                sims[dialect] = s.Simulation.from_file(name, laser_mode=laser_mode)
+        custom = sims.pop('custom')
+        self.assertGreater(len(custom.burned_segments()), 0)
+        for dialect, sim in sims.items():
+            self.assertTrue(custom.diff(sim).equal, dialect)
+            self.assertEqual(len(sim.laser_on_travel()), 0, dialect)
+        # 3 lines per mm burned at power/1000 W for 60/feed s per mm
+        points = list(generator.parameter_sweep())
+        exposure = custom.exposure([(point.x, point.y, 10, 10) for point in points])
+        expected = [3 * 60 * point.params['power'] / 1000 / point.params['speed'] for point in points]
+        np.testing.assert_allclose(exposure, expected)
+
+    def test_row_fill_burns_the_same(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sims, times = {}, {}
+            for fill in ('raster', 'rows'):
+                name = os.path.join(tmp, fill + '.nc')
+                generator = PatternGenerator(file_name=name, dialect='grbl-laser', fill=fill, overscan=5,
+                                             **PARAMS)
+                generator.write_program()
+                sims[fill] = s.Simulation.from_file(name, laser_mode=True)
+                times[fill] = generator.estimate_run_time(RunTimeModel(acceleration=500)).total
+        squares = [(point.x, point.y, 10, 10) for point in generator.parameter_sweep()]
+        np.testing.assert_allclose(sims['rows'].exposure(squares), sims['raster'].exposure(squares))
+        self.assertEqual(len(sims['rows'].laser_on_travel()), 0)
+        # One turnaround per scan line of a row instead of one per square
+        self.assertLess(times['rows'], times['raster'])
+
+    def test_fixed_point_burns_the_same(self):
+        with tempfile.TemporaryDirectory() as tmp, patch('pattern_generator.plot_file'), \
+                redirect_stdout(StringIO()):
+            sims = []
+            for fixed_point in (None, 3):
+                name = os.path.join(tmp, f'{fixed_point}.nc')
+                PatternGenerator(file_name=name, fixed_point=fixed_point, **PARAMS).generate_pattern()
+                sims.append(s.Simulation.from_file(name))
+        self.assertTrue(sims[0].diff(sims[1], tolerance=0.0006).equal)
+
+    def test_compact_burns_the_same(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for dialect, laser_mode in (('custom', False), ('grbl-laser', True), ('marlin', True),
+                                        ('grbl-classic', False), ('linuxcnc', False)):
+                sims, sizes = [], []
+                for compact in (False, True):
+                    name = os.path.join(tmp, f'{dialect}-{compact}.nc')
+                    PatternGenerator(file_name=name, dialect=dialect, rapid_travel=True, fill='raster',
+                                     compact_gcode=compact, leading_zeros=not compact, **PARAMS).write_program()
+                    sims.append(s.Simulation.from_file(name, laser_mode=laser_mode))
+                    sizes.append(os.path.getsize(name))
+                self.assertTrue(sims[0].diff(sims[1]).equal, dialect)
+                self.assertEqual(len(sims[1].laser_on_travel()), 0, dialect)
+                self.assertLess(sizes[1], 0.85 * sizes[0], dialect)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from pattern_generator import PatternGenerator
+from utils import spatial as s
+
+
+def label(name, *lines):
+    return s.Footprint(name, np.array(lines, dtype=float))
+
+
+class TestSpatial(unittest.TestCase):
+
+    def test_segment_distance(self):
+        a = np.array([[0, 0, 10, 0]], dtype=float)
+        self.assertEqual(s.segment_distance(a, np.array([[5, -1, 5, 1]], dtype=float)), 0.0)
+        self.assertAlmostEqual(s.segment_distance(a, np.array([[12, 0, 12, 5]], dtype=float)), 2.0)
+        self.assertAlmostEqual(s.segment_distance(a, np.array([[3, 4, 6, 4]], dtype=float)), 4.0)
+
+    def test_grid_query(self):
+        grid = s.SpatialGrid(np.array([[0, 0, 5, 5], [100, 100, 105, 105], [8, 8, 12, 12]], dtype=float), 10)
+        self.assertEqual(grid.query((4, 4, 6, 6)).tolist(), [0, 2])
+        self.assertEqual(grid.query((101, 101, 102, 102)).tolist(), [1])
+        self.assertEqual(grid.query((50, 50, 60, 60)).tolist(), [])
+
+    def test_lattice(self):
+        lattice = s.Lattice([(0, 0), (100, 0)], 3, 2, 15, 15, 10, 10)
+        self.assertEqual(len(list(lattice)), 12)
+        self.assertEqual(sorted(lattice.near((8, 8, 16, 16))), [(0, 0), (0, 15), (15, 0), (15, 15)])
+        self.assertEqual(list(lattice.near((12, 0, 13, 30))), [])
+        self.assertEqual(list(lattice.near((50, 0, 60, 10))), [])
+        gaps = [gap for gap, _, _ in lattice.neighbours()]
+        self.assertEqual(gaps, [5, 5, 60])
+
+    def test_labels_against_lattice(self):
+        lattice = s.Lattice([(0, 0)], 3, 3, 15, 15, 10, 10)
+        labels = s.FootprintList(lambda name, x: label(name, [x, -3, x + 8, -1]), ['a', 'b'], [0, 15])
+        report = s.check_layout(labels, lattice, clearance=0.5)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.min_clearance, (1.0, 'a', 'square at (0, 0)'))
+        labels = s.FootprintList(lambda name, x: label(name, [x, -3, x + 8, 1]), ['a'], [16])
+        report = s.check_layout(labels, lattice, bed=(30, 40))
+        self.assertEqual(report.overlaps, [('a', 'square at (15, 0)')])
+        self.assertEqual(report.out_of_bounds, ['a', 'square at (30, 0)', 'square at (30, 15)', 'square at (30, 30)'])
+
+    def test_label_over_square(self):
+        square = s.rectangle('square', 0, 0, 10, 10)
+        inner = label('inner', [2, 2, 3, 3])
+        crossing = label('crossing', [-5, 5, 5, 5])
+        report = s.check_layout([square, inner, crossing])
+        self.assertEqual(report.overlaps, [('square', 'inner'), ('square', 'crossing')])
+        self.assertFalse(report.ok)
+
+    def test_clearance(self):
+        squares = [s.rectangle('a', 0, 0, 10, 10), s.rectangle('b', 12, 0, 10, 10),
+                   s.rectangle('c', 25, 0, 10, 10)]
+        report = s.check_layout(squares, clearance=2.5)
+        self.assertEqual(report.overlaps, [])
+        self.assertEqual(report.too_close, [('a', 'b', 2.0)])
+        self.assertEqual(report.min_clearance, (2.0, 'a', 'b'))
+
+    def test_out_of_bounds(self):
+        footprints = [s.rectangle('inside', 10, 10, 10, 10),
+                      s.rectangle('overscan', 2, 10, 10, 10, overscan=3),
+                      label('label', [95, 50, 105, 50])]
+        report = s.check_layout(footprints, bed=(100, 100))
+        self.assertEqual(report.out_of_bounds, ['overscan', 'label'])
+        self.assertIn('Outside the bed: label', report.summary())
+
+
+class TestVerifyLayout(unittest.TestCase):
+
+    def test_verify_layout(self):
+        params = dict(file_name="output.nc", length=10, width=10, x_start_pos=0, y_start_pos=0,
+                      passes_per_mm=3, x_squares=3, y_squares=3, start_power=1000, end_power=5000,
+                      start_feed=1000, end_feed=5000, turn_on_g_code='M4', turn_off_g_code='M5')
+        report = PatternGenerator(space=5, **params).verify_layout()
+        self.assertTrue(report.ok)
+        self.assertGreater(report.min_clearance[0], 0)
+
+        # Labels wider than the column pitch run into each other and into the squares
+        report = PatternGenerator(space=0.5, bed_size=(40, 100), **params).verify_layout()
+        self.assertIn(('label 1000 at (10.5, 0)', 'label 3000 at (21, 0)'), report.overlaps)
+        self.assertIn('square at (31.5, 31)', report.out_of_bounds)
+
+
+if __name__ == '__main__':
+    unittest.main()
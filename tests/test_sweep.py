@@ -0,0 +1,88 @@
+import unittest
+from itertools import islice
+from unittest.mock import patch, MagicMock
+from pattern_generator import PatternGenerator
+from utils.sweep import ParameterSweep, SweepPoint
+from utils.moves import PowerSpeedIterator
+
+
+class TestParameterSweep(unittest.TestCase):
+    def test_two_axes_match_power_speed_iterator(self):
+        power_list, speed_list = [100, 200, 300], [1000, 2000]
+        iterator = iter(PowerSpeedIterator(3, 2, 15, 10, 10, 10, 5, speed_list, power_list))
+        expected = []
+        for _ in range(6):
+            expected.append((iterator.x_pos, iterator.y_pos, iterator.power, iterator.speed))
+            next(iterator)
+
+        sweep = ParameterSweep({'power': power_list, 'speed': speed_list}, 15, 10, 15, 15)
+        result = [(p.x, p.y, p.params['power'], p.params['speed']) for p in sweep]
+        self.assertEqual(result, expected)
+        self.assertEqual(len(sweep), 6)
+
+    def test_extra_axes_tile_sub_grids(self):
+        sweep = ParameterSweep({'power': [1, 2], 'speed': [3], 'line_interval': [0.1, 0.2],
+                                'passes': [1, 2, 3]}, 0, 0, 10, 10, 30, 20)
+        self.assertEqual(sweep.shape, (2, 1, 2, 3))
+        self.assertEqual(sweep.tiles, (2, 3))
+        points = list(sweep)
+        self.assertEqual(len(points), 12)
+        last = points[-1]
+        self.assertEqual(last.tile, (1, 2))
+        self.assertEqual((last.x, last.y), (40, 40))
+        self.assertEqual(last.params, {'power': 2, 'speed': 3, 'line_interval': 0.2, 'passes': 3})
+        self.assertEqual(len({(p.x, p.y) for p in points}), 12)
+
+    def test_lazy(self):
+        values = range(1000)
+        sweep = ParameterSweep({'a': values, 'b': values, 'c': values, 'd': values}, 0, 0, 1, 1)
+        self.assertEqual(len(sweep), 1000 ** 4)
+        first = list(islice(sweep, 2))
+        self.assertEqual(first[1], SweepPoint(1, 0, (0, 0), {'a': 1, 'b': 0, 'c': 0, 'd': 0}))
+
+    def test_record_has_slots(self):
+        point = SweepPoint(1, 2, (0, 0), {})
+        with self.assertRaises(AttributeError):
+            point.z = 3
+        x, y, params = point
+        self.assertEqual((x, y, params), (1, 2, {}))
+
+    def test_invalid_axes(self):
+        with self.assertRaises(ValueError):
+            ParameterSweep({'power': [1]}, 0, 0, 1, 1)
+        with self.assertRaises(ValueError):
+            ParameterSweep({'power': [1], 'speed': []}, 0, 0, 1, 1)
+
+
+class TestGeneratorSweep(unittest.TestCase):
+
+    @patch('pattern_generator.m.Location')
+    @patch('pattern_generator.r.EngrCords')
+    def test_generate_snake_paths_with_sweep(self, mock_EngrCords, mock_location):
+        mock_loc_instance = mock_location.return_value
+        mock_loc_instance.snake_path = MagicMock()
+
+        mock_ec_instance = mock_EngrCords.return_value
+        mock_ec_instance.pattern_start.return_value = (0, 0)
+
+        generator = PatternGenerator(
+            file_name="output.nc", length=10, width=10, space=5, passes_per_mm=10,
+            x_start_pos=0, y_start_pos=0, x_squares=4, y_squares=5,
+            start_power=100, end_power=500, start_feed=1000, end_feed=4000,
+            turn_on_g_code='M4', turn_off_g_code='M5',
+            sweep={'line_interval': [0.1, 0.2], 'passes': [1, 2]}
+        )
+        generator.generate_snake_paths()
+        # 20 squares in each of 4 sub-grids, half of them burned twice
+        self.assertEqual(mock_loc_instance.snake_path.call_count, 120)
+        with self.assertRaises(ValueError):
+            PatternGenerator(
+                file_name="output.nc", length=10, width=10, space=5, passes_per_mm=10,
+                x_start_pos=0, y_start_pos=0, x_squares=4, y_squares=5,
+                start_power=100, end_power=500, start_feed=1000, end_feed=4000,
+                turn_on_g_code='M4', turn_off_g_code='M5', sweep={'focus': [1, 2]}
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,42 @@
-import numpy as np
-from typing import List
+from __future__ import annotations
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Union
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+MODES = ('linear', 'geometric', 'power', 'explicit')
+
+
+@lru_cache(maxsize=256)
+def _distribution(start: float, end: float, steps: int, mode: str, exponent: float,
+                  step: Optional[float], explicit: Tuple) -> Tuple:
+    """
+    Memoized, vectorized computation behind `Divider.distribute`.
+    """
+    if mode == 'linear':
+        values = np.linspace(start, end, steps)
+    elif mode == 'geometric':
+        if start <= 0 or end <= 0:
+            raise ValueError('Geometric distribution needs positive start and end values')
+        values = np.geomspace(start, end, steps)
+    elif mode == 'power':
+        values = start + (end - start) * np.linspace(0, 1, steps) ** exponent
+    elif mode == 'explicit':
+        if not step:
+            return explicit
+        values = np.asarray(explicit, dtype=float)
+    else:
+        raise ValueError(f'Unknown distribution: {mode}. Use one of: {", ".join(MODES)}')
+
+    if step:
+        values = np.round(values / step) * step
+        if float(step).is_integer():
+            return tuple(values.astype(int).tolist())
+        # Remove the binary noise of the multiplication, e.g. 0.30000000000000004
+        decimals = max(0, -int(np.floor(np.log10(step))) + 6)
+        values = np.round(values, decimals)
+    return tuple(values.tolist())
 
 
 class Divider:
@@ -32,6 +69,43 @@ class Divider:
         self.values_list = list(np.linspace(start, end, steps, dtype=int))
         return self.values_list
 
+    def distribute(self, start: float, end: float, steps: int, mode: str = 'linear',
+                   step: Optional[float] = None, exponent: float = 2.0,
+                   explicit: Optional[Sequence[float]] = None) -> List[Union[int, float]]:
+        """
+        Method to spread values between start and end parameters
+        with a chosen distribution.
+
+        Parameters
+        ----------
+        start: float
+            Start of the range.
+        end: float
+            End of the range.
+        steps: int
+            Number of values.
+        mode: str
+            'linear' for equal steps, 'geometric' for equal ratios (logarithmic
+            spacing, which follows the roughly logarithmic material response),
+            'power' for start + (end - start) * t ** exponent,
+            'explicit' to use the `explicit` values as they are.
+        step: Optional[float]
+            Round every value to a multiple of `step`. Integer steps give
+            int values, None keeps exact floats.
+        exponent: float
+            Exponent of the 'power' distribution.
+        explicit: Optional[Sequence[float]]
+            Values of the 'explicit' distribution, start, end and steps are ignored.
+
+        Returns
+        -------
+        values_list: List[Union[int, float]]
+            List of values.
+        """
+        self.values_list = list(_distribution(start, end, steps, mode, exponent, step,
+                                              tuple(explicit or ())))
+        return self.values_list
+
     @staticmethod
     def find_longest(lst: List[int]) -> int:
         """
@@ -1,4 +1,5 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterator, Optional
+from utils.fixed_point import get_fixed_point
 
 
 class EngrCords:
@@ -14,12 +15,16 @@ class EngrCords:
         Dictionary to store power/speed values and their corresponding coordinates.
     sign_coords : list
         List to store coordinates for engraving.
+    fixed_point : Optional[int]
+        Decimal places of integer fixed-point coordinates (3 for microns),
+        None for float coordinates.
     """
-    def __init__(self):
+    def __init__(self, fixed_point: Optional[int] = None):
         self.y_start = None
         self.x_start = None
         self.sign_dict = {}
         self.sign_coords = []
+        self.fixed_point = fixed_point
 
     def engr_coords(self, x: float, y: float, width: float, length: float, space: float, pwr_list: List[int], speed_list: List[int]) -> Dict[Tuple[int, str], Tuple[float, float]]:
         """
@@ -47,19 +52,54 @@ class EngrCords:
         sign_dict: Dict[Tuple[int, str], Tuple[float, float]]
             Dictionary with power/speed and their corresponding coordinates.
         """
+        # A new dictionary on every call, labels of previous grids are not kept
+        self.sign_dict = dict(self.iter_engr_coords(x, y, width, length, space, pwr_list, speed_list,
+                                                    self.fixed_point))
+        return self.sign_dict
+
+    @staticmethod
+    def iter_engr_coords(x: float, y: float, width: float, length: float, space: float,
+                         pwr_list: List[int], speed_list: List[int], fixed_point: Optional[int] = None
+                         ) -> Iterator[Tuple[Tuple[int, str], Tuple[float, float]]]:
+        """
+        Yield values and coordinates for engraving one by one,
+        in the order of `engr_coords`, without building a dictionary.
+
+        Parameters
+        ----------
+        x, y, width, length, space, pwr_list, speed_list
+            As in `engr_coords`.
+        fixed_point: Optional[int]
+            Decimal places of integer fixed-point coordinates, None for floats.
+
+        Yields
+        ------
+        item: Tuple[Tuple[int, str], Tuple[float, float]]
+            (value, 'p' or 's') and the coordinates of the label.
+        """
+        if fixed_point is not None:
+            # The n-th label is exactly n integer pitches away from the start.
+            fixed = get_fixed_point(fixed_point)
+            x_units, y_units = fixed.units(x), fixed.units(y)
+            x_pitch = fixed.units(width) + fixed.units(space)
+            y_pitch = fixed.units(length) + fixed.units(space)
+            for n, pwr in enumerate(pwr_list, 1):
+                yield (pwr, 'p'), (fixed.mm(x_units + n * x_pitch), fixed.mm(y_units))
+            for n, speed in enumerate(speed_list, 1):
+                yield (speed, 's'), (fixed.mm(x_units), fixed.mm(y_units + n * y_pitch))
+            return
+
         loc_y = y
         loc_x = x
         for pwr in pwr_list:
             loc_x += width + space
-            self.sign_dict[(pwr, 'p')] = (loc_x, loc_y)
+            yield (pwr, 'p'), (loc_x, loc_y)
 
         loc_y = y  # Reset loc_y to y
         loc_x = x
         for speed in speed_list:
             loc_y += length + space  # Increment loc_y by length + space
-            self.sign_dict[(speed, 's')] = (loc_x, loc_y)
-
-        return self.sign_dict
+            yield (speed, 's'), (loc_x, loc_y)
 
     def pattern_start(self, x: float, y: float, width: float, length: float, space: float) -> Tuple[float, float]:
         """
@@ -85,8 +125,13 @@ class EngrCords:
         y_start: float
             Start position in y-axis.
         """
-        self.x_start = x + width + space
-        self.y_start = y + length
+        if self.fixed_point is None:
+            self.x_start = x + width + space
+            self.y_start = y + length
+        else:
+            fixed = get_fixed_point(self.fixed_point)
+            self.x_start = fixed.mm(fixed.units(x) + fixed.units(width) + fixed.units(space))
+            self.y_start = fixed.mm(fixed.units(y) + fixed.units(length))
         return self.x_start, self.y_start
 
     @staticmethod
@@ -0,0 +1,98 @@
+from typing import Optional
+from utils import gcode_io as gio
+from utils.lazy import lazy_import
+
+asyncio = lazy_import('asyncio')
+
+
+class AsyncSink:
+    """
+    Asynchronous G-code file writer with backpressure.
+
+    Chunks are queued and written by a background task; the blocking file
+    writes (and compression) run in an executor so the event loop is never
+    blocked. When `max_pending` chunks are waiting, `write` suspends the
+    producer until the file catches up.
+
+    Usage:
+        async with AsyncSink('grid.nc.gz') as sink:
+            await sink.write('G1 X0 Y0\\n')
+
+    Parameters
+    ----------
+    file_name: str
+        Name of the output file.
+    compression: Optional[str]
+        'gzip', 'xz', 'zstd', 'none' or None to guess from the file suffix.
+    level: Optional[int]
+        Compression level.
+    block_size: Optional[int]
+        Size in bytes of the write buffer in front of the compressor.
+    max_pending: int
+        Number of queued chunks before `write` waits.
+    executor: Optional[concurrent.futures.Executor]
+        Executor running the file writes, the loop default executor when None.
+    """
+
+    def __init__(self, file_name: str, compression: Optional[str] = None, level: Optional[int] = None,
+                 block_size: Optional[int] = None, max_pending: int = 16, executor=None):
+        self.file_name = file_name
+        self.compression = compression
+        self.level = level
+        self.block_size = block_size
+        self.max_pending = max_pending
+        self.executor = executor
+        self.file = None
+        self.queue = None
+        self.task = None
+        self.bytes_written = 0
+
+    async def __aenter__(self) -> 'AsyncSink':
+        loop = asyncio.get_running_loop()
+        self.file = await loop.run_in_executor(self.executor, gio.open_gcode, self.file_name, 'w',
+                                               self.compression, self.level, self.block_size)
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.task = asyncio.create_task(self._drain())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        loop = asyncio.get_running_loop()
+        try:
+            if not self.task.done():
+                await self.queue.put(None)
+            await self.task
+        finally:
+            await loop.run_in_executor(self.executor, self.file.close)
+
+    async def write(self, chunk: str):
+        """
+        Queue a chunk for writing, waiting while the queue is full.
+
+        Parameters
+        ----------
+        chunk: str
+            G-code text to write.
+        """
+        if self.task.done():
+            # Surface the error of the writer task instead of waiting forever.
+            self.task.result()
+            raise RuntimeError('AsyncSink is closed')
+        await self.queue.put(chunk)
+
+    async def _drain(self):
+        """
+        Background task writing queued chunks; chunks waiting together are
+        joined into one write to save executor round trips.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            chunks = [await self.queue.get()]
+            while not self.queue.empty():
+                chunks.append(self.queue.get_nowait())
+            closing = chunks[-1] is None
+            data = ''.join(chunk for chunk in chunks if chunk is not None)
+            if data:
+                await loop.run_in_executor(self.executor, self.file.write, data)
+                self.bytes_written += len(data)
+            if closing:
+                return
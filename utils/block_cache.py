@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+# Blocks kept by default, a 20 x 20 grid has 440 labels and squares.
+MAX_BLOCKS = 1024
+
+
+def snapshot(dialect) -> Tuple:
+    """
+    Modal state and settings of a dialect as a hashable tuple.
+    """
+    return tuple(vars(dialect).items())
+
+
+class BlockCache:
+    """
+    G-code of labels and squares kept between generations.
+
+    The text of a block only depends on the generator settings (see
+    `bind`), the block parameters and the state of the dialect where the
+    block starts, so a block rendered before is reused when all three are
+    the same: its text is returned and the dialect is put into the state
+    it had after the block. Least recently used blocks are dropped.
+
+    Parameters
+    ----------
+    max_blocks: int
+        Number of blocks kept.
+
+    Attributes
+    ----------
+    hits : int
+        Blocks served from the cache.
+    misses : int
+        Blocks rendered.
+    """
+    def __init__(self, max_blocks: int = MAX_BLOCKS):
+        self.max_blocks = max_blocks
+        self.blocks = OrderedDict()
+        self.settings = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def bind(self, settings: Hashable):
+        """
+        Use the cache with a generator of the given settings. All blocks
+        are dropped when the settings differ from the previous generator.
+        """
+        if settings != self.settings:
+            self.clear()
+            self.settings = settings
+
+    def clear(self):
+        self.blocks.clear()
+
+    def render(self, kind: str, info: Dict, dialect, render: Callable[[], str]) -> str:
+        """
+        Text of a block, rendered by `render()` when it is not cached.
+
+        Parameters
+        ----------
+        kind: str
+            'label', 'square' or 'row'.
+        info: Dict
+            Value and position of a label, position and parameters of a square or a row.
+        dialect: Dialect
+            Dialect writing the block, left in its state after the block.
+        render: Callable[[], str]
+            Writes the block and returns its text.
+        """
+        key = (kind, repr(sorted(info.items())), snapshot(dialect))
+        entry = self.blocks.get(key)
+        if entry is not None:
+            self.blocks.move_to_end(key)
+            self.hits += 1
+            text, state = entry
+            vars(dialect).update(state)
+            return text
+        self.misses += 1
+        text = render()
+        self.blocks[key] = text, dict(vars(dialect))
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return text
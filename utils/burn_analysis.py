@@ -0,0 +1,260 @@
+from __future__ import annotations
+from math import ceil, sqrt
+from typing import NamedTuple, Optional, Tuple
+from utils.lazy import lazy_import
+from utils.spatial import Box
+
+np = lazy_import('numpy')
+
+# Fraction of the square size at every side counted as its edge band.
+EDGE_FRACTION = 0.15
+# Scans are reduced to about this many pixels before the analysis.
+MAX_PIXELS = 8_000_000
+# Percentile of the scan brightness taken as the unburned material.
+PAPER_PERCENTILE = 90
+
+
+class Recommendation(NamedTuple):
+    """
+    Square recommended by `BurnAnalysis.recommend`.
+
+    index: position of the square in the parameter sweep.
+    power, speed: its parameters.
+    darkness, spread, edge: its measurements, see `BurnAnalysis`.
+    """
+    index: int
+    power: float
+    speed: float
+    darkness: float
+    spread: float
+    edge: float
+
+
+class BurnAnalysis(NamedTuple):
+    """
+    Measurements of every square of a scanned grid, in the order of the
+    parameter sweep (sub-grid by sub-grid, speed rows, power columns).
+
+    power, speed: parameters of every square.
+    darkness: mean darkness of the square centre, 0 for the unburned material, 1 for black.
+    spread: standard deviation of the darkness in the centre, low for an even burn.
+    edge: darkness of the edge band minus the centre, positive for over-burned edges.
+    shape: number of sub-grids, speed rows and power columns.
+    """
+    power: np.ndarray
+    speed: np.ndarray
+    darkness: np.ndarray
+    spread: np.ndarray
+    edge: np.ndarray
+    shape: Tuple[int, int, int]
+
+    def heatmap(self, metric: str = 'darkness', tile: int = 0) -> np.ndarray:
+        """
+        Speed x power table of a measurement for one sub-grid, rows in the
+        order of the speed values and columns in the order of the powers.
+        """
+        if metric not in ('darkness', 'spread', 'edge'):
+            raise ValueError(f'Unknown metric: {metric}. Use darkness, spread or edge')
+        return getattr(self, metric).reshape(self.shape)[tile]
+
+    def recommend(self, target: float = 0.7, tolerance: float = 0.02) -> Recommendation:
+        """
+        Setting giving the target darkness with an even burn and clean edges.
+
+        Every square is scored by its distance to the target darkness plus
+        its spread plus its edge over-burn. Among the squares within
+        `tolerance` of the best score the fastest wins (the shortest job),
+        then the one with the least power.
+
+        Parameters
+        ----------
+        target: float
+            Wanted darkness from 0 (unburned) to 1 (black).
+        tolerance: float
+            Score difference treated as equally good.
+
+        Returns
+        -------
+        recommendation: Recommendation
+            Parameters and measurements of the chosen square.
+        """
+        score = np.abs(self.darkness - target) + self.spread + np.maximum(self.edge, 0)
+        good = np.flatnonzero(score <= score.min() + tolerance)
+        # lexsort uses the last key first: highest speed, then lowest power.
+        index = int(good[np.lexsort((self.power[good], -self.speed[good]))[0]])
+        return Recommendation(index, self.power[index].item(), self.speed[index].item(),
+                              float(self.darkness[index]), float(self.spread[index]),
+                              float(self.edge[index]))
+
+
+def load_scan(image, max_pixels: Optional[int] = MAX_PIXELS) -> np.ndarray:
+    """
+    Grayscale pixels of a scan, reduced by an integer factor (box filter)
+    to at most about `max_pixels`.
+
+    Parameters
+    ----------
+    image: Union[str, PIL.Image.Image, np.ndarray]
+        Image file, Pillow image or array (grayscale or RGB, 0-255).
+    max_pixels: Optional[int]
+        Pixel budget of the analysis, None to keep the full resolution.
+
+    Returns
+    -------
+    pixels: np.ndarray
+        uint8 brightness, first row at the top of the image.
+    """
+    from PIL import Image
+    if isinstance(image, str):
+        with Image.open(image) as opened:
+            return load_scan(opened.convert('L'), max_pixels)
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image).astype(np.uint8))
+    image = image.convert('L')
+    if max_pixels and image.width * image.height > max_pixels:
+        image = image.reduce(ceil(sqrt(image.width * image.height / max_pixels)))
+    return np.asarray(image)
+
+
+def integral(values: np.ndarray) -> np.ndarray:
+    """
+    Summed-area table with a zero first row and column, exact for integer pixels.
+    """
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(values, axis=0, dtype=np.int64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sums(table: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """
+    Sums of many pixel boxes at once: rows and cols are (n, 2) arrays of
+    the first and past-the-last row and column of every box.
+    """
+    r0, r1 = rows[:, 0], rows[:, 1]
+    c0, c1 = cols[:, 0], cols[:, 1]
+    return table[r1, c1] - table[r0, c1] - table[r1, c0] + table[r0, c0]
+
+
+def analyze_scan(image, generator, bounds: Optional[Box] = None, edge_fraction: float = EDGE_FRACTION,
+                 paper: Optional[float] = None, max_pixels: Optional[int] = MAX_PIXELS) -> BurnAnalysis:
+    """
+    Measure every square of a scanned or photographed burn grid.
+
+    The squares are located from the generation parameters, with the same
+    geometry the program was written with (`generator.parameter_sweep()`):
+    no image feature detection is needed when the scan is cropped to a known
+    area of the bed. Integral images of the brightness and its square are
+    built once and the darkness, spread and edge over-burn of all squares
+    follow from four lookups per box, so the cost is one pass over the
+    pixels however many squares there are.
+
+    Parameters
+    ----------
+    image: Union[str, PIL.Image.Image, np.ndarray]
+        Scan of the burned piece, top up, straight and without perspective.
+    generator: PatternGenerator
+        Generator of the burned program, or one with the same parameters.
+    bounds: Optional[Box]
+        x_min, y_min, x_max, y_max in millimeters of the bed area covered by
+        the image. `generator.extent(overscan=False)` (squares and labels,
+        without the laser off raster overscan) when None, i.e. the scan
+        cropped to the outer edges of the burned labels and squares.
+    edge_fraction: float
+        Width of the edge band as a fraction of the square size.
+    paper: Optional[float]
+        Brightness (0-255) of the unburned material, measured from the scan when None.
+    max_pixels: Optional[int]
+        Larger scans are reduced to about this many pixels first.
+
+    Returns
+    -------
+    analysis: BurnAnalysis
+        Measurements of all squares.
+
+    Raises
+    ------
+    ValueError
+        A square lies outside the image or is smaller than a few pixels.
+    """
+    if not 0 < edge_fraction < 0.5:
+        raise ValueError('edge_fraction must be between 0 and 0.5')
+    pixels = load_scan(image, max_pixels)
+    height, width = pixels.shape
+    x_min, y_min, x_max, y_max = generator.extent(overscan=False) if bounds is None else bounds
+    if paper is None:
+        paper = float(np.percentile(pixels[::4, ::4], PAPER_PERCENTILE))
+    if paper <= 0:
+        raise ValueError('The scan is black, the unburned material cannot be measured')
+
+    sweep = generator.parameter_sweep()
+    points = list(sweep)
+    x = np.array([point.x for point in points], dtype=float)
+    y = np.array([point.y for point in points], dtype=float)
+    x_scale = width / (x_max - x_min)
+    y_scale = height / (y_max - y_min)
+    dx = edge_fraction * generator.width
+    dy = edge_fraction * generator.length
+
+    def pixel_box(left, bottom, right, top):
+        # Image rows grow downwards, bed Y upwards.
+        cols = np.rint(np.column_stack(((left - x_min) * x_scale, (right - x_min) * x_scale))).astype(np.int64)
+        rows = np.rint(np.column_stack(((y_max - top) * y_scale, (y_max - bottom) * y_scale))).astype(np.int64)
+        return rows, cols
+
+    outer = pixel_box(x, y, x + generator.width, y + generator.length)
+    inner = pixel_box(x + dx, y + dy, x + generator.width - dx, y + generator.length - dy)
+    rows, cols = outer
+    if rows.min() < 0 or cols.min() < 0 or rows.max() > height or cols.max() > width:
+        raise ValueError('Squares lie outside the scan, check the bounds of the image')
+    inner_count = (inner[0][:, 1] - inner[0][:, 0]) * (inner[1][:, 1] - inner[1][:, 0])
+    outer_count = (rows[:, 1] - rows[:, 0]) * (cols[:, 1] - cols[:, 0])
+    if inner_count.min() < 1 or (outer_count - inner_count).min() < 1:
+        raise ValueError('The squares are too small in the scan, use a higher resolution')
+
+    values = pixels.astype(np.int64)
+    sums, squares = integral(values), integral(values * values)
+    inner_sum = box_sums(sums, *inner)
+    edge_sum = box_sums(sums, *outer) - inner_sum
+    inner_mean = inner_sum / inner_count
+    variance = np.maximum(box_sums(squares, *inner) / inner_count - inner_mean ** 2, 0)
+    edge_mean = edge_sum / (outer_count - inner_count)
+
+    shape = (len(points) // (len(sweep.values[0]) * len(sweep.values[1])),
+             len(sweep.values[1]), len(sweep.values[0]))
+    return BurnAnalysis(np.array([point.params['power'] for point in points]),
+                        np.array([point.params['speed'] for point in points]),
+                        np.clip(1 - inner_mean / paper, 0, 1), np.sqrt(variance) / paper,
+                        (inner_mean - edge_mean) / paper, shape)
+
+
+def plot_heatmap(analysis: BurnAnalysis, metric: str = 'darkness', tile: int = 0,
+                 file: Optional[str] = None):
+    """
+    Show a measurement as a power x feed heatmap with the recommended square
+    marked, or save it to `file`.
+    """
+    # matplotlib is imported only for the plot, like for the program preview.
+    import matplotlib.pyplot as plt
+
+    table = analysis.heatmap(metric, tile)
+    rows, columns = analysis.shape[1:]
+    first = tile * rows * columns
+    powers = analysis.power[first:first + columns]
+    speeds = analysis.speed[first:first + columns * rows:columns]
+    fig, ax = plt.subplots(figsize=(8, 6))
+    image = ax.imshow(table, origin='lower', cmap='inferno_r' if metric == 'darkness' else 'viridis')
+    ax.set_xticks(range(columns), [str(value) for value in powers])
+    ax.set_yticks(range(rows), [str(value) for value in speeds])
+    ax.set_xlabel('Power')
+    ax.set_ylabel('Feed')
+    fig.colorbar(image, ax=ax, label=metric)
+    best = analysis.recommend()
+    if first <= best.index < first + rows * columns:
+        row, column = divmod(best.index - first, columns)
+        ax.add_patch(plt.Rectangle((column - 0.5, row - 0.5), 1, 1, fill=False, edgecolor='cyan', linewidth=2))
+    if file is None:
+        plt.show()
+    else:
+        fig.savefig(file)
+        plt.close(fig)
@@ -0,0 +1,514 @@
+from typing import Dict, NamedTuple, Optional, Type, Union
+
+# Power and feed used for engraving labels, set by the program preamble.
+LABEL_POWER = 1000
+LABEL_SPEED = 100
+
+
+class ModalState(NamedTuple):
+    """
+    State of the controller after a part of a program.
+
+    x, y: last position written, None before the first move.
+    power: modal S value.
+    feed: modal F value.
+    laser: the laser is switched on.
+    motion: modal motion word ('G0' or 'G1') of a compact dialect, None otherwise.
+    """
+    x: Union[float, str, None]
+    y: Union[float, str, None]
+    power: Optional[int]
+    feed: Optional[int]
+    laser: bool
+    motion: Optional[str] = None
+
+
+def strip_leading_zero(text: str) -> str:
+    """
+    Drop the zero before the decimal point: '0.5' -> '.5', '-0.5' -> '-.5'.
+    """
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+
+class Dialect:
+    """
+    G-code dialect of the original generator: the user supplied turn on/off
+    commands are wrapped around every burning move and every move is G1.
+
+    A dialect turns tool moves into G-code text. Emitters (`Location.snake_path`,
+    `engraving.engrave`) only ask for travel (laser off) and burn (laser on)
+    moves, the dialect decides how to express them for its controller.
+    Coordinates are numbers, or decimal text from fixed-point emitters.
+
+    Attributes
+    ----------
+    turn_on : str
+        G-code command to turn on the laser.
+    turn_off : str
+        G-code command to turn off the laser.
+    power : int
+        Laser power of the following burning moves.
+    speed : int
+        Feed rate of the following moves.
+    x, y : Union[float, str, None]
+        Last position written.
+    rapid : bool
+        Write travels (laser off moves) as G0 instead of G1 at the cutting feed.
+    travel_feed : Optional[int]
+        Feed written on G0 travels for controllers that use F for G0 moves.
+    compact : bool
+        Write only the words that change: no repeated motion word (G0/G1),
+        no unchanged axis and no trailing whitespace.
+    leading_zeros : bool
+        Write the zero before the decimal point, False writes '.5' for 0.5.
+    """
+    name = 'custom'
+    # Rapid travels used when `rapid` is not given.
+    rapid_default = False
+    # Compact words used when `compact` is not given.
+    compact_default = False
+
+    def __init__(self, turn_on: str = 'M4', turn_off: str = 'M5',
+                 rapid: Optional[bool] = None, travel_feed: Optional[int] = None,
+                 compact: Optional[bool] = None, leading_zeros: bool = True):
+        self.turn_on = turn_on
+        self.turn_off = turn_off
+        self.rapid = self.rapid_default if rapid is None else rapid
+        self.travel_feed = travel_feed
+        self.compact = self.compact_default if compact is None else compact
+        self.leading_zeros = leading_zeros
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the modal state, e.g. at the start of a program.
+        """
+        self.power = None
+        self.speed = None
+        self.feed_changed = False
+        self.x = self.y = None
+        # Modal words of the compact output.
+        self.motion = None
+        self.x_text = self.y_text = None
+
+    def number(self, value: Union[float, str]) -> str:
+        """
+        Text of a coordinate as the original generator writes it.
+        """
+        text = f'{value}'
+        return text if self.leading_zeros else strip_leading_zero(text)
+
+    def _axes(self, motion: str, x: Union[float, str], y: Union[float, str]) -> str:
+        """
+        Words of a compact move: the motion word when the mode changes and
+        the axes that change. Empty when the move goes nowhere.
+        """
+        x_text, y_text = self.number(x), self.number(y)
+        self.x, self.y = x, y
+        words = ''
+        if x_text != self.x_text:
+            words += f' X{x_text}'
+            self.x_text = x_text
+        if y_text != self.y_text:
+            words += f' Y{y_text}'
+            self.y_text = y_text
+        if not words:
+            return ''
+        if motion == self.motion:
+            return words[1:]
+        self.motion = motion
+        return motion + words
+
+    @staticmethod
+    def _line(words: str) -> str:
+        words = words.strip()
+        return words + '\n' if words else ''
+
+    def preamble(self, x: float, y: float, power: int = LABEL_POWER, speed: int = LABEL_SPEED) -> str:
+        """
+        Program start: move to the start position and set power and feed.
+        """
+        self.reset()
+        self.power, self.speed = power, speed
+        self.x, self.y = x, y
+        if self.compact:
+            self.x_text, self.y_text = self.number(x), self.number(y)
+            self.motion = 'G1'
+            return f'X{self.x_text} Y{self.y_text}\nG1 F{speed} S{power}\n'
+        return f'X{x} Y{y} \nG1 F{speed} S{power}\n'
+
+    def postamble(self) -> str:
+        """
+        Program end.
+        """
+        return ''
+
+    def power_speed(self, power: int, speed: int) -> str:
+        """
+        Set laser power and feed rate for the following moves.
+        """
+        self.power, self.speed = power, speed
+        if self.compact:
+            return f'S{power} F{speed}\n'
+        return f'S{power} F{speed} \n'
+
+    def move(self, x: float, y: float) -> str:
+        """
+        Move without changing the laser state.
+        """
+        if self.compact:
+            return self._line(self._axes('G1', x, y))
+        self.x, self.y = x, y
+        return f'G1 X{x} Y{y} \n'
+
+    def travel(self, x: float, y: float) -> str:
+        """
+        Move with the laser off.
+        """
+        if self.compact:
+            return self._compact_travel(x, y)
+        self.x, self.y = x, y
+        if not self.rapid:
+            return f'G1 X{x} Y{y} \n'
+        if self.travel_feed is None:
+            return f'G0 X{x} Y{y} \n'
+        self.feed_changed = True
+        return f'G0 X{x} Y{y} F{self.travel_feed} \n'
+
+    def _compact_travel(self, x: float, y: float) -> str:
+        if not self.rapid:
+            return self._line(self._axes('G1', x, y))
+        words = self._axes('G0', x, y)
+        if words and self.travel_feed is not None:
+            self.feed_changed = True
+            words += f' F{self.travel_feed}'
+        return self._line(words)
+
+    def blank(self, x: float, y: float) -> str:
+        """
+        Move with the laser off at the cutting feed, e.g. overscan
+        where the head accelerates before a burning move.
+        """
+        if self.compact:
+            return self._line(self._axes('G1', x, y) + self._feed())
+        self.x, self.y = x, y
+        return f'G1 X{x} Y{y}{self._feed()} \n'
+
+    def burn(self, x: float, y: float) -> str:
+        """
+        Move with the laser on.
+        """
+        if self.compact:
+            return f'{self.turn_on}\n{self._line(self._axes("G1", x, y) + self._feed())}{self.turn_off}\n'
+        self.x, self.y = x, y
+        return f'{self.turn_on} \nG1 X{x} Y{y}{self._feed()} \n{self.turn_off} \n'
+
+    def _feed(self) -> str:
+        if not self.feed_changed:
+            return ''
+        # The travel feed override replaced the modal cutting feed.
+        self.feed_changed = False
+        return f' F{self.speed}'
+
+    def finish(self) -> str:
+        """
+        Make sure the laser is off at the end of a square or a character.
+        """
+        if self.compact:
+            return f'{self.turn_off}\n'
+        return f'{self.turn_off} \n'
+
+    def state(self) -> ModalState:
+        """
+        Modal state of the controller after the G-code written so far.
+        """
+        # The laser is switched around every burning move, a travel may have left its own feed.
+        feed = self.travel_feed if self.feed_changed else self.speed
+        return ModalState(self.x, self.y, self.power, feed, False, self.motion)
+
+    def resume(self, state: ModalState) -> str:
+        """
+        Program start bringing the controller into `state`, for continuing
+        a program from the point where it had that state.
+        """
+        return self.preamble(state.x, state.y, state.power, state.feed) + self._resume_motion(state)
+
+    def _resume_motion(self, state: ModalState) -> str:
+        # Compact moves rely on the modal motion word, it is set by a zero length move.
+        if state.motion is None or state.motion == self.motion:
+            return ''
+        self.motion = state.motion
+        return f'{state.motion} X{self.number(state.x)} Y{self.number(state.y)}\n'
+
+
+class ModalDialect(Dialect):
+    """
+    Base for controller profiles. Keeps the modal state of the controller
+    (position, laser, S, F) and writes only what changes, with compact
+    number formatting. Zero length travels are skipped.
+    Travels are G0 moves unless `rapid` is False.
+    """
+    name = 'modal'
+    rapid_default = True
+    # Decimal places of emitted coordinates.
+    precision = 4
+    # Setup commands written before the first move.
+    header = 'G21\nG90\n'
+    # Power left active by the header.
+    header_power = None
+    # Power written on laser off G1 moves, None when the laser is switched by commands.
+    off_power = None
+
+    def reset(self):
+        super().reset()
+        self.modal_s = None
+        self.modal_f = None
+        self.laser_on = False
+
+    def number(self, value: Union[float, str]) -> str:
+        """
+        Format a number with at most `precision` decimal places.
+        Decimal text of fixed-point coordinates is written as it is.
+        """
+        if isinstance(value, str):
+            text = value
+        else:
+            text = f'{value:.{self.precision}f}'.rstrip('0').rstrip('.')
+            if text == '-0':
+                text = '0'
+        return text if self.leading_zeros else strip_leading_zero(text)
+
+    def _words(self, x: float, y: float, power: Optional[int]) -> str:
+        if self.compact:
+            words = self._axes('G1', x, y)
+        else:
+            words = f'G1 X{self.number(x)} Y{self.number(y)}'
+        if power is not None and power != self.modal_s:
+            words += f' S{power}'
+            self.modal_s = power
+        if self.speed is not None and self.speed != self.modal_f:
+            words += f' F{self.speed}'
+            self.modal_f = self.speed
+        self.x, self.y = x, y
+        if self.compact:
+            return self._line(words)
+        return words + '\n'
+
+    def _rapid(self, x: float, y: float) -> str:
+        if self.compact:
+            words = self._axes('G0', x, y)
+        else:
+            words = f'G0 X{self.number(x)} Y{self.number(y)}'
+        if self.travel_feed is not None and self.travel_feed != self.modal_f:
+            words += f' F{self.travel_feed}'
+            self.modal_f = self.travel_feed
+        self.x, self.y = x, y
+        if self.compact:
+            return self._line(words)
+        return words + '\n'
+
+    def _at(self, x: float, y: float) -> bool:
+        return self.x is not None and self.number(x) == self.number(self.x) \
+            and self.number(y) == self.number(self.y)
+
+    def preamble(self, x: float, y: float, power: int = LABEL_POWER, speed: int = LABEL_SPEED) -> str:
+        self.reset()
+        self.power, self.speed = power, speed
+        self.x, self.y, self.modal_s = x, y, self.header_power
+        self.x_text, self.y_text, self.motion = self.number(x), self.number(y), 'G0'
+        return f'{self.header}G0 X{self.x_text} Y{self.y_text}\n'
+
+    def state(self) -> ModalState:
+        return ModalState(self.x, self.y, self.modal_s, self.modal_f, self.laser_on,
+                          self.motion if self.compact else None)
+
+    def resume(self, state: ModalState) -> str:
+        if state.laser:
+            raise ValueError('Cannot resume a program while the laser is on')
+        text = self.preamble(state.x, state.y)
+        # A zero length G1 with the laser off restores the modal S and F.
+        words = ''
+        if state.power is not None and state.power != self.header_power:
+            words += f' S{state.power}'
+        if state.feed is not None:
+            words += f' F{state.feed}'
+        self.modal_s, self.modal_f = state.power, state.feed
+        if words:
+            text += f'G1 X{self.x_text} Y{self.y_text}{words}\n'
+            self.motion = 'G1'
+        return text + self._resume_motion(state)
+
+    def power_speed(self, power: int, speed: int) -> str:
+        self.power, self.speed = power, speed
+        return ''
+
+    def move(self, x: float, y: float) -> str:
+        return self.travel(x, y)
+
+    def switch_off(self) -> str:
+        """
+        Commands switching the laser off before a laser off move.
+        """
+        return ''
+
+    def travel(self, x: float, y: float) -> str:
+        if self._at(x, y):
+            return ''
+        if self.rapid:
+            return self.switch_off() + self._rapid(x, y)
+        return self.switch_off() + self._words(x, y, self.off_power)
+
+    def blank(self, x: float, y: float) -> str:
+        if self._at(x, y):
+            return ''
+        return self.switch_off() + self._words(x, y, self.off_power)
+
+    def finish(self) -> str:
+        return ''
+
+
+class GrblLaser(ModalDialect):
+    """
+    GRBL 1.1 in laser mode ($32=1). M4 dynamic power stays on for the whole
+    program: burns carry the power inline, travels are G0 moves (the laser
+    is off during G0 in laser mode) or G1 moves with S0.
+    One raster line costs two lines of G-code instead of four.
+    """
+    name = 'grbl-laser'
+    header = 'G21\nG90\nM4 S0\n'
+    header_power = 0
+    off_power = 0
+
+    def postamble(self) -> str:
+        return 'M5\n'
+
+    def burn(self, x: float, y: float) -> str:
+        return self._words(x, y, self.power)
+
+
+class Marlin(GrblLaser):
+    """
+    Marlin 2.1 with inline laser power (LASER_POWER_INLINE). `M3 I` enables
+    inline mode, after which each G1 carries its own S value.
+    """
+    name = 'marlin'
+    header = 'G21\nG90\nM3 I S0\n'
+    header_power = 0
+
+
+class GrblClassic(ModalDialect):
+    """
+    GRBL without laser mode ($32=0). The spindle output has to be switched
+    with M3/M5 around burning moves; commands are written only when the
+    laser state changes and the power rides on the M3 line.
+    """
+    name = 'grbl-classic'
+    turn_on_command = 'M3'
+    turn_off_command = 'M5'
+    header = 'G21\nG90\nM5\n'
+
+    def postamble(self) -> str:
+        return self.finish()
+
+    def switch_off(self) -> str:
+        return self.finish()
+
+    def burn(self, x: float, y: float) -> str:
+        lines = ''
+        if not self.laser_on:
+            lines = f'{self.turn_on_command} S{self.power}\n'
+            self.modal_s = self.power
+            self.laser_on = True
+        elif self.power != self.modal_s:
+            lines = f'S{self.power}\n'
+            self.modal_s = self.power
+        return lines + self._words(x, y, None)
+
+    def finish(self) -> str:
+        if self.laser_on:
+            self.laser_on = False
+            return f'{self.turn_off_command}\n'
+        return ''
+
+
+class LinuxCnc(ModalDialect):
+    """
+    LinuxCNC with the laser gated by digital output 0. M62/M63 switch the
+    output synchronized with the start of the next move, so there is no
+    motion stop at every toggle. Power is the spindle speed S.
+    """
+    name = 'linuxcnc'
+    header = 'G21 G90 G64 P0.01\nM65 P0\nM3 S0\n'
+    header_power = 0
+
+    def postamble(self) -> str:
+        return self.finish() + 'M5\nM2\n'
+
+    def switch_off(self) -> str:
+        if self.laser_on:
+            self.laser_on = False
+            return 'M63 P0\n'
+        return ''
+
+    def burn(self, x: float, y: float) -> str:
+        lines = ''
+        if not self.laser_on:
+            lines = 'M62 P0\n'
+            self.laser_on = True
+        return lines + self._words(x, y, self.power)
+
+    def finish(self) -> str:
+        if self.laser_on:
+            self.laser_on = False
+            return 'M65 P0\n'
+        return ''
+
+
+DIALECTS: Dict[str, Type[Dialect]] = {
+    Dialect.name: Dialect,
+    GrblLaser.name: GrblLaser,
+    GrblClassic.name: GrblClassic,
+    Marlin.name: Marlin,
+    LinuxCnc.name: LinuxCnc,
+}
+
+
+def get_dialect(name: str, turn_on: str = 'M4', turn_off: str = 'M5',
+                rapid: Optional[bool] = None, travel_feed: Optional[int] = None,
+                compact: Optional[bool] = None, leading_zeros: bool = True) -> Dialect:
+    """
+    Create a dialect by its name.
+
+    Parameters
+    ----------
+    name: str
+        One of 'custom', 'grbl-laser', 'grbl-classic', 'marlin', 'linuxcnc'.
+    turn_on: str
+        G-code command to turn on the laser, used by the 'custom' dialect.
+    turn_off: str
+        G-code command to turn off the laser, used by the 'custom' dialect.
+    rapid: Optional[bool]
+        Write travels as G0, None for the dialect default
+        (off for 'custom', on for the controller profiles).
+    travel_feed: Optional[int]
+        Feed written on G0 travels, None to use the machine rapid rate.
+    compact: Optional[bool]
+        Drop repeated motion words, unchanged axes and trailing whitespace,
+        None for the dialect default (off).
+    leading_zeros: bool
+        Write the zero of numbers below 1, False writes '.5' for 0.5.
+
+    Returns
+    -------
+    dialect: Dialect
+        New dialect instance.
+    """
+    try:
+        dialect_class = DIALECTS[name]
+    except KeyError:
+        raise ValueError(f'Unknown G-code dialect: {name}. Use one of: {", ".join(DIALECTS)}')
+    return dialect_class(turn_on, turn_off, rapid, travel_feed, compact, leading_zeros)
@@ -1,7 +1,58 @@
+import mmap
+import os
 import re
-from typing import Dict
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple, Union, TextIO
 from math import pi, sin, cos
 from decimal import Decimal
+from utils import gcode_io as gio, dialects as dl, fonts
+from utils.fixed_point import FixedPoint
+from utils.lazy import lazy_import
+
+json = lazy_import('json')
+
+SCALE_FACTOR = Decimal('15.0')
+# Suffix of the glyph index written beside a font file.
+INDEX_SUFFIX = '.idx'
+GLYPH_HEADER = re.compile(rb'^\[(.*)][ \t]+(\d+)', re.MULTILINE)
+
+
+def parse_line(coords: str) -> List[float]:
+    """
+    Scale the coordinates of a cxf 'L' line to a font of size 1.
+    """
+    values = [Decimal(n) for n in coords.split(',')]
+    values = [float(n / SCALE_FACTOR) for n in values]
+    return [round(n, 6) for n in values]  # Round after converting to float
+
+
+def parse_arc(coords: str) -> List[List[float]]:
+    """
+    Change a cxf 'A' arc to straight lines of at most 30 degrees.
+    """
+    x_cen, y_cen, rad, start_angle, end_angle = [Decimal(n) for n in coords.split(',')]
+    x_cen = round(float(x_cen / SCALE_FACTOR), 6)
+    y_cen = round(float(y_cen / SCALE_FACTOR), 6)
+    rad = round(float(rad / SCALE_FACTOR), 6)
+
+    if end_angle < start_angle:
+        start_angle -= Decimal('360.0')
+
+    steps = int((end_angle - start_angle) / Decimal('30')) + 1
+    angl_step = (end_angle - start_angle) / Decimal(steps)
+
+    lines = []
+    angle = start_angle
+    for i in range(steps):
+        angle += angl_step
+        angle_float = float(angle)
+        x_end = round(cos(angle_float * pi / 180) * rad + x_cen, 6)
+        y_end = round(sin(angle_float * pi / 180) * rad + y_cen, 6)
+        # If you start the next segment at the end of the previous, round these too
+        x_start = round(cos(float(start_angle + i * angl_step) * pi / 180) * rad + x_cen, 6)
+        y_start = round(sin(float(start_angle + i * angl_step) * pi / 180) * rad + y_cen, 6)
+        lines.append([x_start, y_start, x_end, y_end])
+    return lines
 
 
 def read_font(file: str) -> Dict:
@@ -42,7 +93,6 @@ def read_font(file: str) -> Dict:
       Dict structure: [character] : [line1], [line2], [line 3]......
     """
     with open(file, "r", encoding="utf-8") as f:
-        scale_factor = Decimal('15.0')
         characters = {}
         coords_list = []
         lines_number = 0
@@ -59,39 +109,11 @@ def read_font(file: str) -> Dict:
                 lines_number = int(new_char.group(2))
 
             if coord_line:
-                coords = coord_line.group(1)
-                coords = [Decimal(n) for n in coords.split(',')]
-                coords = [float(n / scale_factor) for n in coords]
-                coords = [round(n, 6) for n in coords]  # Round after converting to float
-                coords_list.append(coords)
+                coords_list.append(parse_line(coord_line.group(1)))
                 lines_number -= 1
 
             if arc:
-                coords_arc = arc.group(1)
-                coords_arc = [Decimal(n) for n in coords_arc.split(',')]
-                x_cen, y_cen, rad, start_angle, end_angle = coords_arc
-                x_cen = round(float(x_cen / scale_factor), 6)
-                y_cen = round(float(y_cen / scale_factor), 6)
-                rad = round(float(rad / scale_factor), 6)
-
-                if end_angle < start_angle:
-                    start_angle -= Decimal('360.0')
-
-                steps = int((end_angle - start_angle) / Decimal('30')) + 1
-                angl_step = (end_angle - start_angle) / Decimal(steps)
-
-                angle = start_angle
-                for i in range(steps):
-                    angle += angl_step
-                    angle_float = float(angle)
-                    x_end = round(cos(angle_float * pi / 180) * rad + x_cen, 6)
-                    y_end = round(sin(angle_float * pi / 180) * rad + y_cen, 6)
-                    # If you start the next segment at the end of the previous, round these too
-                    x_start = round(cos(float(start_angle + i * angl_step) * pi / 180) * rad + x_cen, 6)
-                    y_start = round(sin(float(start_angle + i * angl_step) * pi / 180) * rad + y_cen, 6)
-                    coords = [x_start, y_start, x_end, y_end]
-                    coords_list.append(coords)
-
+                coords_list.extend(parse_arc(arc.group(1)))
                 lines_number -= 1
 
             if lines_number == 0 and blank_line is None:
@@ -101,6 +123,157 @@ def read_font(file: str) -> Dict:
     return characters
 
 
+class LazyFont(Mapping):
+    """
+    Cxf font parsed one glyph at a time.
+
+    Opening the font only reads the byte offsets of the `[char] N` headers,
+    from the index file beside the font (`normal.cxf.idx`) or from one scan
+    of the memory mapped font, which is then saved as the index. A glyph is
+    parsed the first time it is looked up, so labels made of digits cost a
+    handful of glyph parses even with large Unicode fonts.
+    The glyphs are the same as returned by `read_font`.
+
+    `close()` (or leaving a `with` block) releases the memory map and the
+    file; a glyph not parsed yet maps the font again when it is looked up.
+
+    Attributes
+    ----------
+    file : str
+        Name of the cxf font file.
+    index : Dict[str, Tuple[int, int, int]]
+        Start and end byte offset and number of lines of every glyph.
+    glyphs : Dict[str, List[List[float]]]
+        Glyphs parsed so far.
+    """
+    def __init__(self, file: str, persist_index: bool = True):
+        self.file = file
+        self.glyphs = {}
+        self.map = None
+        self.open()
+        stamp = gio.file_stamp(self.file)
+        self.index = self.load_index(stamp)
+        if self.index is None:
+            self.index = self.build_index()
+            if persist_index:
+                self.save_index(stamp)
+
+    def __enter__(self) -> 'LazyFont':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def index_file(self) -> str:
+        return self.file + INDEX_SUFFIX
+
+    def open(self):
+        """
+        Map the font file into memory, unless it is mapped already.
+        """
+        if self.map is None:
+            with open(self.file, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def build_index(self) -> Dict[str, Tuple[int, int, int]]:
+        """
+        Scan the font once for glyph headers.
+        """
+        headers = list(GLYPH_HEADER.finditer(self.map))
+        ends = [header.start() for header in headers[1:]] + [len(self.map)]
+        return {header.group(1).decode('utf-8'): (header.end(), end, int(header.group(2)))
+                for header, end in zip(headers, ends)}
+
+    def load_index(self, stamp: List[int]) -> Optional[Dict[str, Tuple[int, int, int]]]:
+        """
+        Read the saved index, None when it is missing or older than the font.
+        """
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get('font') != stamp:
+            return None
+        return {char: tuple(span) for char, span in saved['glyphs'].items()}
+
+    def save_index(self, stamp: List[int]):
+        """
+        Save the index beside the font, skipped when the directory is read only.
+        """
+        try:
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump({'font': stamp, 'glyphs': self.index}, f, ensure_ascii=False)
+        except OSError:
+            pass
+
+    def parse(self, char: str) -> List[List[float]]:
+        """
+        Parse the lines of one glyph.
+        """
+        start, end, lines_number = self.index[char]
+        self.open()
+        coords_list = []
+        for line in self.map[start:end].decode('utf-8').splitlines():
+            if lines_number == 0:
+                break
+            if line.startswith('L '):
+                coords_list.append(parse_line(line[2:]))
+                lines_number -= 1
+            elif line.startswith('A '):
+                coords_list.extend(parse_arc(line[2:]))
+                lines_number -= 1
+        return coords_list
+
+    def __getitem__(self, char: str) -> List[List[float]]:
+        try:
+            return self.glyphs[char]
+        except KeyError:
+            if char not in self.index:
+                raise
+        glyph = self.glyphs[char] = self.parse(char)
+        return glyph
+
+    def __contains__(self, char) -> bool:
+        return char in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def close(self):
+        """
+        Release the memory map of the font.
+        """
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.map = None
+
+
+def load_font(file: str) -> Mapping:
+    """
+    Open a font for engraving. Cxf fonts are parsed lazily, see `LazyFont`,
+    Hershey (.jhf) and SVG fonts are compiled into a `fonts.GlyphTable`.
+
+    Parameters
+    ----------
+    file: str
+      Name of cxf, jhf or svg file with a font
+
+    Returns
+    ---------
+    characters: Mapping
+      Mapping of characters to the coordinates of their lines, like `read_font`
+    """
+    if file.lower().endswith('.cxf'):
+        return LazyFont(file)
+    return fonts.compile_font(file)
+
+
 def engr_text(word: str, x: float, y: float, size: float) -> Dict:
     """
     Function crate start coordinates for draw each character in word
@@ -131,7 +304,8 @@ def engr_text(word: str, x: float, y: float, size: float) -> Dict:
     return line
 
 
-def engrave(char, x, y, font, out_file, size, turn_on, turn_off):
+def engrave(char, x, y, font, out_file, size, turn_on, turn_off, dialect=None,
+            fixed: Optional[FixedPoint] = None):
     """
     Function create g code for draw a character.
 
@@ -145,29 +319,39 @@ def engrave(char, x, y, font, out_file, size, turn_on, turn_off):
       start coordinates for draw character
     font: Dict
       characters dictionary with characters and coordinates
-    out_file: str
-      name of txt file with g code for engrave
+    out_file: Union[str, TextIO]
+      name of txt file with g code for engrave or an open output stream
     size: float
       size of font in millimeters
     turn_on: str
       g code command for turn on laser
     turn_off: str
       g code command for turn off
+    dialect: Dialect
+      G-code dialect, when None the custom dialect with turn_on/turn_off is used
+    fixed: Optional[FixedPoint]
+      Fixed-point grid of the coordinates: the stroke ends are added up in
+      integer units and written as decimal text. Float sums when None.
      """
-    with open(out_file, 'a') as o:
-        o.write(f'G1 X{x} Y{y} \n')
+    dialect = dialect or dl.Dialect(turn_on, turn_off)
+
+    def place(dx: float, dy: float):
+        if fixed is None:
+            return x + dx, y + dy
+        return fixed.text(fixed.units(x) + fixed.units(dx)), fixed.text(fixed.units(y) + fixed.units(dy))
+
+    with gio.output(out_file) as o:
+        o.write(dialect.travel(*((x, y) if fixed is None else place(0, 0))))
         for line in font[char[0]]:
             x0 = round(float(line[0]) * size, 6)
             y0 = round(float(line[1]) * size, 6)
             x1 = round(float(line[2]) * size, 6)
             y1 = round(float(line[3]) * size, 6)
 
-            o.write(f'G1 X{x + x0} Y{y + y0} \n')
-            o.write(f'{turn_on} \n')
-            o.write(f'G1 X{x + x1} Y{y + y1} \n')
-            o.write(f'{turn_off} \n')
+            o.write(dialect.travel(*place(x0, y0)))
+            o.write(dialect.burn(*place(x1, y1)))
 
-        o.write(f'{turn_off} \n')
+        o.write(dialect.finish())
 
 
 # import os
@@ -0,0 +1,71 @@
+from functools import lru_cache
+from typing import Union
+
+# Decimal places supported by the fraction table: 4 places are 0.1 micron.
+MAX_PLACES = 4
+# Decimal places of a micron grid.
+MICRONS = 3
+
+
+class FixedPoint:
+    """
+    Integer fixed-point coordinates with `places` decimal places of a
+    millimeter, e.g. 3 for microns. Positions are kept as integer units,
+    so repeated steps do not accumulate float error, and are turned into
+    decimal text only when written, with a lookup table of all fractional
+    parts instead of float formatting.
+
+    Attributes
+    ----------
+    places : int
+        Decimal places of a millimeter.
+    scale : int
+        Units per millimeter.
+    fractions : List[str]
+        Text of every fractional part, without trailing zeros.
+    """
+    def __init__(self, places: int = MICRONS):
+        if not 0 <= places <= MAX_PLACES:
+            raise ValueError(f'Fixed-point places must be between 0 and {MAX_PLACES}, got {places}')
+        self.places = places
+        self.scale = 10 ** places
+        self.fractions = [''] + [f'.{fraction:0{places}d}'.rstrip('0') for fraction in range(1, self.scale)]
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(places={self.places})'
+
+    def units(self, mm: float) -> int:
+        """
+        Nearest number of units of a length in millimeters.
+        """
+        return int(round(float(mm) * self.scale))
+
+    def mm(self, units: int) -> float:
+        """
+        Length in millimeters of a number of units.
+        """
+        return units / self.scale
+
+    def text(self, units: int) -> str:
+        """
+        Decimal text of a number of units, e.g. 10500 -> '10.5' with 3 places.
+        """
+        if units < 0:
+            return '-' + self.text(-units)
+        whole, fraction = divmod(units, self.scale)
+        return f'{whole}{self.fractions[fraction]}'
+
+
+@lru_cache(maxsize=None)
+def get_fixed_point(places: int = MICRONS) -> FixedPoint:
+    """
+    Shared `FixedPoint` of the given places, its fraction table is built once.
+    """
+    return FixedPoint(places)
+
+
+def snap(value: float, fixed: Union[FixedPoint, None]) -> float:
+    """
+    Round a length to the fixed-point grid, unchanged without one.
+    """
+    return value if fixed is None else fixed.mm(fixed.units(value))
@@ -0,0 +1,273 @@
+from __future__ import annotations
+import os
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, Iterator, List, Sequence, Tuple
+from utils import gcode_io as gio
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+ET = lazy_import('xml.etree.ElementTree')
+
+# Hershey fonts have a cap height of 21 units with the baseline at y=9 and y pointing
+# down; 35 units per font size give the 0.6 cap height of the cxf fonts.
+HERSHEY_SCALE = 35.0
+HERSHEY_BASELINE = 9
+# SVG fonts without cap-height are assumed to have capitals of 0.7 em.
+SVG_CAP_HEIGHT = 0.7
+CXF_CAP_HEIGHT = 0.6
+# Straight lines per Bezier curve of SVG glyphs.
+CURVE_STEPS = 8
+PATH_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtZzAa]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+class GlyphTable(Mapping):
+    """
+    Compiled font: the lines of all glyphs in one (n, 4) float array of
+    x_start, y_start, x_end, y_end rows, scaled to a font of size 1 like
+    the cxf fonts. `table[char]` is a view of the rows of one glyph, which
+    `engraving.engrave` consumes like the lists of `read_font`.
+
+    Attributes
+    ----------
+    lines : numpy.ndarray
+        Lines of all glyphs.
+    spans : Dict[str, Tuple[int, int]]
+        First and past the last row of every glyph.
+    """
+    def __init__(self, lines: np.ndarray, spans: Dict[str, Tuple[int, int]]):
+        self.lines = lines
+        self.spans = spans
+
+    @classmethod
+    def from_glyphs(cls, glyphs: Dict[str, Sequence[Sequence[float]]]) -> 'GlyphTable':
+        """
+        Compile a dictionary of glyph lines, e.g. the result of `read_font`.
+        """
+        spans = {}
+        rows = []
+        for char, lines in glyphs.items():
+            spans[char] = (len(rows), len(rows) + len(lines))
+            rows.extend(lines)
+        return cls(np.round(np.asarray(rows, dtype=float).reshape(-1, 4), 6), spans)
+
+    def __getitem__(self, char: str) -> np.ndarray:
+        start, stop = self.spans[char]
+        return self.lines[start:stop]
+
+    def __contains__(self, char) -> bool:
+        return char in self.spans
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.spans)
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+
+def polyline(points: List[Tuple[float, float]]) -> List[List[float]]:
+    """
+    Lines joining consecutive points.
+    """
+    return [[x0, y0, x1, y1] for (x0, y0), (x1, y1) in zip(points, points[1:])]
+
+
+def hershey_records(file: str) -> Iterator[str]:
+    """
+    Yield the glyph records of a jhf file, joining records wrapped over several lines.
+    """
+    with open(file, encoding='ascii') as f:
+        record = ''
+        for line in f:
+            record += line.rstrip('\r\n')
+            if len(record) < 8:
+                continue
+            if len(record) - 8 >= 2 * int(record[5:8]):
+                yield record
+                record = ''
+
+
+def read_jhf(file: str, first: int = 32) -> GlyphTable:
+    """
+    Read a Hershey jhf single-stroke font.
+
+    Every record holds a glyph number (columns 1-5), the number of vertices
+    (columns 6-8) and the vertices as pairs of characters, each coordinate
+    being its character code minus the code of 'R'. The first pair is the
+    left and right bound of the glyph, ' R' lifts the pen. Records are
+    assigned to consecutive characters starting with `first`.
+
+    Example character '1':
+     1049  4JZNJRFR[
+
+    Parameters
+    ----------
+    file: str
+        Name of the jhf font file.
+    first: int
+        Character code of the first record.
+
+    Returns
+    -------
+    characters: GlyphTable
+        Lines of every character.
+    """
+    glyphs = {}
+    for number, record in enumerate(hershey_records(file)):
+        pairs = [record[i:i + 2] for i in range(8, 8 + 2 * int(record[5:8]), 2)]
+        left = ord(pairs[0][0]) - ord('R')
+        lines = []
+        stroke = []
+        for pair in pairs[1:] + [' R']:
+            if pair == ' R':
+                lines.extend(polyline(stroke))
+                stroke = []
+                continue
+            x, y = ord(pair[0]) - ord('R'), ord(pair[1]) - ord('R')
+            stroke.append(((x - left) / HERSHEY_SCALE, (HERSHEY_BASELINE - y) / HERSHEY_SCALE))
+        glyphs[chr(first + number)] = lines
+    return GlyphTable.from_glyphs(glyphs)
+
+
+def bezier(points: Sequence[Tuple[float, float]], steps: int = CURVE_STEPS) -> List[Tuple[float, float]]:
+    """
+    Points of a quadratic or cubic Bezier curve, without the start point.
+    """
+    t = np.linspace(0, 1, steps + 1)[1:, None]
+    p = np.asarray(points, dtype=float)
+    if len(p) == 3:
+        curve = (1 - t) ** 2 * p[0] + 2 * (1 - t) * t * p[1] + t ** 2 * p[2]
+    else:
+        curve = (1 - t) ** 3 * p[0] + 3 * (1 - t) ** 2 * t * p[1] + 3 * (1 - t) * t ** 2 * p[2] + t ** 3 * p[3]
+    return [tuple(point) for point in curve.tolist()]
+
+
+def parse_path(d: str) -> List[List[Tuple[float, float]]]:
+    """
+    Flatten an SVG path to polylines. Supports M, L, H, V, C, S, Q, T and Z
+    in absolute and relative form.
+    """
+    tokens = PATH_TOKEN.findall(d)
+    strokes = []
+    stroke = []
+    x = y = 0.0
+    command = None
+    control = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        if command in ('Z', 'z'):
+            if stroke:
+                stroke.append(stroke[0])
+                x, y = stroke[0]
+                strokes.append(stroke)
+                stroke = []
+            command = None
+            continue
+        if command is None or command in ('A', 'a'):
+            raise ValueError(f'Unsupported SVG path command: {command}')
+        relative = command.islower()
+        name = command.upper()
+        count = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2}[name]
+        values = [float(value) for value in tokens[i:i + count]]
+        i += count
+        if name == 'H':
+            values = [values[0] + (x if relative else 0), y]
+        elif name == 'V':
+            values = [x, values[0] + (y if relative else 0)]
+        elif relative:
+            values = [value + (x if n % 2 == 0 else y) for n, value in enumerate(values)]
+        points = list(zip(values[::2], values[1::2]))
+        if name == 'M':
+            if len(stroke) > 1:
+                strokes.append(stroke)
+            stroke = [points[0]]
+            # Further pairs of a moveto are lines.
+            command = 'l' if relative else 'L'
+        elif name in ('L', 'H', 'V'):
+            # Drawing after Z continues from the closing point.
+            stroke = stroke or [(x, y)]
+            stroke.append(points[0])
+        else:
+            stroke = stroke or [(x, y)]
+            if name in ('S', 'T'):
+                reflected = (x, y) if control is None else (2 * x - control[0], 2 * y - control[1])
+                points.insert(0, reflected)
+            stroke.extend(bezier([(x, y)] + points))
+            control = points[-2]
+        if name not in ('C', 'S', 'Q', 'T'):
+            control = None
+        x, y = points[-1]
+    if len(stroke) > 1:
+        strokes.append(stroke)
+    return strokes
+
+
+def read_svg_font(file: str) -> GlyphTable:
+    """
+    Read the <glyph unicode="..." d="..."/> elements of an SVG font.
+    Glyph outlines are flattened to lines and scaled so the cap height of
+    the font (font-face cap-height, or 0.7 em) matches the cxf fonts.
+
+    Parameters
+    ----------
+    file: str
+        Name of the SVG font file.
+
+    Returns
+    -------
+    characters: GlyphTable
+        Lines of every character.
+    """
+    root = ET.parse(file).getroot()
+    face = next((element for element in root.iter() if element.tag.endswith('font-face')), None)
+    units_per_em = float(face.get('units-per-em', 1000)) if face is not None else 1000.0
+    cap_height = face.get('cap-height') if face is not None else None
+    cap_height = float(cap_height) if cap_height else SVG_CAP_HEIGHT * units_per_em
+    scale = CXF_CAP_HEIGHT / cap_height
+    glyphs = {}
+    for element in root.iter():
+        char = element.get('unicode')
+        if not element.tag.endswith('glyph') or not char or len(char) != 1:
+            continue
+        lines = []
+        for stroke in parse_path(element.get('d', '')):
+            lines.extend(polyline([(x * scale, y * scale) for x, y in stroke]))
+        glyphs[char] = lines
+    return GlyphTable.from_glyphs(glyphs)
+
+
+READERS = {
+    '.jhf': read_jhf,
+    '.svg': read_svg_font,
+}
+
+
+@lru_cache(maxsize=16)
+def _compiled(suffix: str, file: str, stamp: Tuple[int, int]) -> GlyphTable:
+    # The file stamp makes a changed font miss the cache.
+    return READERS[suffix](file)
+
+
+def compile_font(file: str) -> GlyphTable:
+    """
+    Read a jhf or SVG font into a glyph table. Tables are cached per format
+    and file until the file changes.
+
+    Parameters
+    ----------
+    file: str
+        Name of the font file.
+
+    Returns
+    -------
+    characters: GlyphTable
+        Lines of every character.
+    """
+    suffix = os.path.splitext(file)[1].lower()
+    if suffix not in READERS:
+        raise ValueError(f'Unknown font format: {suffix}. Use one of: .cxf, {", ".join(READERS)}')
+    return _compiled(suffix, os.path.abspath(file), tuple(gio.file_stamp(file)))
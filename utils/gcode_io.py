@@ -0,0 +1,223 @@
+import io
+import os
+from contextlib import nullcontext
+from typing import List, Optional
+from utils.lazy import lazy_import
+
+# Codecs are loaded when a compressed file is opened.
+gzip = lazy_import('gzip')
+lzma = lazy_import('lzma')
+
+# Default size of the write buffer placed in front of the compressor.
+BLOCK_SIZE = 1 << 16
+
+SUFFIXES = {
+    '.gz': 'gzip',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def file_stamp(file: str) -> List[int]:
+    """
+    Size and modification time identifying the version of a file,
+    e.g. of a font or a written program.
+    """
+    stat = os.stat(file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def compression_from_name(file: str) -> Optional[str]:
+    """
+    Guess the compression of a G-code file from its suffix.
+
+    Parameters
+    ----------
+    file: str
+        Name of the G-code file, e.g. 'grid.nc.gz'.
+
+    Returns
+    -------
+    compression: Optional[str]
+        'gzip', 'xz', 'zstd' or None for plain text.
+    """
+    for suffix, compression in SUFFIXES.items():
+        if str(file).endswith(suffix):
+            return compression
+    return None
+
+
+def sniff_compression(file: str) -> Optional[str]:
+    """
+    Detect the compression of an existing file from its magic bytes.
+
+    Parameters
+    ----------
+    file: str
+        Name of the file to inspect.
+
+    Returns
+    -------
+    compression: Optional[str]
+        'gzip', 'xz', 'zstd' or None for plain text.
+    """
+    with open(file, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _open_zstd(file: str, mode: str, level: Optional[int]):
+    """
+    Open a binary zstd stream with the stdlib module (Python 3.14+)
+    or the optional 'zstandard' package.
+    """
+    try:
+        from compression import zstd
+        if 'r' in mode:
+            return zstd.open(file, mode)
+        return zstd.open(file, mode, level=level)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("zstd compression needs Python 3.14+ or the 'zstandard' package")
+    if 'r' in mode:
+        return zstandard.open(file, mode)
+    cctx = zstandard.ZstdCompressor(level=3 if level is None else level)
+    return zstandard.open(file, mode, cctx=cctx)
+
+
+def open_gcode(file: str, mode: str = 'r', compression: Optional[str] = None,
+               level: Optional[int] = None, block_size: Optional[int] = None):
+    """
+    Open a G-code file as a text stream, compressed or not.
+
+    When reading, the compression is detected from the magic bytes so any
+    reader transparently accepts 'grid.nc', 'grid.nc.gz', 'grid.nc.xz' etc.
+    When writing, the compression is taken from the `compression` argument
+    or guessed from the file suffix. Data is compressed while it is
+    written, the whole program is never held in memory.
+
+    Parameters
+    ----------
+    file: str
+        Name of the G-code file.
+    mode: str
+        'r' to read, 'w' to truncate and write, 'a' to append.
+    compression: Optional[str]
+        'gzip', 'xz', 'zstd', 'none' or None to detect automatically.
+    level: Optional[int]
+        Compression level, the codec default when None.
+    block_size: Optional[int]
+        Size in bytes of the write buffer in front of the compressor.
+
+    Returns
+    -------
+    stream: TextIO
+        Text stream to read from or write to.
+    """
+    mode = mode.replace('t', '').replace('b', '')
+    if compression is None:
+        if 'r' in mode:
+            compression = sniff_compression(file)
+        else:
+            compression = compression_from_name(file)
+    if compression in (None, 'none'):
+        return open(file, mode)
+
+    binary_mode = mode + 'b'
+    if compression == 'gzip':
+        raw = gzip.open(file, binary_mode, compresslevel=9 if level is None else level)
+    elif compression == 'xz':
+        raw = lzma.open(file, binary_mode, preset=level)
+    elif compression == 'zstd':
+        raw = _open_zstd(file, binary_mode, level)
+    else:
+        raise ValueError(f'Unknown compression: {compression}')
+
+    if 'r' in mode:
+        return io.TextIOWrapper(raw, encoding='ascii')
+    buffered = io.BufferedWriter(raw, buffer_size=block_size or BLOCK_SIZE)
+    return io.TextIOWrapper(buffered, encoding='ascii')
+
+
+def output(target, mode: str = 'a'):
+    """
+    Context manager returning a writable stream for `target`.
+
+    `target` may be a file name, which is opened (and closed afterwards),
+    or an already open stream, which is used as it is and left open.
+
+    Parameters
+    ----------
+    target: Union[str, TextIO]
+        Name of the file or an open stream.
+    mode: str
+        Mode used when `target` is a file name.
+    """
+    if hasattr(target, 'write'):
+        return nullcontext(target)
+    return open_gcode(target, mode)
+
+
+class TeeStream:
+    """
+    Writable text stream passing everything written to an observer as well.
+
+    The text is collected and handed to `observer` in batches of at least
+    `batch_size` characters, and the rest when the stream is flushed or
+    closed, so a slow observer (e.g. a preview drawing the moves) is called
+    a few times per program instead of once per line.
+
+    Parameters
+    ----------
+    stream: TextIO
+        Stream the text is written to, closed with the tee.
+    observer: Callable[[str], None]
+        Called with every batch of text, in order.
+    batch_size: int
+        Number of characters collected before the observer is called.
+    """
+    def __init__(self, stream, observer, batch_size: int = BLOCK_SIZE):
+        self.stream = stream
+        self.observer = observer
+        self.batch_size = batch_size
+        self.pending = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= self.batch_size:
+            self._notify()
+        return self.stream.write(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        self._notify()
+        self.stream.flush()
+
+    def close(self):
+        try:
+            self._notify()
+        finally:
+            self.stream.close()
+
+    def _notify(self):
+        if self.pending:
+            text = ''.join(self.pending)
+            self.pending, self.size = [], 0
+            self.observer(text)
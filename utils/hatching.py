@@ -0,0 +1,75 @@
+from __future__ import annotations
+from math import cos, radians, sin
+from typing import Sequence, Tuple
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Shorter clipped scan lines (touching a corner) are dropped, in millimeters.
+EPS = 1e-9
+
+
+def square_polygon(x_start: float, y_start: float, width: float, length: float) -> np.ndarray:
+    """
+    Corners of a square counterclockwise from its lower left corner.
+    """
+    return np.array([(x_start, y_start), (x_start + width, y_start),
+                     (x_start + width, y_start + length), (x_start, y_start + length)], dtype=float)
+
+
+def scan_segments(polygon: Sequence[Tuple[float, float]], angle: float, line_interval: float
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip parallel scan lines at an angle to a polygon.
+
+    The scan lines run along the direction `angle` (degrees from +X,
+    counterclockwise) and are `line_interval` apart, the first one through
+    the polygon vertex lowest across the lines, like the first raster line
+    on the bottom edge of a square. All lines are intersected with all
+    edges at once as a (lines, edges) array: an edge crosses a line when the
+    line offset lies in the half-open offset range of the edge, so a vertex
+    on a line is counted once. The crossings of every line are sorted along
+    it and paired inside/outside (even-odd rule), which also clips concave
+    polygons into several segments per line.
+
+    Parameters
+    ----------
+    polygon: Sequence[Tuple[float, float]]
+        Vertices of a simple polygon, in either orientation, not closed.
+    angle: float
+        Direction of the scan lines in degrees.
+    line_interval: float
+        Distance between scan lines in millimeters.
+
+    Returns
+    -------
+    line: np.ndarray
+        Index of the scan line of every segment, in increasing order.
+    start: np.ndarray
+        (n, 2) start points, every segment runs along the scan direction.
+    end: np.ndarray
+        (n, 2) end points.
+    """
+    points = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    theta = radians(angle)
+    direction = np.array([cos(theta), sin(theta)])
+    normal = np.array([-sin(theta), cos(theta)])
+    along, across = points @ direction, points @ normal
+    lines = int((across.max() - across.min()) / line_interval + 1e-9)
+    offsets = across.min() + np.arange(lines) * line_interval
+
+    s0, s1 = across, np.roll(across, -1)
+    u0, u1 = along, np.roll(along, -1)
+    c = offsets[:, None]
+    hit = (np.minimum(s0, s1) <= c) & (c < np.maximum(s0, s1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.where(hit, u0 + (c - s0) / (s1 - s0) * (u1 - u0), np.inf)
+    u.sort(axis=1)
+    count = hit.sum(axis=1) // 2
+    pairs = u[:, :2 * int(count.max(initial=0))].reshape(lines, -1, 2)
+    with np.errstate(invalid='ignore'):
+        valid = (np.arange(pairs.shape[1]) < count[:, None]) & (pairs[..., 1] - pairs[..., 0] > EPS)
+    line, slot = np.nonzero(valid)
+    u_start, u_end = pairs[line, slot, 0], pairs[line, slot, 1]
+    c = offsets[line][:, None]
+    return line, c * normal + u_start[:, None] * direction, c * normal + u_end[:, None] * direction
@@ -0,0 +1,53 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module, imported with `importlib.import_module` the first
+    time one of its attributes is used. The stand-in only lives in the module
+    that asked for it; `sys.modules` never holds it, so other code importing
+    the same module gets the real one. After the import the attributes of the
+    module are copied into the stand-in, so later lookups cost no more than
+    on the module itself, and missing ones are looked up on the module.
+    """
+    def __getattr__(self, attr: str):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Import a module on first attribute access instead of now.
+
+    Heavy dependencies (NumPy, asyncio) are only needed by some code paths,
+    loading them lazily keeps `import pattern_generator` cheap for headless
+    jobs. Modules already imported are returned as they are. Annotations
+    using the module must not be evaluated at import time, so modules using
+    it start with `from __future__ import annotations`.
+
+    Parameters
+    ----------
+    name: str
+        Name of the module.
+
+    Returns
+    -------
+    module: types.ModuleType
+        Module loaded when one of its attributes is used, see `LazyModule`.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """
+    The module has been imported, lazily imported modules once they were used.
+    """
+    return name in sys.modules
@@ -0,0 +1,348 @@
+"""
+Incremental preview of a program while it is written.
+
+The generator hands the program text to a `ToolpathStream` in batches (see
+`PatternGenerator(observer=...)`). Every batch is replayed with the modal state
+the previous one ended in, so the moves are known without waiting for the
+file. `PreviewRaster` draws them into an RGB image with NumPy: segments are
+clipped to the view, snapped to whole pixels and drawn once however often
+they repeat there, so the work per batch depends on the pixels covered and
+not on the number of moves. Pan and zoom draw the kept moves again with a
+new `View`, without reading the program again. The Tk widget showing the
+image is `preview_canvas.LivePreview`; nothing here needs a display.
+"""
+from __future__ import annotations
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from utils import dialects as dl
+from utils.simulator import MachineState, OFF_CODES, ON_CODES, Simulation
+
+Box = Tuple[float, float, float, float]
+
+# Values the moves can be colored by.
+COLOR_BY = ('power', 'feed')
+BACKGROUND = (32, 32, 32)
+TRAVEL = (72, 72, 72)
+LABEL = (170, 170, 170)
+# Anchors of the color scale from the lowest to the highest value (viridis).
+COLORMAP = np.array([(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)], dtype=float)
+
+
+def laser_codes(command: str) -> Tuple[int, ...]:
+    """
+    M code numbers of a turn on or off command, e.g. (4,) for 'M4 S0'.
+    """
+    return tuple(int(code) for code in re.findall(r'M0*(\d+)', command.upper()))
+
+
+def colorize(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    """
+    (n, 3) uint8 colors of values on the color scale from `low` to `high`.
+    """
+    position = np.clip((np.asarray(values, dtype=float) - low) / ((high - low) or 1), 0, 1)
+    position *= len(COLORMAP) - 1
+    index = np.minimum(position.astype(np.int64), len(COLORMAP) - 2)
+    fraction = (position - index)[:, None]
+    return np.rint(COLORMAP[index] * (1 - fraction) + COLORMAP[index + 1] * fraction).astype(np.uint8)
+
+
+class Segments(NamedTuple):
+    """
+    Moves of a program: (n, 2) start and end points, whether they burn,
+    and their modal power and feed.
+    """
+    start: np.ndarray
+    end: np.ndarray
+    burn: np.ndarray
+    power: np.ndarray
+    feed: np.ndarray
+
+    @classmethod
+    def empty(cls) -> 'Segments':
+        points = np.empty((0, 2))
+        return cls(points, points, np.empty(0, dtype=bool), np.empty(0), np.empty(0))
+
+    @classmethod
+    def concatenate(cls, parts: Sequence['Segments']) -> 'Segments':
+        if not parts:
+            return cls.empty()
+        return cls(*(np.concatenate(columns) for columns in zip(*parts)))
+
+    def bounds(self) -> Optional[Box]:
+        """
+        x_min, y_min, x_max, y_max of the burning moves, of all moves when none burns.
+        """
+        mask = self.burn if self.burn.any() else np.ones(len(self.burn), dtype=bool)
+        if not mask.any():
+            return None
+        points = np.concatenate((self.start[mask], self.end[mask]))
+        return (*points.min(axis=0).tolist(), *points.max(axis=0).tolist())
+
+
+class ToolpathStream:
+    """
+    Moves of a program parsed while its text arrives in batches.
+
+    Only whole lines are parsed, the end of a batch after its last newline
+    waits for the next one. All batches are kept, so the moves can be drawn
+    again for another view.
+
+    Parameters
+    ----------
+    laser_mode: bool
+        The controller turns the laser off during G0 moves (GRBL $32=1, Marlin).
+    on_codes: Sequence[int]
+        M codes switching the laser on.
+    off_codes: Sequence[int]
+        M codes switching the laser off.
+    """
+    def __init__(self, laser_mode: bool = False, on_codes: Sequence[int] = ON_CODES,
+                 off_codes: Sequence[int] = OFF_CODES):
+        self.laser_mode = laser_mode
+        self.on_codes = tuple(on_codes)
+        self.off_codes = tuple(off_codes)
+        self.state = MachineState()
+        self.rest = ''
+        self.parts: List[Segments] = []
+        self._segments: Optional[Segments] = None
+
+    def add(self, text: str) -> Segments:
+        """
+        Parse the whole lines of the program text received so far and
+        return the moves they add.
+        """
+        text = self.rest + text
+        cut = text.rfind('\n') + 1
+        self.rest = text[cut:]
+        return self._parse(text[:cut])
+
+    def close(self) -> Segments:
+        """
+        Parse the last line when the program does not end with a newline.
+        """
+        text, self.rest = self.rest, ''
+        return self._parse(text)
+
+    def segments(self) -> Segments:
+        """
+        All moves parsed so far.
+        """
+        if self._segments is None:
+            self._segments = Segments.concatenate(self.parts)
+        return self._segments
+
+    def _parse(self, text: str) -> Segments:
+        if not text:
+            return Segments.empty()
+        simulation = Simulation(text, self.laser_mode, self.on_codes, self.off_codes, self.state)
+        self.state = simulation.state
+        part = Segments(simulation.start, simulation.end, simulation.burn, simulation.power, simulation.feed)
+        if len(part.burn):
+            self.parts.append(part)
+            self._segments = None
+        return part
+
+
+def stream_for(generator) -> ToolpathStream:
+    """
+    `ToolpathStream` replaying the program of a `PatternGenerator` like its controller.
+    """
+    dialect = generator.dialect
+    return ToolpathStream(isinstance(dialect, dl.GrblLaser), ON_CODES + laser_codes(dialect.turn_on),
+                          OFF_CODES + laser_codes(dialect.turn_off))
+
+
+class View(NamedTuple):
+    """
+    Mapping of bed millimeters to the pixels of an image: `x_min` is on
+    the left edge, `y_max` on the top edge, `scale` pixels per millimeter.
+    """
+    x_min: float
+    y_max: float
+    scale: float
+    width: int
+    height: int
+
+    @classmethod
+    def fit(cls, bounds: Box, width: int, height: int, margin: float = 0.05) -> 'View':
+        """
+        View showing the whole box, centered, with a margin around it.
+        """
+        x_min, y_min, x_max, y_max = bounds
+        size_x, size_y = max(x_max - x_min, 1e-6), max(y_max - y_min, 1e-6)
+        scale = min(width / size_x, height / size_y) / (1 + 2 * margin)
+        return cls(x_min - (width / scale - size_x) / 2, y_max + (height / scale - size_y) / 2,
+                   scale, width, height)
+
+    def to_pixels(self, points: np.ndarray) -> np.ndarray:
+        """
+        (n, 2) float pixel positions of (n, 2) bed points.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.column_stack(((points[:, 0] - self.x_min) * self.scale, (self.y_max - points[:, 1]) * self.scale))
+
+    def to_bed(self, x: float, y: float) -> Tuple[float, float]:
+        """
+        Bed position of a pixel.
+        """
+        return self.x_min + x / self.scale, self.y_max - y / self.scale
+
+    def panned(self, dx: float, dy: float) -> 'View':
+        """
+        View with the image moved by dx, dy pixels.
+        """
+        return self._replace(x_min=self.x_min - dx / self.scale, y_max=self.y_max + dy / self.scale)
+
+    def zoomed(self, factor: float, x: float, y: float) -> 'View':
+        """
+        View magnified by `factor` around the pixel x, y, which keeps its bed position.
+        """
+        bed_x, bed_y = self.to_bed(x, y)
+        scale = self.scale * factor
+        return self._replace(x_min=bed_x - x / scale, y_max=bed_y + y / scale, scale=scale)
+
+    def resized(self, width: int, height: int) -> 'View':
+        """
+        View of an image of another size with the same upper left corner and scale.
+        """
+        return self._replace(width=width, height=height)
+
+
+class Layout(NamedTuple):
+    """
+    Geometry of a grid known before its program is written: squares as
+    (n, 4) x, y, width, length with their power and feed, and the burned
+    lines of the labels as (m, 4) x_start, y_start, x_end, y_end.
+    """
+    squares: np.ndarray
+    power: np.ndarray
+    feed: np.ndarray
+    labels: np.ndarray
+
+    def bounds(self) -> Box:
+        boxes = np.concatenate((self.squares[:, :2], self.squares[:, :2] + self.squares[:, 2:],
+                                self.labels[:, :2], self.labels[:, 2:]))
+        return (*boxes.min(axis=0).tolist(), *boxes.max(axis=0).tolist())
+
+
+def grid_layout(generator) -> Layout:
+    """
+    Squares and label lines of a `PatternGenerator`, without writing its program.
+    """
+    points = list(generator.parameter_sweep())
+    squares = np.array([(point.x, point.y, generator.width, generator.length) for point in points],
+                       dtype=float).reshape(-1, 4)
+    characters = generator.load_font()
+    lines = [generator.label_footprint(characters, value, x, y).lines for value, x, y in generator.label_positions()]
+    return Layout(squares, np.array([point.params['power'] for point in points], dtype=float),
+                  np.array([point.params['speed'] for point in points], dtype=float),
+                  np.concatenate(lines) if lines else np.empty((0, 4)))
+
+
+class PreviewRaster:
+    """
+    RGB image the moves are drawn into, shown as one photo image.
+
+    Parameters
+    ----------
+    view: View
+        Bed area shown and size of the image.
+    """
+    def __init__(self, view: View):
+        self.view = view
+        self.pixels = np.empty((view.height, view.width, 3), dtype=np.uint8)
+        self.clear()
+
+    def clear(self):
+        self.pixels[:] = BACKGROUND
+
+    def draw(self, start: np.ndarray, end: np.ndarray, colors: np.ndarray) -> int:
+        """
+        Draw line segments between bed points, later segments over earlier ones.
+
+        Segments are clipped to the image and snapped to whole pixels, and
+        segments with the same pixels and color are drawn once, so a dense
+        fill costs about one segment per pixel row however many passes
+        fall on it. Every segment is then sampled once per pixel.
+
+        Parameters
+        ----------
+        start, end: numpy.ndarray
+            (n, 2) end points in millimeters.
+        colors: numpy.ndarray
+            (n, 3) uint8 color of every segment.
+
+        Returns
+        -------
+        drawn: int
+            Number of segments drawn after clipping and merging.
+        """
+        a, b = self.view.to_pixels(start), self.view.to_pixels(end)
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        a, b, keep = clip(a, b, self.view.width, self.view.height)
+        keys = np.column_stack((np.rint(a[keep]), np.rint(b[keep]), colors[keep])).astype(np.int64)
+        if not len(keys):
+            return 0
+        _, first = np.unique(keys, axis=0, return_index=True)
+        keys = keys[np.sort(first)]
+        a, b, colors = keys[:, :2], keys[:, 2:4], keys[:, 4:].astype(np.uint8)
+
+        samples = np.abs(b - a).max(axis=1) + 1
+        segment = np.repeat(np.arange(len(keys)), samples)
+        step = np.arange(samples.sum()) - np.repeat(np.cumsum(samples) - samples, samples)
+        t = (step / np.maximum(samples - 1, 1)[segment])[:, None]
+        points = np.rint(a[segment] + (b - a)[segment] * t).astype(np.int64)
+        x = np.clip(points[:, 0], 0, self.view.width - 1)
+        y = np.clip(points[:, 1], 0, self.view.height - 1)
+        self.pixels[y, x] = colors[segment]
+        return len(keys)
+
+    def fill_boxes(self, boxes: np.ndarray, colors: np.ndarray):
+        """
+        Fill (n, 4) x, y, width, length boxes in millimeters with (n, 3) colors.
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        corners = np.rint(np.hstack((self.view.to_pixels(boxes[:, :2] + boxes[:, 2:] * [0, 1]),
+                                     self.view.to_pixels(boxes[:, :2] + boxes[:, 2:] * [1, 0])))).astype(np.int64)
+        visible = (corners[:, 2] >= 0) & (corners[:, 0] < self.view.width) & \
+                  (corners[:, 3] >= 0) & (corners[:, 1] < self.view.height)
+        corners, colors = corners[visible], np.asarray(colors, dtype=np.uint8).reshape(-1, 3)[visible]
+        corners[:, 0::2] = np.clip(corners[:, 0::2], 0, self.view.width)
+        corners[:, 1::2] = np.clip(corners[:, 1::2], 0, self.view.height)
+        for (left, top, right, bottom), color in zip(corners.tolist(), colors):
+            self.pixels[top:bottom + 1, left:right + 1] = color
+
+    def ppm(self) -> bytes:
+        """
+        The image as binary PPM, which Tk photo images read directly.
+        """
+        return b'P6 %d %d 255\n' % (self.view.width, self.view.height) + self.pixels.tobytes()
+
+
+def clip(a: np.ndarray, b: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip (n, 2) pixel segments to the image (Liang-Barsky, all at once).
+
+    Returns
+    -------
+    a, b: numpy.ndarray
+        Clipped end points.
+    keep: numpy.ndarray
+        The segment crosses the image.
+    """
+    delta = b - a
+    t0, t1 = np.zeros(len(a)), np.ones(len(a))
+    for axis, size in ((0, width), (1, height)):
+        low, high = -0.5 - a[:, axis], size - 0.5 - a[:, axis]
+        moving = delta[:, axis] != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_low, t_high = low / delta[:, axis], high / delta[:, axis]
+        enter = np.where(moving, np.minimum(t_low, t_high), -np.inf)
+        leave = np.where(moving, np.maximum(t_low, t_high), np.inf)
+        inside = moving | ((low <= 0) & (high >= 0))
+        t0 = np.where(inside, np.maximum(t0, enter), np.inf)
+        t1 = np.minimum(t1, leave)
+    keep = t0 <= t1
+    t0, t1 = np.where(keep, t0, 0), np.where(keep, t1, 0)
+    return a + delta * t0[:, None], a + delta * t1[:, None], keep
@@ -1,5 +1,215 @@
+from __future__ import annotations
 from contextlib import contextmanager
-from typing import Tuple, List
+from typing import Callable, Tuple, List, Optional, Sequence, Union
+from utils import gcode_io as gio, dialects as dl
+from utils.fixed_point import get_fixed_point
+from utils.hatching import scan_segments, square_polygon
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Kinds of moves returned by raster_path.
+TRAVEL, BLANK, BURN = 0, 1, 2
+
+
+def raster_path(x_start: float, y_start: float, width: float, length: float, line_interval: float,
+                overscan: float = 0.0, unidirectional: bool = False
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the tool path filling a square with horizontal scan lines.
+
+    Every scan line is a burning move of the square width. With overscan the
+    head starts `overscan` mm before the square and stops `overscan` mm after
+    it with the laser off, so acceleration and deceleration happen outside
+    the burned area. Bidirectional lines alternate direction and are joined
+    by the pitch step, unidirectional lines all run towards +X and the head
+    travels back to the start side between them.
+
+    Parameters
+    ----------
+    x_start: float
+        Left edge of the square.
+    y_start: float
+        Bottom edge of the square, Y of the first scan line.
+    width: float
+        Width of the burned square.
+    length: float
+        Length of the burned square.
+    line_interval: float
+        Distance between scan lines in millimeters.
+    overscan: float
+        Laser off run-in and run-out distance in millimeters.
+    unidirectional: bool
+        Burn every line in the same direction.
+
+    Returns
+    -------
+    x: np.ndarray
+        X coordinates of the move ends.
+    y: np.ndarray
+        Y coordinates of the move ends.
+    kind: np.ndarray
+        TRAVEL, BLANK or BURN for every move.
+    """
+    lines = int(length / line_interval + 1e-9)
+    y = np.round(y_start + np.arange(lines) * line_interval, 6)
+    left = np.full(lines, float(x_start))
+    right = left + width
+    if not unidirectional:
+        left[1::2], right[1::2] = right[1::2], left[1::2].copy()
+    direction = np.sign(right - left)
+
+    if overscan:
+        columns = [left - direction * overscan, left, right, right + direction * overscan]
+        kinds = [TRAVEL, BLANK, BURN, BLANK]
+    else:
+        columns = [left, right]
+        kinds = [TRAVEL, BURN]
+    x = np.round(np.stack(columns, axis=1), 6).ravel()
+    y = np.repeat(y, len(columns))
+    kind = np.tile(np.array(kinds), lines)
+    return x, y, kind
+
+
+def row_raster_path(x_starts: Sequence[float], y_start: float, width: float, length: float,
+                    line_interval: float, overscan: float = 0.0, unidirectional: bool = False
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the tool path filling a row of squares with scan lines crossing all of them.
+
+    Every scan line runs from the first to the last square of the row: a
+    burning move over every square and a laser off move at the cutting feed
+    over every gap between squares. Overscan is added only at the two ends
+    of the line, so a row has the turnarounds of a single square.
+    Direction and line order are those of `raster_path`.
+
+    Parameters
+    ----------
+    x_starts: Sequence[float]
+        Left edges of the squares, in increasing order.
+    y_start: float
+        Bottom edge of the squares, Y of the first scan line.
+    width: float
+        Width of the burned squares.
+    length: float
+        Length of the burned squares.
+    line_interval: float
+        Distance between scan lines in millimeters.
+    overscan: float
+        Laser off run-in and run-out distance in millimeters.
+    unidirectional: bool
+        Burn every line in the same direction.
+
+    Returns
+    -------
+    x: np.ndarray
+        X coordinates of the move ends.
+    y: np.ndarray
+        Y coordinates of the move ends.
+    kind: np.ndarray
+        TRAVEL, BLANK or BURN for every move.
+    square: np.ndarray
+        Index in `x_starts` of the square burned by every BURN move, -1 for other moves.
+    """
+    lines = int(length / line_interval + 1e-9)
+    left = np.asarray(x_starts, dtype=float)
+    # One line from left to right: the edges of every square, entered from the previous gap.
+    points = np.column_stack((left, left + width)).ravel()
+    kinds = np.tile(np.array([BLANK, BURN]), len(left))
+    squares = np.repeat(np.arange(len(left)), 2)
+    squares[0::2] = -1
+    if overscan:
+        points = np.concatenate(([points[0] - overscan], points, [points[-1] + overscan]))
+        kinds = np.concatenate(([TRAVEL], kinds, [BLANK]))
+        squares = np.concatenate(([-1], squares, [-1]))
+    else:
+        kinds[0] = TRAVEL
+
+    # Backwards lines visit the points in reverse, every move keeps the kind of its segment.
+    backwards = np.zeros(lines, dtype=bool)
+    if not unidirectional:
+        backwards[1::2] = True
+    reverse_kinds = np.concatenate(([TRAVEL], kinds[:0:-1]))
+    reverse_squares = np.concatenate(([-1], squares[:0:-1]))
+    x = np.where(backwards[:, None], points[::-1], points)
+    kind = np.where(backwards[:, None], reverse_kinds, kinds)
+    square = np.where(backwards[:, None], reverse_squares, squares)
+    y = np.repeat(np.round(y_start + np.arange(lines) * line_interval, 6), len(points))
+    return np.round(x, 6).ravel(), y, kind.ravel(), square.ravel()
+
+
+def hatch_path(polygon: Sequence[Tuple[float, float]], angle: float, line_interval: float,
+               overscan: float = 0.0, unidirectional: bool = False
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute the tool path filling a polygon with scan lines at an angle.
+
+    The lines are clipped to the polygon by `hatching.scan_segments` and
+    burned in boustrophedon order: every other non-empty line runs backwards
+    and visits its segments in reverse, so the head steps to the next line
+    instead of travelling back. Overscan and unidirectional lines work as in
+    `raster_path`, along the scan direction. At 0 degrees a square gets the
+    path of `raster_path`.
+
+    Parameters
+    ----------
+    polygon: Sequence[Tuple[float, float]]
+        Vertices of the filled polygon.
+    angle: float
+        Direction of the scan lines in degrees from +X.
+    line_interval: float
+        Distance between scan lines in millimeters.
+    overscan: float
+        Laser off run-in and run-out distance in millimeters.
+    unidirectional: bool
+        Burn every line in the same direction.
+
+    Returns
+    -------
+    x: np.ndarray
+        X coordinates of the move ends.
+    y: np.ndarray
+        Y coordinates of the move ends.
+    kind: np.ndarray
+        TRAVEL, BLANK or BURN for every move.
+    """
+    line, start, end = scan_segments(polygon, angle, line_interval)
+    if not unidirectional and len(line):
+        first = np.ones(len(line), dtype=bool)
+        first[1:] = line[1:] != line[:-1]
+        backwards = (np.cumsum(first) - 1) % 2 == 1
+        if not first.all():
+            # Several segments on a line: backwards lines visit them from the last one.
+            order = np.lexsort((np.where(backwards, -np.arange(len(line)), np.arange(len(line))), line))
+            backwards = backwards[order]
+            start, end = start[order], end[order]
+        backwards = backwards[:, None]
+        start, end = np.where(backwards, end, start), np.where(backwards, start, end)
+    direction = end - start
+    direction /= np.hypot(direction[:, 0], direction[:, 1])[:, None]
+
+    if overscan:
+        columns = [start - direction * overscan, start, end, end + direction * overscan]
+        kinds = [TRAVEL, BLANK, BURN, BLANK]
+    else:
+        columns = [start, end]
+        kinds = [TRAVEL, BURN]
+    points = np.round(np.stack(columns, axis=1), 6).reshape(-1, 2)
+    kind = np.tile(np.array(kinds), len(line))
+    return points[:, 0], points[:, 1], kind
+
+
+def square_hatch_path(x_start: float, y_start: float, width: float, length: float, line_interval: float,
+                      angle: float = 45.0, cross: bool = False, overscan: float = 0.0,
+                      unidirectional: bool = False) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    `hatch_path` of a square, followed by a second pass at `angle` + 90
+    degrees for a cross-hatch.
+    """
+    polygon = square_polygon(x_start, y_start, width, length)
+    paths = [hatch_path(polygon, angle + turn, line_interval, overscan, unidirectional)
+             for turn in ((0, 90) if cross else (0,))]
+    return tuple(np.concatenate(arrays) for arrays in zip(*paths))
 
 
 class Location:
@@ -7,11 +217,19 @@ class Location:
     Class for handling tool localization in the x, y-axis
     and methods to save tool positions and other commands
     in a txt file.
+
+    With `fixed_point` decimal places (3 for microns) the tool paths are
+    computed in integer units and written as exact decimal text, instead
+    of accumulating float steps and writing their repr.
     """
 
-    def __init__(self, coord: Tuple[float, float], file_name: str):
+    def __init__(self, coord: Tuple[float, float], file_name: str, dialect: Optional[dl.Dialect] = None,
+                 fixed_point: Optional[int] = None):
         self.x, self.y = coord
         self.file_name = file_name
+        self.dialect = dialect
+        self.fixed = None if fixed_point is None else get_fixed_point(fixed_point)
+        self.sink = None
 
     @property
     def loc(self) -> Tuple[float, float]:
@@ -29,29 +247,104 @@ class Location:
         return f'{type(self).__name__}(x={self.x}, y={self.y})'
 
     @contextmanager
-    def open_file(self, name: str):
+    def open_file(self, name: str, mode: str = 'a'):
         """
         Context manager for working with txt files.
+        Writes to the file opened by `session` go to its open stream.
         """
-        f = open(name, 'a')
-        try:
+        with gio.output(self.output(name), mode) as f:
             yield f
+
+    def output(self, name: str):
+        """
+        Return the open session stream when `name` is the session file,
+        otherwise `name` itself.
+        """
+        if self.sink is not None and name == self.file_name:
+            return self.sink
+        return name
+
+    @contextmanager
+    def session(self, file: str, compression: Optional[str] = None,
+                level: Optional[int] = None, block_size: Optional[int] = None,
+                observer: Optional[Callable[[str], None]] = None):
+        """
+        Keep the output file open for a whole program, so every write goes
+        to one (optionally compressed) stream instead of reopening the file.
+
+        Parameters
+        ----------
+        file: str
+            Name of the file to be used.
+        compression: Optional[str]
+            'gzip', 'xz', 'zstd', 'none' or None to guess from the file suffix.
+        level: Optional[int]
+            Compression level.
+        block_size: Optional[int]
+            Size in bytes of the write buffer in front of the compressor.
+        observer: Optional[Callable[[str], None]]
+            Also called with the written text in batches, see `gcode_io.TeeStream`.
+        """
+        self.file_name = file
+        self.sink = gio.open_gcode(file, 'w', compression, level, block_size)
+        if observer is not None:
+            self.sink = gio.TeeStream(self.sink, observer)
+        try:
+            yield self.sink
         finally:
-            f.close()
+            self.sink.close()
+            self.sink = None
+
+    def get_dialect(self, turn_on: str = 'M4', turn_off: str = 'M5') -> dl.Dialect:
+        """
+        Return the dialect of this location, or the custom dialect
+        built from the given commands when none was set.
+        """
+        return self.dialect or dl.Dialect(turn_on, turn_off)
+
+    def coords(self, x: float, y: float) -> Tuple[Union[float, str], Union[float, str]]:
+        """
+        Coordinates as passed to the dialect: decimal text on the fixed-point
+        grid, or the numbers themselves without fixed point.
+        """
+        if self.fixed is None:
+            return x, y
+        return self.fixed.text(self.fixed.units(x)), self.fixed.text(self.fixed.units(y))
+
+    def emitted(self, values: np.ndarray) -> list:
+        """
+        Coordinates of an array as passed to the dialect, see `coords`.
+        Every distinct fixed-point value is formatted once.
+        """
+        if self.fixed is None:
+            return values.tolist()
+        units, inverse = np.unique(np.rint(values * self.fixed.scale).astype(np.int64), return_inverse=True)
+        texts = [self.fixed.text(unit) for unit in units.tolist()]
+        return [texts[index] for index in inverse.ravel().tolist()]
 
     def start(self, file: str):
         """
         Clear a file and write start coordinates.
 
+        Parameters
+        ----------
+        file: str
+            Name of the file to be used.
+        """
+        with self.open_file(file, 'w') as f:
+            f.write(self.get_dialect().preamble(*self.coords(self.x, self.y)))
+
+    def end(self, file: str):
+        """
+        Write the end of the program required by the dialect.
+
         Parameters
         ----------
         file: str
             Name of the file to be used.
         """
         with self.open_file(file) as f:
-            f.truncate(0)
-            f.write(f'X{self.x} Y{self.y} \n')
-            f.write('G1 F100 S1000\n')
+            f.write(self.get_dialect().postamble())
 
     def write_pos(self, file: str):
         """
@@ -63,7 +356,7 @@ class Location:
             Name of the file to be used.
         """
         with self.open_file(file) as f:
-            f.write(f'G1 X{self.x} Y{self.y} \n')
+            f.write(self.get_dialect().move(*self.coords(self.x, self.y)))
 
     def write_power_speed(self, file: str, power: int, speed: int):
         """
@@ -79,7 +372,7 @@ class Location:
             Tool speed value.
         """
         with self.open_file(file) as f:
-            f.write(f'S{power} F{speed} \n')
+            f.write(self.get_dialect().power_speed(power, speed))
 
     def write(self, file: str, command: str):
         """
@@ -122,27 +415,169 @@ class Location:
             G-code command to turn on the laser.
         turn_off: str
             G-code command to turn off the laser.
+            The commands are used only when no dialect is set.
         """
+        dialect = self.get_dialect(turn_on, turn_off)
         self.loc = (x_start, y_start)
         self.write_pos(file)
         self.write_power_speed(file, power, speed)
-        print(f'G1 S{power} F{speed}')
         steps = int((length * passes_per_mm) / 2)
-        with open(file, 'a') as f:
+        if self.fixed is not None:
+            self.fixed_snake_path(dialect, width, passes_per_mm, steps, file)
+            return
+        with self.open_file(file) as f:
             for _ in range(steps):
-                f.write(f'{turn_on} \n')
                 self.x += width
-                f.write(f'G1 X{self.x} Y{self.y} \n')
-                f.write(f'{turn_off} \n')
+                f.write(dialect.burn(self.x, self.y))
                 self.y += 1 / passes_per_mm
-                f.write(f'G1 X{self.x} Y{self.y} \n')
-                f.write(f'{turn_on} \n')
+                f.write(dialect.travel(self.x, self.y))
                 self.x -= width
-                f.write(f'G1 X{self.x} Y{self.y} \n')
-                f.write(f'{turn_off} \n')
+                f.write(dialect.burn(self.x, self.y))
                 self.y += 1 / passes_per_mm
-                f.write(f'G1 X{self.x} Y{self.y} \n')
-            f.write(f'{turn_off} \n')
+                f.write(dialect.travel(self.x, self.y))
+            f.write(dialect.finish())
+
+    def fixed_snake_path(self, dialect: dl.Dialect, width: float, passes_per_mm: float, steps: int, file: str):
+        """
+        Passes of `snake_path` on the fixed-point grid. Every pass is placed
+        from its index instead of adding up the pitch, and the two x positions
+        and the y of every pass are formatted once.
+        """
+        fixed = self.fixed
+        x_units, y_units = fixed.units(self.x), fixed.units(self.y)
+        left, right = fixed.text(x_units), fixed.text(x_units + fixed.units(width))
+        rows = [y_units + round(row * fixed.scale / passes_per_mm) for row in range(2 * steps + 1)]
+        y_text = [fixed.text(row) for row in rows]
+        with self.open_file(file) as f:
+            for row in range(0, 2 * steps, 2):
+                f.write(dialect.burn(right, y_text[row]))
+                f.write(dialect.travel(right, y_text[row + 1]))
+                f.write(dialect.burn(left, y_text[row + 1]))
+                f.write(dialect.travel(left, y_text[row + 2]))
+            f.write(dialect.finish())
+        self.loc = (fixed.mm(x_units), fixed.mm(rows[-1]))
+
+    def raster_fill(self, x_start: float, y_start: float, power: int, speed: int, width: float,
+                    length: float, line_interval: float, file: str, turn_on: str, turn_off: str,
+                    overscan: float = 0.0, unidirectional: bool = False):
+        """
+        Burn a square with scan lines at a float line interval, with optional
+        laser off overscan and unidirectional scanning (see `raster_path`).
+
+        Parameters
+        ----------
+        x_start: float
+            Start tool position on the x-axis.
+        y_start: float
+            Start tool position on the y-axis.
+        power: int
+            Power of the laser for the current square.
+        speed: int
+            Tool speed for the current square.
+        width: float
+            Width of the burned square.
+        length: float
+            Length of the burned square.
+        line_interval: float
+            Distance between scan lines in millimeters.
+        file: str
+            Name of the file to write the commands to.
+        turn_on: str
+            G-code command to turn on the laser.
+        turn_off: str
+            G-code command to turn off the laser.
+            The commands are used only when no dialect is set.
+        overscan: float
+            Laser off run-in and run-out distance in millimeters.
+        unidirectional: bool
+            Burn every line in the same direction.
+        """
+        self.write_path(*raster_path(x_start, y_start, width, length, line_interval, overscan, unidirectional),
+                        power, speed, file, self.get_dialect(turn_on, turn_off))
+
+    def hatch_fill(self, x_start: float, y_start: float, power: int, speed: int, width: float,
+                   length: float, line_interval: float, file: str, turn_on: str, turn_off: str,
+                   angle: float = 45.0, cross: bool = False, overscan: float = 0.0,
+                   unidirectional: bool = False):
+        """
+        Burn a square with scan lines at an angle, optionally cross-hatched
+        (see `square_hatch_path`).
+
+        Parameters
+        ----------
+        x_start, y_start, power, speed, width, length, line_interval, file, turn_on, turn_off
+            As in `raster_fill`.
+        angle: float
+            Direction of the scan lines in degrees from +X.
+        cross: bool
+            Burn a second pass at `angle` + 90 degrees.
+        overscan, unidirectional
+            As in `raster_fill`.
+        """
+        self.write_path(*square_hatch_path(x_start, y_start, width, length, line_interval, angle, cross,
+                                           overscan, unidirectional),
+                        power, speed, file, self.get_dialect(turn_on, turn_off))
+
+    def write_path(self, x: np.ndarray, y: np.ndarray, kind: np.ndarray, power: int, speed: int,
+                   file: str, dialect: dl.Dialect):
+        """
+        Write a tool path of TRAVEL, BLANK and BURN moves at one power and feed,
+        starting with a move to its first point.
+        """
+        if not len(x):
+            return
+        moves = (dialect.travel, dialect.blank, dialect.burn)
+        self.loc = (float(x[0]), float(y[0]))
+        self.write_pos(file)
+        self.write_power_speed(file, power, speed)
+        with self.open_file(file) as f:
+            for x_pos, y_pos, move in zip(self.emitted(x[1:]), self.emitted(y[1:]), kind[1:].tolist()):
+                f.write(moves[move](x_pos, y_pos))
+            f.write(dialect.finish())
+        self.loc = (float(x[-1]), float(y[-1]))
+
+    def row_raster(self, x_starts: Sequence[float], y_start: float, powers: Sequence[int], speed: int,
+                   width: float, length: float, line_interval: float, file: str, turn_on: str,
+                   turn_off: str, overscan: float = 0.0, unidirectional: bool = False):
+        """
+        Burn a row of squares sharing a feed with scan lines crossing the
+        whole row (see `row_raster_path`). The power changes at every square
+        boundary: inline S words for GRBL laser mode and the other modal
+        dialects, power lines for the custom dialect.
+
+        Parameters
+        ----------
+        x_starts: Sequence[float]
+            Left edges of the squares, in increasing order.
+        y_start: float
+            Bottom edge of the squares.
+        powers: Sequence[int]
+            Power of the laser for every square.
+        speed: int
+            Tool speed of the row.
+        width, length, line_interval, file, turn_on, turn_off, overscan, unidirectional
+            As in `raster_fill`.
+        """
+        dialect = self.get_dialect(turn_on, turn_off)
+        x, y, kind, square = row_raster_path(x_starts, y_start, width, length, line_interval,
+                                             overscan, unidirectional)
+        if not len(x):
+            return
+        moves = (dialect.travel, dialect.blank)
+        self.loc = (float(x[0]), float(y[0]))
+        self.write_pos(file)
+        self.write_power_speed(file, powers[0], speed)
+        with self.open_file(file) as f:
+            for x_pos, y_pos, move, index in zip(self.emitted(x[1:]), self.emitted(y[1:]),
+                                                 kind[1:].tolist(), square[1:].tolist()):
+                if move != BURN:
+                    f.write(moves[move](x_pos, y_pos))
+                    continue
+                if powers[index] != dialect.power:
+                    f.write(dialect.power_speed(powers[index], speed))
+                f.write(dialect.burn(x_pos, y_pos))
+            f.write(dialect.finish())
+        self.loc = (float(x[-1]), float(y[-1]))
 
 
 class PowerSpeedIterator:
@@ -171,6 +606,9 @@ class PowerSpeedIterator:
         List with tool power values for each column.
     speed_list: List[int]
         List with tool speed values for each row.
+    fixed_point: Optional[int]
+        Decimal places of integer fixed-point positions (3 for microns),
+        None to step float positions.
 
     Returns
     -------
@@ -181,7 +619,7 @@ class PowerSpeedIterator:
 
     def __init__(self, col_number: int, row_number: int, x_start: float,
                  y_start: float, length: float,  width: float, space: float,
-                 speed_list: List, power_list: List):
+                 speed_list: List, power_list: List, fixed_point: Optional[int] = None):
 
         self.col_number = col_number
         self.row_number = row_number
@@ -192,14 +630,33 @@ class PowerSpeedIterator:
         self.space = space
         self.speed_list = speed_list
         self.power_list = power_list
+        self.fixed = None if fixed_point is None else get_fixed_point(fixed_point)
+
+    def units(self, mm: float) -> Union[float, int]:
+        """
+        Length in the units positions are added up in: integer fixed-point
+        units, or millimeters without fixed point.
+        """
+        return mm if self.fixed is None else self.fixed.units(mm)
+
+    def mm(self, value: Union[float, int]) -> float:
+        """
+        Position in millimeters of a value in the units positions are added up in.
+        """
+        return value if self.fixed is None else self.fixed.mm(value)
 
     def __iter__(self):
         self.row_counter = 0
         self.col_counter = 0
         self.power = self.power_list[self.col_counter]
         self.speed = self.speed_list[self.row_counter]
-        self.x_pos = self.x_start
-        self.y_pos = self.y_start
+        # Positions are added up in `units`, `x_pos` and `y_pos` stay in millimeters.
+        self._x = self.units(self.x_start)
+        self._y = self.units(self.y_start)
+        self._x_step = self.units(self.space) + self.units(self.width)
+        self._y_step = self.units(self.space) + self.units(self.length)
+        self.x_pos = self.mm(self._x)
+        self.y_pos = self.mm(self._y)
 
         return self
 
@@ -209,14 +666,16 @@ class PowerSpeedIterator:
 
         result = f"G1 S{self.speed} F{self.power}"
 
-        self.x_pos += self.space + self.width
+        self._x += self._x_step
         if self.col_counter >= self.col_number - 1:
-            self.x_pos = self.x_start
-            self.y_pos += self.space + self.length
+            self._x = self.units(self.x_start)
+            self._y += self._y_step
             self.col_counter = 0
             self.row_counter += 1
         else:
             self.col_counter += 1
+        self.x_pos = self.mm(self._x)
+        self.y_pos = self.mm(self._y)
 
         self.power = self.power_list[self.col_counter % len(self.power_list)]
         self.speed = self.speed_list[self.row_counter % len(self.speed_list)]
@@ -0,0 +1,233 @@
+from math import hypot
+from typing import List, Optional, Sequence, Tuple
+
+Point = Tuple[float, float]
+# Tolerance of the packing comparisons in millimeters.
+EPS = 1e-9
+
+
+def _top(skyline: List[Tuple[float, float, float]], start: int, width: float) -> float:
+    """
+    Highest skyline segment under [x, x + width) starting at segment `start`.
+    """
+    x = skyline[start][0]
+    top = 0.0
+    for segment_x, segment_y, _ in skyline[start:]:
+        if segment_x >= x + width - EPS:
+            break
+        top = max(top, segment_y)
+    return top
+
+
+def _raise(skyline: List[Tuple[float, float, float]], x: float, y: float,
+           width: float) -> List[Tuple[float, float, float]]:
+    """
+    Skyline after placing a rectangle of `width` with its top at `y` at `x`.
+    """
+    end = x + width
+    segments = [(x, y, width)]
+    for segment_x, segment_y, segment_width in skyline:
+        segment_end = segment_x + segment_width
+        if segment_end <= x + EPS or segment_x >= end - EPS:
+            segments.append((segment_x, segment_y, segment_width))
+            continue
+        if segment_x < x - EPS:
+            segments.append((segment_x, segment_y, x - segment_x))
+        if segment_end > end + EPS:
+            segments.append((end, segment_y, segment_end - end))
+    segments.sort()
+    merged = [segments[0]]
+    for segment in segments[1:]:
+        last = merged[-1]
+        if abs(last[1] - segment[1]) <= EPS:
+            merged[-1] = (last[0], last[1], last[2] + segment[2])
+        else:
+            merged.append(segment)
+    return merged
+
+
+def skyline_pack(sizes: Sequence[Tuple[float, float]], bed: Tuple[float, float],
+                 gap: float = 0.0) -> List[Point]:
+    """
+    Pack rectangles onto a bed without rotating them.
+
+    Skyline bottom-left packing: rectangles are placed from the tallest one,
+    each at the lowest (then leftmost) position where it fits on the
+    skyline of the rectangles placed before. The cost is O(n * s) for n
+    rectangles and s skyline segments, a few milliseconds for dozens of jobs.
+
+    Parameters
+    ----------
+    sizes: Sequence[Tuple[float, float]]
+        Width and height of every rectangle.
+    bed: Tuple[float, float]
+        Width and height of the bed.
+    gap: float
+        Minimum distance between rectangles, not kept from the bed edges.
+
+    Returns
+    -------
+    positions: List[Tuple[float, float]]
+        Lower left corner of every rectangle, in the order of `sizes`.
+    """
+    width, height = bed[0] + gap, bed[1] + gap
+    order = sorted(range(len(sizes)), key=lambda index: (-sizes[index][1], -sizes[index][0]))
+    skyline = [(0.0, 0.0, width)]
+    positions: List[Optional[Point]] = [None] * len(sizes)
+    for index in order:
+        item_width, item_height = sizes[index][0] + gap, sizes[index][1] + gap
+        best = None
+        for start, (x, _, _) in enumerate(skyline):
+            if x + item_width > width + EPS:
+                break
+            y = _top(skyline, start, item_width)
+            if y + item_height <= height + EPS and (best is None or (y, x) < best):
+                best = (y, x)
+        if best is None:
+            raise ValueError(f'Rectangle {index} of {sizes[index][0]:g} x {sizes[index][1]:g} mm '
+                             f'does not fit on the {bed[0]:g} x {bed[1]:g} mm bed')
+        y, x = best
+        positions[index] = (x, y)
+        skyline = _raise(skyline, x, y + item_height, item_width)
+    return positions
+
+
+def path_length(order: Sequence[int], starts: Sequence[Point], ends: Sequence[Point],
+                origin: Point = (0.0, 0.0)) -> float:
+    """
+    Travel from `origin` through the jobs in `order`, each entered at its
+    start and left at its end.
+    """
+    length = 0.0
+    position = origin
+    for index in order:
+        length += hypot(starts[index][0] - position[0], starts[index][1] - position[1])
+        position = ends[index]
+    return length
+
+
+def order_path(starts: Sequence[Point], ends: Sequence[Point],
+               origin: Point = (0.0, 0.0), max_passes: int = 50) -> List[int]:
+    """
+    Order jobs to keep the travel between them short.
+
+    A nearest neighbour tour from `origin` is improved by moving single jobs
+    to the position that shortens the path most, until no move helps.
+    Every job is entered at its start and left at its end, so the costs are
+    asymmetric and a move is evaluated from its three changed links.
+
+    Parameters
+    ----------
+    starts: Sequence[Tuple[float, float]]
+        Entry point of every job.
+    ends: Sequence[Tuple[float, float]]
+        Exit point of every job.
+    origin: Tuple[float, float]
+        Position of the head before the first job.
+    max_passes: int
+        Limit of improvement passes.
+
+    Returns
+    -------
+    order: List[int]
+        Indices of the jobs in travel order.
+    """
+    def travel(before: Optional[int], after: Optional[int]) -> float:
+        # None before is the origin, None after is the end of the program.
+        if after is None:
+            return 0.0
+        x, y = origin if before is None else ends[before]
+        return hypot(starts[after][0] - x, starts[after][1] - y)
+
+    left = set(range(len(starts)))
+    order = []
+    last = None
+    while left:
+        last = min(left, key=lambda index: (travel(last, index), index))
+        order.append(last)
+        left.remove(last)
+
+    for _ in range(max_passes):
+        improved = False
+        for position in range(len(order)):
+            job = order[position]
+            before = order[position - 1] if position else None
+            after = order[position + 1] if position + 1 < len(order) else None
+            removed = travel(before, job) + travel(job, after) - travel(before, after)
+            rest = order[:position] + order[position + 1:]
+            best, best_gain = None, EPS
+            for target in range(len(rest) + 1):
+                previous = rest[target - 1] if target else None
+                following = rest[target] if target < len(rest) else None
+                added = travel(previous, job) + travel(job, following) - travel(previous, following)
+                if removed - added > best_gain:
+                    best, best_gain = target, removed - added
+            if best is not None:
+                rest.insert(best, job)
+                order = rest
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def split_balanced(costs: Sequence[float], parts: int,
+                   start_costs: Optional[Sequence[float]] = None) -> List[range]:
+    """
+    Split a sequence into contiguous runs with the largest run cost as small as possible.
+
+    The smallest feasible limit is found by bisection; a limit is feasible
+    when the greedy split (every run extended while it stays under the
+    limit) needs no more than `parts` runs. Runs are then split further at
+    their most balanced point until there are `parts` of them.
+
+    Parameters
+    ----------
+    costs: Sequence[float]
+        Non-negative cost of every item, in order.
+    parts: int
+        Number of runs, at most the number of items.
+    start_costs: Optional[Sequence[float]]
+        Cost of every item when it starts a run, e.g. with a setup paid once
+        per run, at least its cost in `costs` and exceeding it by the same
+        amount for all items. `costs` when None.
+
+    Returns
+    -------
+    runs: List[range]
+        Index ranges of the runs in order, covering all items.
+    """
+    if not 0 < parts <= len(costs):
+        raise ValueError(f'Cannot split {len(costs)} items into {parts} parts')
+    start_costs = costs if start_costs is None else start_costs
+
+    def run_cost(start: int, stop: int) -> float:
+        return start_costs[start] + sum(costs[start + 1:stop])
+
+    def greedy(limit: float) -> List[range]:
+        runs, first, total = [], 0, start_costs[0]
+        for index in range(1, len(costs)):
+            if total + costs[index] > limit:
+                runs.append(range(first, index))
+                first, total = index, start_costs[index]
+            else:
+                total += costs[index]
+        runs.append(range(first, len(costs)))
+        return runs
+
+    low, high = max(costs), run_cost(0, len(costs))
+    while high - low > EPS * max(high, 1.0):
+        middle = (low + high) / 2
+        if len(greedy(middle)) <= parts:
+            high = middle
+        else:
+            low = middle
+    runs = greedy(high)
+    while len(runs) < parts:
+        position = max((index for index, run in enumerate(runs) if len(run) > 1),
+                       key=lambda index: run_cost(runs[index].start, runs[index].stop))
+        run = runs[position]
+        cut = min(range(run.start + 1, run.stop),
+                  key=lambda cut: max(run_cost(run.start, cut), run_cost(cut, run.stop)))
+        runs[position:position + 1] = [range(run.start, cut), range(cut, run.stop)]
+    return runs
@@ -1,37 +1,77 @@
 import re
-import matplotlib.pyplot as plt
+from typing import List, Optional, Tuple
+from utils import gcode_io as gio
 
+# Default limit of points kept for the preview.
+MAX_POINTS = 200_000
 
-def plot_file(file: str):
+
+def read_path(file: str, max_points: Optional[int] = MAX_POINTS) -> Tuple[List[float], List[float], List[float]]:
     """
-    Function to read coordinates from a G-code file and use it to create a plot with the tool path.
+    Read tool positions from a G-code file.
+
+    The file is streamed line by line. When it has more than `max_points`
+    positions every other kept point is dropped and the sampling stride is
+    doubled, so memory stays bounded by `max_points` for any file size.
 
     Parameters
     ----------
     file : str
-        Name of the G-code file to read.
+        Name of the G-code file to read, plain or compressed.
+    max_points : Optional[int]
+        Maximum number of positions kept, None to keep all.
+
+    Returns
+    -------
+    positions : Tuple[List[float], List[float], List[float]]
+        X, Y and Z coordinates of the tool path.
     """
     x_position = [0]
     y_position = [0]
     z_position = [0]
+    position = [0.0, 0.0, 0.0]
+    stride = 1
+    count = 0
 
-    with open(file, "r") as file:
-        def write_positions(column, position, position_dot):
-            if not position and not position_dot:
-                column.append(column[-1])
-            elif not position_dot:
-                column.append(float(position[0]))
-            else:
-                column.append(float(position_dot[0]))
-
+    with gio.open_gcode(file, "r") as file:
         for line in file:
-            resultx = re.findall(r'X(\d+\.?\d*)', line)
-            resulty = re.findall(r'Y(\d+\.?\d*)', line)
-            resultz = re.findall(r'Z(\d+\.?\d*)', line)
+            resultx = re.findall(r'X(-?\d*\.?\d+)', line)
+            resulty = re.findall(r'Y(-?\d*\.?\d+)', line)
+            resultz = re.findall(r'Z(-?\d*\.?\d+)', line)
+
+            for axis, result in enumerate((resultx, resulty, resultz)):
+                if result:
+                    position[axis] = float(result[0])
+
+            count += 1
+            if count % stride:
+                continue
+            x_position.append(position[0])
+            y_position.append(position[1])
+            z_position.append(position[2])
+
+            if max_points and len(x_position) > max_points:
+                del x_position[1::2], y_position[1::2], z_position[1::2]
+                stride *= 2
+
+    return x_position, y_position, z_position
+
+
+def plot_file(file: str, max_points: Optional[int] = MAX_POINTS):
+    """
+    Function to read coordinates from a G-code file and use it to create a plot with the tool path.
+
+    Parameters
+    ----------
+    file : str
+        Name of the G-code file to read, plain or compressed.
+    max_points : Optional[int]
+        Maximum number of plotted positions, large files are decimated.
+    """
+    # matplotlib is imported only for a preview, it dominates the import time otherwise.
+    import matplotlib.pyplot as plt
 
-            write_positions(x_position, resultx, resultx)
-            write_positions(y_position, resulty, resulty)
-            write_positions(z_position, resultz, resultz)
+    x_position, y_position, z_position = read_path(file, max_points)
 
     fig = plt.figure(figsize=(20, 20))
     ax = fig.add_subplot(111, projection='3d')
@@ -0,0 +1,219 @@
+import mmap
+import os
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
+from utils import gcode_io as gio, dialects as dl
+from utils.lazy import lazy_import
+
+json = lazy_import('json')
+
+# Suffix of the index written beside the program, e.g. 'grid.nc.resume.json'.
+RESUME_SUFFIX = '.resume.json'
+# Kinds of program blocks in program order.
+KINDS = ('preamble', 'label', 'square', 'row', 'end')
+
+
+class Block(NamedTuple):
+    """
+    One block of a program in the resume index.
+
+    kind: 'preamble', 'label', 'square', 'row' (rows of the 'rows' fill) or 'end'.
+    number: index of the block among the blocks of its kind.
+    offset: byte offset of the block in the program.
+    state: modal state of the controller where the block starts.
+    info: value and position of a label, position and parameters of a square or a row.
+    """
+    kind: str
+    number: int
+    offset: int
+    state: dl.ModalState
+    info: Dict
+
+
+def index_file(program: str) -> str:
+    """
+    Name of the resume index of a program.
+    """
+    return str(program) + RESUME_SUFFIX
+
+
+def _plain(value):
+    # NumPy scalars of the power and speed lists.
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'Cannot store {type(value).__name__} in a resume index')
+
+
+class ResumeIndex:
+    """
+    Byte offset and controller state of every label and square of a
+    written program, saved beside it as JSON.
+
+    A job interrupted at square N is continued by `iter_program` from the
+    index alone: a short preamble restores the modal state (position, S,
+    F) the controller had at the start of the square, and the rest of the
+    program is streamed from the memory-mapped file starting at the square's
+    offset. The program before it is neither read nor generated again.
+
+    Parameters
+    ----------
+    program: str
+        Name of the uncompressed program file.
+    dialect: Dict
+        Arguments of `dialects.get_dialect` of the program.
+    blocks: Sequence[Block]
+        Blocks in program order.
+    stamp: Optional[List[int]]
+        Size and modification time of the indexed program, set by `save`.
+
+    Attributes
+    ----------
+    blocks : List[Block]
+        Blocks in program order.
+    counts : Dict[str, int]
+        Number of blocks of every kind.
+    """
+    def __init__(self, program: str, dialect: Dict, blocks: Sequence[Block],
+                 stamp: Optional[List[int]] = None):
+        self.program = program
+        self.dialect = dict(dialect)
+        self.blocks = list(blocks)
+        self.stamp = stamp
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.first = {}
+        for position, block in enumerate(self.blocks):
+            self.first.setdefault(block.kind, position)
+            self.counts[block.kind] += 1
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def block(self, kind: str, number: int) -> Block:
+        """
+        The `number`-th block of a kind, e.g. ('square', 12).
+        """
+        if not 0 <= number < self.counts.get(kind, 0):
+            raise ValueError(f'The program has {self.counts.get(kind, 0)} {kind} blocks, '
+                             f'there is no {kind} {number}')
+        return self.blocks[self.first[kind] + number]
+
+    def square(self, number: int) -> Block:
+        """
+        Block burning square `number`: the square, or its whole row with the 'rows' fill.
+        """
+        if self.counts['row']:
+            per_row = len(self.blocks[self.first['row']].info['x'])
+            return self.block('row', number // per_row)
+        return self.block('square', number)
+
+    def label(self, number: int) -> Block:
+        return self.block('label', number)
+
+    def save(self):
+        """
+        Write the index beside the program.
+        """
+        self.stamp = gio.file_stamp(self.program)
+        data = {'program': self.stamp, 'dialect': self.dialect,
+                'blocks': [[block.kind, block.number, block.offset, list(block.state), block.info]
+                           for block in self.blocks]}
+        with open(index_file(self.program), 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=_plain)
+
+    @classmethod
+    def load(cls, program: str) -> 'ResumeIndex':
+        """
+        Read the index of a program.
+
+        Raises
+        ------
+        ValueError
+            The program was changed after the index was written.
+        """
+        with open(index_file(program), encoding='utf-8') as f:
+            data = json.load(f)
+        if data['program'] != gio.file_stamp(program):
+            raise ValueError(f'{program} was changed after its resume index was written')
+        blocks = [Block(kind, number, offset, dl.ModalState(*state), info)
+                  for kind, number, offset, state, info in data['blocks']]
+        return cls(program, data['dialect'], blocks, data['program'])
+
+    def preamble(self, block: Block) -> str:
+        """
+        G-code bringing a fresh controller into the state at the start of `block`.
+        Nothing is needed at the start of the program.
+        """
+        if block.kind == 'preamble':
+            return ''
+        return dl.get_dialect(**self.dialect).resume(block.state)
+
+    def iter_program(self, block: Block, chunk_size: int = gio.BLOCK_SIZE) -> Iterator[bytes]:
+        """
+        Stream the program continued at `block`: its resume preamble,
+        then the program file from the block offset to the end.
+
+        Parameters
+        ----------
+        block: Block
+            First block to burn.
+        chunk_size: int
+            Size in bytes of the streamed chunks.
+
+        Yields
+        ------
+        chunk: bytes
+            Next part of the program.
+        """
+        yield self.preamble(block).encode('ascii')
+        with open(self.program, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(block.offset, len(data), chunk_size):
+                yield data[start:start + chunk_size]
+
+    def write(self, block: Block, file: Union[str, BinaryIO]):
+        """
+        Write the program continued at `block` to a file name or binary stream.
+        """
+        if not isinstance(file, (str, os.PathLike)):
+            file.writelines(self.iter_program(block))
+            return
+        with open(file, 'wb') as f:
+            f.writelines(self.iter_program(block))
+
+
+def resume_block(index: ResumeIndex, square: int = 0, label: Optional[int] = None) -> Block:
+    """
+    Block to continue from: label `label` when it is given, square `square` otherwise.
+    """
+    return index.square(square) if label is None else index.label(label)
+
+
+def iter_resume(program: str, square: int = 0, label: Optional[int] = None,
+                chunk_size: int = gio.BLOCK_SIZE) -> Iterator[bytes]:
+    """
+    Stream a program continued at a square (or a label), see `ResumeIndex`.
+
+    Parameters
+    ----------
+    program: str
+        Program written with a resume index.
+    square: int
+        Number of the first square to burn, in program order.
+    label: Optional[int]
+        Number of the first label to burn, the squares follow. Overrides `square`.
+    chunk_size: int
+        Size in bytes of the streamed chunks.
+
+    Returns
+    -------
+    chunks: Iterator[bytes]
+        Parts of the continued program.
+    """
+    index = ResumeIndex.load(program)
+    return index.iter_program(resume_block(index, square, label), chunk_size)
+
+
+def write_resume(program: str, file: str, square: int = 0, label: Optional[int] = None):
+    """
+    Write a program continued at a square (or a label) to `file`, see `iter_resume`.
+    """
+    index = ResumeIndex.load(program)
+    index.write(resume_block(index, square, label), file)
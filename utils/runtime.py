@@ -0,0 +1,158 @@
+import re
+from math import hypot, sqrt
+from typing import Iterable, NamedTuple, Optional
+from utils import gcode_io as gio
+
+WORD = re.compile(r'([GXYF])(-?\d*\.?\d+)')
+
+
+class RunTime(NamedTuple):
+    """
+    Estimated machine time of a program in seconds.
+
+    total: time of the whole program.
+    rapid: time of the G0 moves.
+    rapid_at_feed: time the G0 moves would take as G1 moves at the modal feed.
+    """
+    total: float
+    rapid: float
+    rapid_at_feed: float
+
+    @property
+    def rapid_saving(self) -> float:
+        """
+        Time saved by running the travels as G0 instead of G1.
+        """
+        return self.rapid_at_feed - self.rapid
+
+
+class RunTimeModel:
+    """
+    Simple machine time model of a G-code program.
+
+    G1 moves run at the modal feed, G0 moves at the machine rapid rate
+    or at the feed given on the G0 line (travel feed override).
+    With `acceleration` set, every move follows a trapezoidal speed profile
+    starting and ending at rest, which is pessimistic for long polylines
+    but close for the short raster and label moves of a test grid.
+    Consecutive G1 moves in the same direction at the same feed, e.g. a
+    scan line crossing several squares with inline power changes, do not
+    stop at their junctions and are timed as one move.
+
+    Attributes
+    ----------
+    rapid_feed : float
+        Machine rapid rate in mm/min.
+    acceleration : Optional[float]
+        Machine acceleration in mm/s^2, None for constant speed moves.
+    """
+    def __init__(self, rapid_feed: float = 5000, acceleration: Optional[float] = None):
+        self.rapid_feed = rapid_feed
+        self.acceleration = acceleration
+
+    def move_time(self, distance: float, feed: float) -> float:
+        """
+        Time in seconds of a single move.
+
+        Parameters
+        ----------
+        distance: float
+            Length of the move in mm.
+        feed: float
+            Feed rate in mm/min.
+
+        Returns
+        -------
+        time: float
+            Time of the move in seconds.
+        """
+        if distance <= 0 or feed <= 0:
+            return 0.0
+        speed = feed / 60
+        if self.acceleration is None:
+            return distance / speed
+        ramp = speed * speed / self.acceleration
+        if distance >= ramp:
+            return distance / speed + speed / self.acceleration
+        return 2 * sqrt(distance / self.acceleration)
+
+    def estimate(self, lines: Iterable[str]) -> RunTime:
+        """
+        Estimate the machine time of a program.
+
+        Parameters
+        ----------
+        lines: Iterable[str]
+            Lines of the G-code program.
+
+        Returns
+        -------
+        run_time: RunTime
+            Total time, time of G0 moves and time of G0 moves at the modal feed.
+        """
+        x = y = 0.0
+        feed = 0.0
+        motion = 0
+        total = rapid = rapid_at_feed = 0.0
+        # Straight run of G1 moves without a stop: length, direction and feed.
+        run, run_direction, run_feed = 0.0, None, 0.0
+        for line in lines:
+            new_x, new_y = x, y
+            moved = rapid_line = False
+            line_feed = None
+            for letter, value in WORD.findall(line):
+                if letter == 'G':
+                    if value in ('0', '00', '1', '01'):
+                        motion = int(value)
+                        rapid_line = motion == 0
+                elif letter == 'X':
+                    new_x, moved = float(value), True
+                elif letter == 'Y':
+                    new_y, moved = float(value), True
+                else:
+                    line_feed = float(value)
+            # A feed on a G0 line is a travel feed override,
+            # anywhere else it is the cutting feed.
+            if line_feed is not None and not rapid_line:
+                feed = line_feed
+            if not moved:
+                continue
+            distance = hypot(new_x - x, new_y - y)
+            direction = None if distance <= 0 else ((new_x - x) / distance, (new_y - y) / distance)
+            x, y = new_x, new_y
+            if motion == 0:
+                total += self.move_time(run, run_feed)
+                run = 0.0
+                time = self.move_time(distance, line_feed if rapid_line and line_feed else self.rapid_feed)
+                rapid += time
+                rapid_at_feed += self.move_time(distance, feed)
+                total += time
+            elif self.acceleration is None:
+                total += self.move_time(distance, feed)
+            elif direction is None:
+                continue
+            elif run and feed == run_feed and \
+                    direction[0] * run_direction[0] + direction[1] * run_direction[1] > 1 - 1e-9:
+                run += distance
+            else:
+                total += self.move_time(run, run_feed)
+                run, run_direction, run_feed = distance, direction, feed
+        total += self.move_time(run, run_feed)
+        return RunTime(total, rapid, rapid_at_feed)
+
+    def estimate_file(self, file: str) -> RunTime:
+        """
+        Estimate the machine time of a G-code file, plain or compressed.
+
+        Parameters
+        ----------
+        file: str
+            Name of the G-code file.
+
+        Returns
+        -------
+        run_time: RunTime
+            Estimated machine time.
+        """
+        with gio.open_gcode(file) as f:
+            return self.estimate(f)
@@ -0,0 +1,333 @@
+from __future__ import annotations
+from math import floor
+from typing import Iterable, List, NamedTuple, Sequence, Tuple, Union
+from utils import gcode_io as gio
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+# Spindle (laser) commands switching the laser on and off.
+ON_CODES = (3, 4)
+OFF_CODES = (5,)
+# LinuxCNC digital output commands gating the laser: M62/M64 open, M63/M65 close.
+GATE_OPEN = (62, 64)
+GATE_CLOSE = (63, 65)
+
+
+class MachineState(NamedTuple):
+    """
+    Modal state of the controller between two parts of a program.
+
+    motion is 0 for G0 and 1 for G1, spindle 1 when the laser was switched
+    on, gate 0 when it is gated off by M63/M65.
+    """
+    x: float = 0.0
+    y: float = 0.0
+    motion: float = 0.0
+    power: float = 0.0
+    feed: float = 0.0
+    spindle: float = 0.0
+    gate: float = 1.0
+
+
+class ProgramDiff(NamedTuple):
+    """
+    Result of `Simulation.diff`.
+
+    equal: both programs burn the same segments with the same power and feed.
+    burns: number of burning segments of both programs.
+    mismatches: indices of the first differing burning segments.
+    """
+    equal: bool
+    burns: Tuple[int, int]
+    mismatches: List[int]
+
+
+def forward_fill(values: np.ndarray, initial: float) -> np.ndarray:
+    """
+    Replace NaN by the last value before it, `initial` before the first value.
+    """
+    valid = ~np.isnan(values)
+    return np.concatenate(([initial], values[valid]))[np.cumsum(valid)] if len(values) else values
+
+
+def parse_words(data: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Parse all words of a program at once.
+
+    The text is handled as a byte array: comments are blanked, every letter
+    followed by a number starts a word and the numbers are evaluated digit
+    by digit with `np.add.reduceat`, so no Python code runs per line.
+
+    Parameters
+    ----------
+    data: bytes
+        Program text.
+
+    Returns
+    -------
+    letters: numpy.ndarray
+        Letter code of every word.
+    values: numpy.ndarray
+        Number of every word.
+    lines: numpy.ndarray
+        Line index of every word.
+    line_count: int
+        Number of lines of the program.
+    """
+    text = np.frombuffer(data, dtype=np.uint8).copy()
+    newlines = np.flatnonzero(text == ord('\n'))
+    line_count = len(newlines) + (1 if len(text) and text[-1] != ord('\n') else 0)
+    lower = (text >= ord('a')) & (text <= ord('z'))
+    text[lower] -= 32
+
+    # Blank ';' comments up to the end of the line and '(...)' comments.
+    if b';' in data:
+        line_of_char = np.cumsum(np.concatenate(([0], text[:-1] == ord('\n'))))
+        semicolon = np.where(text == ord(';'), line_of_char, -1)
+        np.maximum.accumulate(semicolon, out=semicolon)
+        text[semicolon == line_of_char] = ord(' ')
+    if b'(' in data:
+        depth = np.cumsum((text == ord('(')).astype(np.int64) - (text == ord(')')))
+        text[(depth > 0) | (text == ord(')'))] = ord(' ')
+
+    numeric = ((text >= ord('0')) & (text <= ord('9'))) | (text == ord('.')) | (text == ord('-')) | \
+              (text == ord('+'))
+    letter = (text >= ord('A')) & (text <= ord('Z'))
+    starts = np.flatnonzero(letter[:-1] & numeric[1:]) + 1
+    if not len(starts):
+        empty = np.empty(0)
+        return empty.astype(np.uint8), empty, empty.astype(np.int64), line_count
+    breaks = np.append(np.flatnonzero(~numeric), len(text))
+    ends = breaks[np.searchsorted(breaks, starts)]
+    sizes = ends - starts
+
+    # Every numeric character with the word it belongs to.
+    word = np.repeat(np.arange(len(starts)), sizes)
+    position = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes) + starts[word]
+    chars = text[position]
+    dots = np.where(chars == ord('.'), position, ends[word])
+    dot = np.minimum.reduceat(dots, np.cumsum(sizes) - sizes)[word]
+    digit = (chars >= ord('0')) & (chars <= ord('9'))
+    exponent = np.where(position < dot, dot - position - 1, dot - position)
+    powers = 10.0 ** np.arange(-sizes.max(), sizes.max() + 1)
+    contribution = np.where(digit, (chars - ord('0')) * powers[exponent + sizes.max()], 0.0)
+    values = np.add.reduceat(contribution, np.cumsum(sizes) - sizes)
+    negative = np.logical_or.reduceat(chars == ord('-'), np.cumsum(sizes) - sizes)
+    values[negative] *= -1
+    return text[starts - 1], values, np.searchsorted(newlines, starts - 1), line_count
+
+
+class Simulation:
+    """
+    Moves of a G-code program replayed with the controller modal state.
+
+    Every move (line with X or Y) becomes one segment with the position,
+    laser, power and feed state in effect on its line. The laser burns when
+    it is switched on (M3/M4, or `on_codes`), not gated off by M63/M65,
+    the power S is above 0 and, in laser mode, the move is not a G0.
+
+    Attributes
+    ----------
+    start, end : numpy.ndarray
+        (n, 2) start and end points of the moves.
+    rapid : numpy.ndarray
+        The move is a G0.
+    laser : numpy.ndarray
+        The laser is on with a power above 0 during the move, also on G0 moves.
+    burn : numpy.ndarray
+        The move burns.
+    power, feed : numpy.ndarray
+        Modal S and F of the moves.
+    line : numpy.ndarray
+        Line index of the moves in the program.
+    laser_mode : bool
+        GRBL/Marlin laser mode: the laser is off during G0 moves.
+    state : MachineState
+        Modal state at the end of the program. Passed as `initial` to the
+        simulation of the following text, a program streamed in parts is
+        replayed like the whole program.
+    """
+    def __init__(self, program: Union[str, bytes], laser_mode: bool = False,
+                 on_codes: Sequence[int] = ON_CODES, off_codes: Sequence[int] = OFF_CODES,
+                 initial: MachineState = MachineState()):
+        data = program.encode('ascii') if isinstance(program, str) else program
+        letters, values, lines, line_count = parse_words(data)
+        self.laser_mode = laser_mode
+
+        def column(letter: str, mask=None) -> np.ndarray:
+            selected = letters == ord(letter)
+            if mask is not None:
+                selected &= mask
+            result = np.full(line_count, np.nan)
+            result[lines[selected]] = values[selected]
+            return result
+
+        m_codes = np.where(letters == ord('M'), values, np.nan)
+        spindle = np.full(line_count, np.nan)
+        spindle[lines[np.isin(m_codes, on_codes)]] = 1
+        spindle[lines[np.isin(m_codes, off_codes)]] = 0
+        gate = np.full(line_count, np.nan)
+        gate[lines[np.isin(m_codes, GATE_OPEN)]] = 1
+        gate[lines[np.isin(m_codes, GATE_CLOSE)]] = 0
+        motion = column('G', np.isin(values, (0, 1)))
+
+        x, y = column('X'), column('Y')
+        moves = np.flatnonzero(~np.isnan(x) | ~np.isnan(y))
+        modal = [forward_fill(values, start) for values, start in
+                 zip((x, y, motion, column('S'), column('F'), spindle, gate), initial)]
+        self.state = MachineState(*(float(values[-1]) if len(values) else start
+                                    for values, start in zip(modal, initial)))
+        x, y, motion, power, feed, spindle, gate = (values[moves] for values in modal)
+        points = np.column_stack((np.concatenate(([initial.x], modal[0])), np.concatenate(([initial.y], modal[1]))))
+        self.start = points[moves]
+        self.end = points[moves + 1]
+        self.line = moves
+        self.rapid = motion == 0
+        self.power = power
+        self.feed = feed
+        self.laser = (spindle == 1) & (gate == 1) & (self.power > 0)
+        self.burn = self.laser & ~self.rapid if laser_mode else self.laser.copy()
+
+    @classmethod
+    def from_file(cls, file: str, **options) -> 'Simulation':
+        """
+        Simulate a G-code file, plain or compressed.
+        """
+        with gio.open_gcode(file) as f:
+            return cls(f.read(), **options)
+
+    def __len__(self) -> int:
+        return len(self.line)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """
+        Length of every move in mm.
+        """
+        return np.hypot(*(self.end - self.start).T)
+
+    def burned_segments(self) -> np.ndarray:
+        """
+        (n, 4) x_start, y_start, x_end, y_end of the burning moves with a length.
+        """
+        mask = self.burn & (self.lengths > 0)
+        return np.hstack((self.start[mask], self.end[mask]))
+
+    def laser_on_travel(self) -> np.ndarray:
+        """
+        Program lines of G0 moves made with the laser on, outside laser mode.
+        """
+        if self.laser_mode:
+            return self.line[:0]
+        return self.line[self.rapid & self.laser & (self.lengths > 0)]
+
+    def exposure(self, squares: Iterable[Sequence[float]], max_power: float = 1000,
+                 laser_watts: float = 1.0) -> np.ndarray:
+        """
+        Energy per area burned into every square, in J/mm^2.
+
+        Every burning move delivers `laser_watts * power / max_power` watts for
+        `length / feed` minutes; it is assigned to the square holding its midpoint.
+
+        Parameters
+        ----------
+        squares: Iterable[Sequence[float]]
+            x, y, width, length of the squares, which must not overlap.
+        max_power: float
+            S value of the full laser power.
+        laser_watts: float
+            Optical power of the laser at full power.
+
+        Returns
+        -------
+        exposure: numpy.ndarray
+            Exposure of every square.
+        """
+        boxes = np.asarray(list(squares), dtype=float).reshape(-1, 4)
+        mask = self.burn & (self.feed > 0)
+        middle = (self.start[mask] + self.end[mask]) / 2
+        seconds = self.lengths[mask] / self.feed[mask] * 60
+        energy = laser_watts * self.power[mask] / max_power * seconds
+        result = np.zeros(len(boxes))
+        if not len(boxes) or not len(middle):
+            return result
+
+        # Sort the midpoints by grid cell, every square looks up the cells it covers.
+        cell = float(max(boxes[:, 2].max(), boxes[:, 3].max(), 1e-9))
+        cells = np.floor(middle / cell).astype(np.int64)
+        keys = (cells[:, 0] << 32) + cells[:, 1]
+        order = np.argsort(keys, kind='stable')
+        keys, middle, energy = keys[order], middle[order], energy[order]
+        for index, (x, y, width, length) in enumerate(boxes):
+            total = 0.0
+            for i in range(floor(x / cell), floor((x + width) / cell) + 1):
+                for j in range(floor(y / cell), floor((y + length) / cell) + 1):
+                    key = (i << 32) + j
+                    first, last = np.searchsorted(keys, key), np.searchsorted(keys, key, 'right')
+                    points = middle[first:last]
+                    inside = (points[:, 0] >= x) & (points[:, 0] <= x + width) & \
+                             (points[:, 1] >= y) & (points[:, 1] <= y + length)
+                    total += energy[first:last][inside].sum()
+            result[index] = total / (width * length)
+        return result
+
+    def diff(self, other: 'Simulation', tolerance: float = 1e-4, limit: int = 10) -> ProgramDiff:
+        """
+        Compare what two programs burn, independently of their formatting.
+
+        Burning moves are compared in order: end points within `tolerance`,
+        power and feed equal. Travels and the way the laser is switched
+        are not compared, so e.g. the 'custom' and 'grbl-laser' dialects
+        of the same job are equal.
+
+        Parameters
+        ----------
+        other: Simulation
+            Program to compare with.
+        tolerance: float
+            Allowed coordinate difference in mm.
+        limit: int
+            Number of mismatches reported.
+
+        Returns
+        -------
+        diff: ProgramDiff
+            Result of the comparison.
+        """
+        a, b = self._burns(), other._burns()
+        count = min(len(a), len(b))
+        close = np.all(np.abs(a[:count, :4] - b[:count, :4]) <= tolerance, axis=1) & \
+            np.all(a[:count, 4:] == b[:count, 4:], axis=1)
+        mismatches = np.flatnonzero(~close)[:limit].tolist()
+        if len(a) != len(b) and len(mismatches) < limit:
+            mismatches.append(count)
+        return ProgramDiff(not mismatches, (len(a), len(b)), mismatches)
+
+    def _burns(self) -> np.ndarray:
+        mask = self.burn & (self.lengths > 0)
+        return np.column_stack((self.start[mask], self.end[mask], self.power[mask], self.feed[mask]))
+
+
+def simulate(program: Union[str, bytes], laser_mode: bool = False,
+             on_codes: Sequence[int] = ON_CODES, off_codes: Sequence[int] = OFF_CODES) -> Simulation:
+    """
+    Replay a G-code program, see `Simulation`.
+
+    Parameters
+    ----------
+    program: Union[str, bytes]
+        Program text.
+    laser_mode: bool
+        The controller turns the laser off during G0 moves (GRBL $32=1, Marlin inline power).
+    on_codes: Sequence[int]
+        M codes switching the laser on.
+    off_codes: Sequence[int]
+        M codes switching the laser off.
+
+    Returns
+    -------
+    simulation: Simulation
+        Moves of the program.
+    """
+    return Simulation(program, laser_mode, on_codes, off_codes)
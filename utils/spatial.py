@@ -0,0 +1,378 @@
+from __future__ import annotations
+from collections.abc import Sequence as SequenceABC
+from math import ceil, floor
+from typing import Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+Box = Tuple[float, float, float, float]
+
+
+class Footprint(NamedTuple):
+    """
+    Burned area of one label or square.
+
+    name: description used in reports, e.g. 'label 1000 at (15, 0)'.
+    lines: (n, 4) array of burning lines x_start, y_start, x_end, y_end.
+    filled: the area enclosed by the lines is burned (squares), not only the lines (labels).
+    reach: x_min, y_min, x_max, y_max of all moves, laser off ones included
+           (e.g. raster overscan), the bounding box of the lines when None.
+    """
+    name: str
+    lines: np.ndarray
+    filled: bool = False
+    reach: Optional[Box] = None
+
+    @property
+    def bbox(self) -> Box:
+        xs = self.lines[:, [0, 2]]
+        ys = self.lines[:, [1, 3]]
+        return float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())
+
+    @property
+    def extent(self) -> Box:
+        return self.bbox if self.reach is None else self.reach
+
+
+def rectangle(name: str, x: float, y: float, width: float, length: float,
+              overscan: float = 0.0, y_overscan: float = 0.0) -> Footprint:
+    """
+    Footprint of a filled square, `overscan` extends its moves along X and `y_overscan` along Y.
+    """
+    corners = [(x, y), (x + width, y), (x + width, y + length), (x, y + length), (x, y)]
+    lines = np.array([a + b for a, b in zip(corners, corners[1:])], dtype=float)
+    reach = (x - overscan, y - y_overscan, x + width + overscan, y + length + y_overscan)
+    return Footprint(name, lines, True, reach)
+
+
+class FootprintList(SequenceABC):
+    """
+    Footprints made on demand from compact columns, e.g. label values and
+    positions, so a whole job is never held in memory as line arrays.
+    `make(*(column[index] for column in columns))` builds one footprint.
+    """
+    def __init__(self, make: Callable[..., Footprint], *columns: Sequence):
+        self.make = make
+        self.columns = columns
+
+    def __getitem__(self, index: int) -> Footprint:
+        return self.make(*(column[index] for column in self.columns))
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+
+class Lattice(NamedTuple):
+    """
+    Squares of equal size on a regular grid, repeated at tile origins:
+    the layout of a `ParameterSweep`. The lattice is its own uniform grid
+    index, the squares near a box are found by division, without storing them.
+
+    origins: start of the first square of every tile.
+    columns, rows: squares of a tile along X and Y.
+    x_pitch, y_pitch: distance between squares.
+    width, length: size of a square.
+    overscan: laser off run-in and run-out of the squares along X.
+    y_overscan: the same along Y, for scan lines at an angle.
+    """
+    origins: Sequence[Tuple[float, float]]
+    columns: int
+    rows: int
+    x_pitch: float
+    y_pitch: float
+    width: float
+    length: float
+    overscan: float = 0.0
+    y_overscan: float = 0.0
+
+    def footprint(self, x: float, y: float) -> Footprint:
+        return rectangle(f'square at ({x:g}, {y:g})', x, y, self.width, self.length,
+                         self.overscan, self.y_overscan)
+
+    def __iter__(self) -> Iterator[Footprint]:
+        for x_origin, y_origin in self.origins:
+            for row in range(self.rows):
+                for column in range(self.columns):
+                    yield self.footprint(x_origin + column * self.x_pitch, y_origin + row * self.y_pitch)
+
+    def near(self, box: Box) -> Iterator[Tuple[float, float]]:
+        """
+        Start of the squares whose area touches `box`.
+        """
+        x_min, y_min, x_max, y_max = box
+        for x_origin, y_origin in self.origins:
+            first_column = max(0, ceil((x_min - x_origin - self.width) / self.x_pitch))
+            last_column = min(self.columns - 1, floor((x_max - x_origin) / self.x_pitch))
+            first_row = max(0, ceil((y_min - y_origin - self.length) / self.y_pitch))
+            last_row = min(self.rows - 1, floor((y_max - y_origin) / self.y_pitch))
+            for row in range(first_row, last_row + 1):
+                for column in range(first_column, last_column + 1):
+                    yield x_origin + column * self.x_pitch, y_origin + row * self.y_pitch
+
+    def tile(self, x: float, y: float) -> Footprint:
+        """
+        Footprint of the tile starting at (x, y).
+        """
+        width = (self.columns - 1) * self.x_pitch + self.width
+        length = (self.rows - 1) * self.y_pitch + self.length
+        return rectangle(f'tile at ({x:g}, {y:g})', x, y, width, length)
+
+    @property
+    def extent(self) -> Box:
+        """
+        x_min, y_min, x_max, y_max of the moves of all squares, overscan included.
+        """
+        x_origins = [x for x, _ in self.origins]
+        y_origins = [y for _, y in self.origins]
+        return (min(x_origins) - self.overscan, min(y_origins) - self.y_overscan,
+                max(x_origins) + (self.columns - 1) * self.x_pitch + self.width + self.overscan,
+                max(y_origins) + (self.rows - 1) * self.y_pitch + self.length + self.y_overscan)
+
+    def neighbours(self) -> List[Tuple[float, Footprint, Footprint]]:
+        """
+        Gap between neighbouring squares along X and Y and between tiles, with the pairs.
+        """
+        x, y = self.origins[0]
+        pairs = []
+        if self.columns > 1:
+            pairs.append((self.x_pitch - self.width, self.footprint(x, y), self.footprint(x + self.x_pitch, y)))
+        if self.rows > 1:
+            pairs.append((self.y_pitch - self.length, self.footprint(x, y), self.footprint(x, y + self.y_pitch)))
+        tiles = [self.tile(x, y) for x, y in self.origins]
+        for index, tile in enumerate(tiles):
+            pairs.extend((distance(other, tile), other, tile) for other in tiles[:index])
+        return pairs
+
+
+class LayoutReport(NamedTuple):
+    """
+    Result of `check_layout`.
+
+    overlaps: pairs of footprints burning the same place.
+    too_close: pairs closer than the required clearance, with their distance.
+    out_of_bounds: footprints with moves outside the bed.
+    min_clearance: smallest distance between neighbouring footprints and their names,
+                   None when no footprints are neighbours.
+    """
+    overlaps: List[Tuple[str, str]]
+    too_close: List[Tuple[str, str, float]]
+    out_of_bounds: List[str]
+    min_clearance: Optional[Tuple[float, str, str]]
+
+    @property
+    def ok(self) -> bool:
+        return not (self.overlaps or self.too_close or self.out_of_bounds)
+
+    def summary(self) -> str:
+        """
+        One line per problem, empty when the layout is fine.
+        """
+        lines = [f'Overlap: {a} and {b}' for a, b in self.overlaps]
+        lines += [f'Too close ({distance:.3f} mm): {a} and {b}' for a, b, distance in self.too_close]
+        lines += [f'Outside the bed: {name}' for name in self.out_of_bounds]
+        return '\n'.join(lines)
+
+
+class SpatialGrid:
+    """
+    Static uniform grid index of boxes. Every box is registered in the cell
+    of its lower left corner and queries widen their search by the largest
+    box size. The (cell, box) pairs are kept as sorted numpy arrays, so a
+    query is a binary search per cell and the index costs two integers per
+    box. Building it is O(n log n).
+
+    Attributes
+    ----------
+    cell : float
+        Size of the grid cells in millimeters.
+    reach : Tuple[float, float]
+        Largest width and height of the indexed boxes.
+    """
+    def __init__(self, boxes: np.ndarray, cell: float):
+        self.cell = cell
+        self.reach = tuple((boxes[:, 2:] - boxes[:, :2]).max(axis=0)) if len(boxes) else (0.0, 0.0)
+        keys = self.key(np.floor(boxes[:, 0] / cell).astype(np.int64),
+                        np.floor(boxes[:, 1] / cell).astype(np.int64))
+        self.items = np.argsort(keys, kind='stable')
+        self.cell_keys = keys[self.items]
+
+    @staticmethod
+    def key(i, j):
+        return (i << 32) + j
+
+    def query(self, box: Sequence[float]) -> np.ndarray:
+        """
+        Boxes that may touch `box`, in increasing order.
+        """
+        x_min, y_min, x_max, y_max = box
+        found = []
+        for i in range(floor((x_min - self.reach[0]) / self.cell), floor(x_max / self.cell) + 1):
+            for j in range(floor((y_min - self.reach[1]) / self.cell), floor(y_max / self.cell) + 1):
+                key = self.key(i, j)
+                found.append(self.items[np.searchsorted(self.cell_keys, key):
+                                        np.searchsorted(self.cell_keys, key, 'right')])
+        return np.sort(np.concatenate(found)) if found else self.items[:0]
+
+
+def point_segment_distances(px: np.ndarray, py: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Distances between points (broadcast as columns) and segments (rows).
+    """
+    x0, y0, x1, y1 = (segments[:, k][None, :] for k in range(4))
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(length2 > 0, ((px - x0) * dx + (py - y0) * dy) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (x0 + t * dx), py - (y0 + t * dy))
+
+
+def segment_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Smallest distance between two sets of segments, 0 when any of them cross.
+    """
+    if not len(a) or not len(b):
+        return float('inf')
+    ax0, ay0, ax1, ay1 = (a[:, k][:, None] for k in range(4))
+    bx0, by0, bx1, by1 = (b[:, k][None, :] for k in range(4))
+
+    def orientation(px, py, qx, qy, rx, ry):
+        return np.sign((qx - px) * (ry - py) - (qy - py) * (rx - px))
+
+    crossing = (orientation(ax0, ay0, ax1, ay1, bx0, by0) * orientation(ax0, ay0, ax1, ay1, bx1, by1) < 0) & \
+               (orientation(bx0, by0, bx1, by1, ax0, ay0) * orientation(bx0, by0, bx1, by1, ax1, ay1) < 0)
+    if crossing.any():
+        return 0.0
+    return float(min(point_segment_distances(a[:, 0][:, None], a[:, 1][:, None], b).min(),
+                     point_segment_distances(a[:, 2][:, None], a[:, 3][:, None], b).min(),
+                     point_segment_distances(b[:, 0][:, None], b[:, 1][:, None], a).min(),
+                     point_segment_distances(b[:, 2][:, None], b[:, 3][:, None], a).min()))
+
+
+def inside(footprint: Footprint, lines: np.ndarray) -> bool:
+    """
+    Whether any line end of `lines` lies in the filled box of `footprint`.
+    """
+    x_min, y_min, x_max, y_max = footprint.bbox
+    xs, ys = lines[:, [0, 2]], lines[:, [1, 3]]
+    return bool(((xs >= x_min) & (xs <= x_max) & (ys >= y_min) & (ys <= y_max)).any())
+
+
+def box_gap(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    Distance between two bounding boxes, a lower bound of the footprint distance.
+    """
+    dx = max(a[0] - b[2], b[0] - a[2], 0.0)
+    dy = max(a[1] - b[3], b[1] - a[3], 0.0)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def distance(a: Footprint, b: Footprint) -> float:
+    """
+    Clearance between two footprints, 0 when they overlap.
+    """
+    if a.filled and b.filled:
+        # Squares are axis aligned rectangles.
+        return box_gap(a.bbox, b.bbox)
+    if (a.filled and inside(a, b.lines)) or (b.filled and inside(b, a.lines)):
+        return 0.0
+    return segment_distance(a.lines, b.lines)
+
+
+def union(boxes: Sequence[Box]) -> Box:
+    """
+    Smallest box holding all boxes.
+    """
+    return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+
+def outside(box: Box, bed: Tuple[float, float]) -> bool:
+    return box[0] < 0 or box[1] < 0 or box[2] > bed[0] or box[3] > bed[1]
+
+
+def check_layout(footprints: Sequence[Footprint], lattice: Optional[Lattice] = None,
+                 bed: Optional[Tuple[float, float]] = None, clearance: float = 0.0,
+                 radius: Optional[float] = None) -> LayoutReport:
+    """
+    Find overlapping footprints, footprints closer than `clearance` and moves
+    outside the bed.
+
+    The footprints (labels) are indexed in a `SpatialGrid` and compared with
+    their neighbours and with the squares of the lattice near them. Squares
+    are compared with each other through the lattice pitch. Memory use grows
+    with the number of footprints only, `footprints` may be a `FootprintList`.
+
+    Parameters
+    ----------
+    footprints: Sequence[Footprint]
+        Labels of the job, or any footprints.
+    lattice: Optional[Lattice]
+        Squares of the job.
+    bed: Optional[Tuple[float, float]]
+        Bed width and height in millimeters from the origin, not checked when None.
+    clearance: float
+        Required distance between footprints in millimeters.
+    radius: Optional[float]
+        Distance within which footprints are neighbours for `min_clearance`,
+        the largest footprint size when None.
+
+    Returns
+    -------
+    report: LayoutReport
+        Problems found and the smallest clearance.
+    """
+    overlaps, too_close, out_of_bounds = [], [], []
+    nearest = None
+
+    def compare(a: Footprint, b: Footprint, gap: Optional[float] = None):
+        nonlocal nearest
+        gap = distance(a, b) if gap is None else gap
+        if gap <= 0:
+            overlaps.append((a.name, b.name))
+        elif gap < clearance:
+            too_close.append((a.name, b.name, gap))
+        if gap <= radius and (nearest is None or gap < nearest[0]):
+            nearest = (max(gap, 0.0), a.name, b.name)
+
+    boxes = np.empty((len(footprints), 4))
+    for index, footprint in enumerate(footprints):
+        boxes[index] = footprint.bbox
+        if bed is not None and outside(footprint.extent, bed):
+            out_of_bounds.append(footprint.name)
+    if radius is None:
+        sizes = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        if lattice is not None:
+            sizes = np.append(sizes, max(lattice.width, lattice.length))
+        radius = float(sizes.max()) if len(sizes) else 1.0
+    radius = max(radius, clearance, 1e-6)
+
+    grid = SpatialGrid(boxes, radius)
+    for index in range(len(footprints)):
+        footprint = None
+        box = boxes[index]
+        search = (box[0] - radius, box[1] - radius, box[2] + radius, box[3] + radius)
+        for other in grid.query(search):
+            if other >= index:
+                break
+            gap = box_gap(boxes[other], box)
+            if gap > radius or (gap > 0 and gap >= clearance and nearest is not None and gap >= nearest[0]):
+                # Neither a problem nor the nearest neighbour.
+                continue
+            footprint = footprint or footprints[index]
+            compare(footprints[other], footprint)
+        if lattice is not None:
+            for x, y in lattice.near(search):
+                gap = box_gap((x, y, x + lattice.width, y + lattice.length), box)
+                if gap > 0 and gap >= clearance and nearest is not None and gap >= nearest[0]:
+                    continue
+                footprint = footprint or footprints[index]
+                compare(footprint, lattice.footprint(x, y))
+
+    if lattice is not None:
+        for gap, a, b in lattice.neighbours():
+            compare(a, b, gap)
+        if bed is not None:
+            out_of_bounds.extend(square.name for square in lattice if outside(square.extent, bed))
+    return LayoutReport(overlaps, too_close, out_of_bounds, nearest)
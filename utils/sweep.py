@@ -0,0 +1,156 @@
+from itertools import product
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class SweepPoint:
+    """
+    One burned square of a parameter sweep.
+
+    Attributes
+    ----------
+    x : float
+        Start position of the square on the x-axis.
+    y : float
+        Start position of the square on the y-axis.
+    tile : Tuple[int, int]
+        Column and row of the sub-grid holding the square.
+    params : Dict[str, object]
+        Parameter values of the square, e.g. {'power': 100, 'speed': 1000}.
+    """
+    __slots__ = ('x', 'y', 'tile', 'params')
+
+    def __init__(self, x: float, y: float, tile: Tuple[int, int], params: Dict[str, object]):
+        self.x = x
+        self.y = y
+        self.tile = tile
+        self.params = params
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.params))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SweepPoint) and \
+            (self.x, self.y, self.tile, self.params) == (other.x, other.y, other.tile, other.params)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}(x={self.x}, y={self.y}, tile={self.tile}, params={self.params})'
+
+
+class ParameterSweep:
+    """
+    Lazy sweep over an N-dimensional parameter space laid out on the bed.
+
+    The first axis changes along the columns of a grid, the second along its
+    rows. Every further axis tiles copies of that grid into sub-grids,
+    alternately along X (3rd, 5th, ... axis) and Y (4th, 6th, ... axis).
+    Points are generated one at a time, the cartesian product is never
+    materialized. With two axes this is the grid of `PowerSpeedIterator`:
+    power across columns, speed across rows.
+
+    Parameters
+    ----------
+    axes: Dict[str, Sequence]
+        Parameter names and their values, in axis order.
+    x_start: float
+        Start position of the first square on the x-axis.
+    y_start: float
+        Start position of the first square on the y-axis.
+    x_pitch: float
+        Distance between columns (square width + space).
+    y_pitch: float
+        Distance between rows (square length + space).
+    tile_x_pitch: Optional[float]
+        Distance between sub-grids along X, columns * x_pitch when None.
+    tile_y_pitch: Optional[float]
+        Distance between sub-grids along Y, rows * y_pitch when None.
+    """
+
+    def __init__(self, axes: Dict[str, Sequence], x_start: float, y_start: float,
+                 x_pitch: float, y_pitch: float,
+                 tile_x_pitch: Optional[float] = None, tile_y_pitch: Optional[float] = None):
+        if len(axes) < 2:
+            raise ValueError('A sweep needs at least two axes (columns and rows)')
+        self.names = list(axes)
+        self.values = [list(values) for values in axes.values()]
+        for name, values in zip(self.names, self.values):
+            if not values:
+                raise ValueError(f'Sweep axis {name} has no values')
+        self.x_start = x_start
+        self.y_start = y_start
+        self.x_pitch = x_pitch
+        self.y_pitch = y_pitch
+        self.tile_x_pitch = len(self.values[0]) * x_pitch if tile_x_pitch is None else tile_x_pitch
+        self.tile_y_pitch = len(self.values[1]) * y_pitch if tile_y_pitch is None else tile_y_pitch
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """
+        Number of values of every axis.
+        """
+        return tuple(len(values) for values in self.values)
+
+    def __len__(self) -> int:
+        size = 1
+        for count in self.shape:
+            size *= count
+        return size
+
+    @property
+    def tiles(self) -> Tuple[int, int]:
+        """
+        Number of sub-grids along X and Y.
+        """
+        x_tiles = y_tiles = 1
+        for axis, count in enumerate(self.shape[2:]):
+            if axis % 2 == 0:
+                x_tiles *= count
+            else:
+                y_tiles *= count
+        return x_tiles, y_tiles
+
+    def tile_index(self, extra: Sequence[int]) -> Tuple[int, int]:
+        """
+        Column and row of the sub-grid for the indices of the extra axes.
+        """
+        tile_x = tile_y = 0
+        for axis, index in enumerate(extra):
+            count = self.shape[axis + 2]
+            if axis % 2 == 0:
+                tile_x = tile_x * count + index
+            else:
+                tile_y = tile_y * count + index
+        return tile_x, tile_y
+
+    def tile_origins(self) -> Iterator[Tuple[int, int, float, float]]:
+        """
+        Yield column, row and start position of every sub-grid.
+        """
+        x_tiles, y_tiles = self.tiles
+        for tile_y in range(y_tiles):
+            for tile_x in range(x_tiles):
+                yield (tile_x, tile_y,
+                       self.x_start + tile_x * self.tile_x_pitch,
+                       self.y_start + tile_y * self.tile_y_pitch)
+
+    def __iter__(self) -> Iterator[SweepPoint]:
+        columns, rows = self.values[0], self.values[1]
+        extra_names = self.names[2:]
+        extra_ranges = [range(count) for count in self.shape[2:]]
+        for extra in product(*extra_ranges):
+            tile = self.tile_index(extra)
+            x_origin = self.x_start + tile[0] * self.tile_x_pitch
+            y_origin = self.y_start + tile[1] * self.tile_y_pitch
+            extra_params = {name: self.values[axis + 2][index]
+                            for axis, (name, index) in enumerate(zip(extra_names, extra))}
+            for row, row_value in enumerate(rows):
+                y = y_origin + row * self.y_pitch
+                for column, column_value in enumerate(columns):
+                    params = {self.names[0]: column_value, self.names[1]: row_value}
+                    params.update(extra_params)
+                    yield SweepPoint(x_origin + column * self.x_pitch, y, tile, params)
+
+    def axis_values(self, name: str) -> List:
+        """
+        Values of the axis `name`.
+        """
+        return self.values[self.names.index(name)]
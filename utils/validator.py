@@ -1,4 +1,48 @@
-from cerberus import Validator
+from pattern_generator import FILLS, SEQUENCES, SWEEP_AXES
+from utils.dialects import DIALECTS
+from utils.fixed_point import MAX_PLACES
+
+# Schema of the PatternGenerator parameters, values are coerced to their type.
+PARAMS_SCHEMA = {
+    'file_name': {'type': 'string', 'coerce': str, 'default': 'output.nc'},
+    'length': {'type': 'float', 'coerce': float, 'min': 0, 'required': True},
+    'width': {'type': 'float', 'coerce': float, 'min': 0, 'required': True},
+    'space': {'type': 'float', 'coerce': float, 'required': True},
+    'passes_per_mm': {'type': 'integer', 'coerce': int, 'min': 1, 'required': True},
+    'x_start_pos': {'type': 'float', 'coerce': float, 'required': True},
+    'y_start_pos': {'type': 'float', 'coerce': float, 'required': True},
+    'x_squares': {'type': 'integer', 'coerce': int, 'min': 1, 'required': True},
+    'y_squares': {'type': 'integer', 'coerce': int, 'min': 1, 'required': True},
+    'start_power': {'type': 'integer', 'coerce': int, 'min': 0, 'required': True},
+    'end_power': {'type': 'integer', 'coerce': int, 'min': 0, 'required': True},
+    'start_feed': {'type': 'integer', 'coerce': int, 'min': 0, 'required': True},
+    'end_feed': {'type': 'integer', 'coerce': int, 'min': 0, 'required': True},
+    'turn_on_g_code': {'type': 'string', 'default': 'M4'},
+    'turn_off_g_code': {'type': 'string', 'default': 'M5'},
+    'dialect': {'type': 'string', 'allowed': list(DIALECTS)},
+    'rapid_travel': {'type': 'boolean', 'nullable': True},
+    'travel_feed': {'type': 'integer', 'min': 1, 'nullable': True},
+    'compact_gcode': {'type': 'boolean', 'nullable': True},
+    'leading_zeros': {'type': 'boolean'},
+    'power_distribution': {'type': ['string', 'list'], 'nullable': True},
+    'feed_distribution': {'type': ['string', 'list'], 'nullable': True},
+    'power_step': {'type': 'number', 'min': 0, 'nullable': True},
+    'feed_step': {'type': 'number', 'min': 0, 'nullable': True},
+    'distribution_exponent': {'type': 'number'},
+    'fill': {'type': 'string', 'allowed': list(FILLS)},
+    'line_interval': {'type': 'number', 'min': 0.001, 'nullable': True},
+    'overscan': {'type': 'number', 'min': 0},
+    'unidirectional': {'type': 'boolean'},
+    'hatch_angle': {'type': 'number'},
+    'cross_hatch': {'type': 'boolean'},
+    'sweep': {'type': 'dict', 'nullable': True,
+              'keysrules': {'type': 'string', 'allowed': list(SWEEP_AXES)},
+              'valuesrules': {'type': 'list', 'minlength': 1}},
+    'tile_gap': {'type': 'number', 'min': 0, 'nullable': True},
+    'fixed_point': {'type': 'integer', 'min': 0, 'max': MAX_PLACES, 'nullable': True},
+    'sequence': {'type': 'string', 'allowed': list(SEQUENCES)},
+    'resume_index': {'type': 'boolean'},
+}
 
 
 def validate(file_name, length, width, space, passes_per_mm,
@@ -83,8 +127,37 @@ def validate(file_name, length, width, space, passes_per_mm,
         'turn_off_g_code': turn_off_g_code,
     }
 
+    from cerberus import Validator
+
     v = Validator(schema)
     if not v.validate(input_data):
         return v.errors
     return {}
 
+
+def validate_params(params: dict):
+    """
+    Validate and normalize a dictionary of PatternGenerator parameters,
+    e.g. a JSON request. Numbers are coerced to the expected types
+    and unknown parameters are rejected.
+
+    Parameters
+    ----------
+    params: dict
+        PatternGenerator keyword arguments.
+
+    Returns
+    -------
+    document: dict
+        Normalized parameters, empty when there are errors.
+    errors: dict
+        Dictionary containing error messages from Cerberus validation, if any.
+    """
+    from cerberus import Validator
+
+    v = Validator(PARAMS_SCHEMA)
+    if not isinstance(params, dict):
+        return {}, {'params': ['must be of dict type']}
+    if not v.validate(params):
+        return {}, v.errors
+    return v.document, {}